@@ -0,0 +1 @@
+"""Benchmarks for the Smart Picture Display application."""
\ No newline at end of file
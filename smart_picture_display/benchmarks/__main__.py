@@ -0,0 +1,141 @@
+"""Command line entry point of the benchmarks.
+
+Run with ``python -m smart_picture_display.benchmarks``; the results are
+printed as JSON so they can be compared across commits.
+"""
+import argparse
+import json
+import logging
+import platform
+import subprocess
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from .. import __version__
+from ..config import BASE_DIR, DOWNLOAD_WORKERS
+from ..utils.logger import logger
+from .library import LIBRARY_FORMATS
+from .suite import getPeakRss, runBenchmarks
+
+# Benchmarks run when none are selected
+ALL_BENCHMARKS = ('refresh', 'slides', 'sync')
+
+def parseSize(text: str) -> Tuple[int, int]:
+    """Parse a WIDTHxHEIGHT argument.
+    
+    Args:
+        text: The argument.
+    
+    Returns:
+        The (width, height).
+    """
+    try:
+        width, height = (int(part) for part in text.lower().split('x'))
+        return width, height
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Expected WIDTHxHEIGHT, got {text!r}")
+
+def getCommit() -> Optional[str]:
+    """Get the git commit the code is running from.
+    
+    Returns:
+        The commit hash, or None outside a git checkout.
+    """
+    try:
+        result = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=BASE_DIR,
+                                capture_output=True, text=True, timeout=10)
+        return result.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+def parseArgs(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """Parse the command line.
+    
+    Args:
+        argv: The arguments, sys.argv if None.
+    
+    Returns:
+        The parsed arguments.
+    """
+    parser = argparse.ArgumentParser(
+        prog="python -m smart_picture_display.benchmarks",
+        description="Benchmark the image loader, decoding, caching and Drive sync.")
+    parser.add_argument('benchmarks', nargs='*', metavar='BENCHMARK',
+                        help=f"benchmarks to run: {', '.join(ALL_BENCHMARKS)} (default: all)")
+    parser.add_argument('--images', type=int, default=200, help="images in the synthetic library")
+    parser.add_argument('--image-size', type=parseSize, default=(4000, 3000), help="WIDTHxHEIGHT of the images")
+    parser.add_argument('--format', dest='image_format', choices=sorted(LIBRARY_FORMATS), default='jpeg',
+                        help="format of the images")
+    parser.add_argument('--repeats', type=int, default=3, help="timed runs of each warm refresh")
+    parser.add_argument('--slides', type=int, default=50, help="slide changes timed")
+    parser.add_argument('--display-size', type=parseSize, default=(1920, 1080), help="WIDTHxHEIGHT of the display")
+    parser.add_argument('--dwell', type=float, default=0.5, help="seconds each slide stays up")
+    parser.add_argument('--drive-files', type=int, default=50, help="files in the fake Drive folder")
+    parser.add_argument('--drive-file-size', type=float, default=2.0, help="MB per fake Drive file")
+    parser.add_argument('--latency', type=float, default=50.0, help="ms of latency per Drive request")
+    parser.add_argument('--bandwidth', type=float, default=0.0, help="MB/s of the Drive link, 0 for unlimited")
+    parser.add_argument('--workers', type=int, default=DOWNLOAD_WORKERS, help="concurrent downloads")
+    parser.add_argument('--work-dir', type=Path, help="scratch directory (default: a temporary one)")
+    parser.add_argument('--output', type=Path, help="file to write the JSON results to (default: stdout)")
+    parser.add_argument('--verbose', action='store_true', help="show the application log")
+    args = parser.parse_args(argv)
+    
+    unknown = set(args.benchmarks) - set(ALL_BENCHMARKS)
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(sorted(unknown))}")
+    return args
+
+def main(argv: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Run the benchmarks selected on the command line and report the results.
+    
+    Args:
+        argv: The arguments, sys.argv if None.
+    
+    Returns:
+        The report.
+    """
+    args = parseArgs(argv)
+    if not args.verbose:
+        logger.setLevel(logging.WARNING)
+    
+    names = args.benchmarks or list(ALL_BENCHMARKS)
+    results = runBenchmarks(
+        names,
+        work_dir=args.work_dir,
+        images=args.images,
+        image_size=args.image_size,
+        image_format=args.image_format,
+        repeats=args.repeats,
+        slides=args.slides,
+        display_size=args.display_size,
+        dwell=args.dwell,
+        drive_files=args.drive_files,
+        drive_file_size=int(args.drive_file_size * 1024 * 1024),
+        latency=args.latency / 1000,
+        bandwidth=args.bandwidth * 1024 * 1024,
+        workers=args.workers,
+    )
+    
+    parameters = {key: value for key, value in vars(args).items() if key not in ('output', 'verbose')}
+    report = {
+        'version': __version__,
+        'commit': getCommit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'parameters': json.loads(json.dumps(parameters, default=str)),
+        'results': results,
+        'peak_rss_mb': getPeakRss(),
+    }
+    
+    text = json.dumps(report, indent=2)
+    if args.output:
+        args.output.write_text(text + '\n', encoding='utf-8')
+    else:
+        print(text)
+    return report
+
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
@@ -0,0 +1,352 @@
+"""In-process stand-in for the Google Drive v3 API."""
+import hashlib
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import httplib2
+
+from ..services import drive_sync as drive_sync_module
+from ..services.drive_sync import DriveSync
+
+# Folder the fake Drive files live in
+FAKE_FOLDER_ID = "fake-folder"
+
+class FakeLink:
+    """A network link with a fixed round-trip latency and shared bandwidth.
+    
+    Concurrent transfers queue behind each other, so adding download
+    workers helps with latency but not beyond the bandwidth.
+    """
+    
+    def __init__(self, latency: float = 0.0, bandwidth: float = 0.0):
+        """Initialize the link.
+        
+        Args:
+            latency: Seconds added to every request.
+            bandwidth: Bytes per second, or 0 for unlimited.
+        """
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.requests = 0
+        self.bytes = 0
+        self._free_at = 0.0
+        self._lock = threading.Lock()
+    
+    def transfer(self, nbytes: int) -> None:
+        """Block for as long as a request carrying nbytes takes.
+        
+        Args:
+            nbytes: Size of the response body.
+        """
+        with self._lock:
+            self.requests += 1
+            self.bytes += nbytes
+            now = time.monotonic()
+            done = now + self.latency
+            if self.bandwidth > 0:
+                # The body arrives after the latency, once earlier bodies are through
+                start = max(done, self._free_at)
+                self._free_at = start + nbytes / self.bandwidth
+                done = self._free_at
+        
+        delay = done - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+
+class _FakeRequest:
+    """A prepared API call returning a fixed response."""
+    
+    def __init__(self, link: FakeLink, response: Dict[str, Any]):
+        """Initialize the request.
+        
+        Args:
+            link: Link the response travels over.
+            response: The decoded JSON response.
+        """
+        self.link = link
+        self.response = response
+    
+    def execute(self, num_retries: int = 0) -> Dict[str, Any]:
+        """Send the request.
+        
+        Args:
+            num_retries: Ignored; the fake never fails.
+        
+        Returns:
+            The response.
+        """
+        # Metadata responses are small; count a nominal size per file
+        self.link.transfer(256 * (1 + len(self.response.get('files', []))))
+        return self.response
+
+
+class _FakeBatch:
+    """A batch of API calls answered in one round-trip, like BatchHttpRequest."""
+    
+    def __init__(self, link: FakeLink, callback: Callable[[str, Any, Optional[Exception]], None]):
+        """Initialize the batch.
+        
+        Args:
+            link: Link the batch travels over.
+            callback: Called with (request_id, response, exception) per call.
+        """
+        self.link = link
+        self.callback = callback
+        self.requests: List[Tuple[str, _FakeRequest]] = []
+    
+    def add(self, request: _FakeRequest, request_id: str) -> None:
+        """Add a call to the batch.
+        
+        Args:
+            request: The prepared call.
+            request_id: ID passed to the callback with its response.
+        """
+        self.requests.append((request_id, request))
+    
+    def execute(self) -> None:
+        """Send the batch and pass each response to the callback."""
+        self.link.transfer(256 * len(self.requests))
+        for request_id, request in self.requests:
+            self.callback(request_id, request.response, None)
+
+
+class _FakeMediaHttp:
+    """Serves ranged GET requests for file contents like httplib2.Http."""
+    
+    def __init__(self, drive: 'FakeDriveService'):
+        """Initialize the transport.
+        
+        Args:
+            drive: The fake Drive holding the files.
+        """
+        self.drive = drive
+    
+    def request(self, uri: str, method: str = 'GET', body=None, headers=None, **kwargs):
+        """Answer a media download request.
+        
+        Args:
+            uri: fake://<file id> of the file to download.
+            method: The HTTP method.
+            body: Unused request body.
+            headers: Request headers, with an optional range.
+        
+        Returns:
+            A tuple of (response, content).
+        """
+        data = self.drive.contents[uri[len('fake://'):]]
+        start, end = 0, len(data) - 1
+        match = re.match(r'bytes=(\d+)-(\d*)', (headers or {}).get('range', ''))
+        if match:
+            start = int(match.group(1))
+            if match.group(2):
+                end = min(int(match.group(2)), len(data) - 1)
+        
+        if start >= len(data):
+            return httplib2.Response({'status': 416, 'content-range': f"bytes */{len(data)}"}), b''
+        
+        content = data[start:end + 1]
+        self.drive.link.transfer(len(content))
+        return httplib2.Response({
+            'status': 206,
+            'content-range': f"bytes {start}-{end}/{len(data)}",
+        }), content
+
+
+class _FakeMediaRequest:
+    """The parts of googleapiclient's HttpRequest that MediaIoBaseDownload uses."""
+    
+    def __init__(self, drive: 'FakeDriveService', file_id: str):
+        """Initialize the request.
+        
+        Args:
+            drive: The fake Drive holding the files.
+            file_id: ID of the file to download.
+        """
+        self.uri = f"fake://{file_id}"
+        self.headers: Dict[str, str] = {}
+        self.http = _FakeMediaHttp(drive)
+
+
+class _FakeFiles:
+    """The files() resource of the fake Drive."""
+    
+    def __init__(self, drive: 'FakeDriveService'):
+        """Initialize the resource.
+        
+        Args:
+            drive: The fake Drive holding the files.
+        """
+        self.drive = drive
+    
+    def list(self, pageSize: int = 100, pageToken: Optional[str] = None, **kwargs) -> _FakeRequest:
+        """List one page of the folder.
+        
+        Args:
+            pageSize: Files per page.
+            pageToken: Offset into the listing, as returned by the last page.
+            **kwargs: Query arguments, ignored.
+        
+        Returns:
+            The request for the page.
+        """
+        start = int(pageToken or 0)
+        response: Dict[str, Any] = {'files': self.drive.file_records[start:start + pageSize]}
+        if start + pageSize < len(self.drive.file_records):
+            response['nextPageToken'] = str(start + pageSize)
+        return _FakeRequest(self.drive.link, response)
+    
+    def get(self, fileId: str, **kwargs) -> _FakeRequest:
+        """Get the metadata of a file or the folder.
+        
+        Args:
+            fileId: ID of the file.
+            **kwargs: Other arguments, ignored.
+        
+        Returns:
+            The request for the metadata.
+        """
+        for file in self.drive.file_records:
+            if file['id'] == fileId:
+                return _FakeRequest(self.drive.link, dict(file))
+        return _FakeRequest(self.drive.link, {'id': fileId})
+    
+    def get_media(self, fileId: str, **kwargs) -> _FakeMediaRequest:
+        """Prepare a download of a file's contents.
+        
+        Args:
+            fileId: ID of the file.
+            **kwargs: Other arguments, ignored.
+        
+        Returns:
+            The media request, for MediaIoBaseDownload.
+        """
+        return _FakeMediaRequest(self.drive, fileId)
+
+
+class _FakeChanges:
+    """The changes() resource of the fake Drive, which never has changes."""
+    
+    def __init__(self, drive: 'FakeDriveService'):
+        """Initialize the resource.
+        
+        Args:
+            drive: The fake Drive.
+        """
+        self.drive = drive
+    
+    def getStartPageToken(self, **kwargs) -> _FakeRequest:
+        """Get the current change feed position.
+        
+        Returns:
+            The request for the token.
+        """
+        return _FakeRequest(self.drive.link, {'startPageToken': '1'})
+    
+    def list(self, **kwargs) -> _FakeRequest:
+        """List the changes since a position.
+        
+        Returns:
+            The request for an empty page of changes.
+        """
+        return _FakeRequest(self.drive.link, {'changes': [], 'newStartPageToken': '1'})
+
+
+class FakeDriveService:
+    """A Drive folder held in memory, answering the calls DriveSync makes.
+    
+    Implements files().list/get/get_media, changes() and batches on top of a
+    FakeLink, so listings and downloads take the time a real link with the
+    same latency and bandwidth would.
+    """
+    
+    def __init__(self, contents: List[bytes], link: Optional[FakeLink] = None, extension: str = '.jpg'):
+        """Initialize the fake Drive.
+        
+        Args:
+            contents: The contents of the files in the folder.
+            link: Link the responses travel over.
+            extension: File extension of the file names.
+        """
+        self.link = link or FakeLink()
+        self.contents: Dict[str, bytes] = {}
+        self.file_records: List[Dict[str, Any]] = []
+        for i, data in enumerate(contents):
+            file_id = f"file{i:06d}"
+            self.contents[file_id] = data
+            self.file_records.append({
+                'id': file_id,
+                'name': f"drive_{i:06d}{extension}",
+                'mimeType': 'image/jpeg',
+                'size': str(len(data)),
+                'md5Checksum': hashlib.md5(data).hexdigest(),
+                'modifiedTime': '2024-01-01T00:00:00.000Z',
+            })
+    
+    def files(self) -> _FakeFiles:
+        """Get the files resource.
+        
+        Returns:
+            The files resource.
+        """
+        return _FakeFiles(self)
+    
+    def changes(self) -> _FakeChanges:
+        """Get the changes resource.
+        
+        Returns:
+            The changes resource.
+        """
+        return _FakeChanges(self)
+    
+    def new_batch_http_request(self, callback: Callable[[str, Any, Optional[Exception]], None]) -> _FakeBatch:
+        """Start a batch of calls.
+        
+        Args:
+            callback: Called with (request_id, response, exception) per call.
+        
+        Returns:
+            The empty batch.
+        """
+        return _FakeBatch(self.link, callback)
+
+
+class FakeDriveSync(DriveSync):
+    """DriveSync talking to a FakeDriveService instead of Google Drive."""
+    
+    def __init__(self, service: FakeDriveService, images_dir: Path, **kwargs):
+        """Initialize the sync against the fake Drive.
+        
+        Args:
+            service: The fake Drive.
+            images_dir: Directory to download to.
+            **kwargs: Further DriveSync arguments.
+        """
+        super().__init__(folder_id=FAKE_FOLDER_ID, images_dir=images_dir, **kwargs)
+        self.fake_service = service
+    
+    def authenticate(self) -> bool:
+        """Connect to the fake Drive without credentials.
+        
+        Returns:
+            True.
+        """
+        # The downloads still go through the real MediaIoBaseDownload
+        drive_sync_module._importGoogleApi()
+        self.service = self.fake_service
+        self.is_authenticated = True
+        return True
+    
+    def _buildService(self, http: Optional[Any] = None) -> FakeDriveService:
+        """Get the client for a download worker.
+        
+        Args:
+            http: Unused transport.
+        
+        Returns:
+            The fake Drive, which is safe to share between threads.
+        """
+        return self.fake_service
\ No newline at end of file
@@ -0,0 +1,85 @@
+"""Synthetic image libraries for the benchmarks."""
+import random
+from io import BytesIO
+from pathlib import Path
+from typing import List, Tuple
+from PIL import Image, ImageDraw
+
+# Pillow format name and file extension of each supported library format
+LIBRARY_FORMATS = {
+    'jpeg': ('JPEG', '.jpg'),
+    'png': ('PNG', '.png'),
+    'bmp': ('BMP', '.bmp'),
+    'gif': ('GIF', '.gif'),
+}
+
+def renderImage(size: Tuple[int, int], image_format: str, seed: int) -> bytes:
+    """Render a synthetic photo-like image.
+    
+    Blocks of color with a few shapes compress roughly like photos, unlike
+    flat or random images, so decode and transfer costs are realistic.
+    
+    Args:
+        size: The image (width, height).
+        image_format: Key of LIBRARY_FORMATS.
+        seed: Seed making each image different.
+    
+    Returns:
+        The encoded image.
+    """
+    pil_format, _ = LIBRARY_FORMATS[image_format]
+    rng = random.Random(seed)
+    width, height = size
+    
+    image = Image.new('RGB', (width, height), tuple(rng.randrange(256) for _ in range(3)))
+    draw = ImageDraw.Draw(image)
+    for _ in range(24):
+        x, y = rng.randrange(width), rng.randrange(height)
+        w, h = rng.randrange(1, width // 2 + 2), rng.randrange(1, height // 2 + 2)
+        color = tuple(rng.randrange(256) for _ in range(3))
+        if rng.random() < 0.5:
+            draw.rectangle((x, y, x + w, y + h), fill=color)
+        else:
+            draw.ellipse((x, y, x + w, y + h), fill=color)
+    
+    # Fine noise on top keeps the encoder from compressing it away
+    noise = Image.effect_noise((width, height), 40).convert('RGB')
+    image = Image.blend(image, noise, 0.15)
+    
+    buffer = BytesIO()
+    if pil_format == 'JPEG':
+        image.save(buffer, format=pil_format, quality=90)
+    else:
+        image.save(buffer, format=pil_format)
+    return buffer.getvalue()
+
+def generateLibrary(directory: Path,
+                    count: int,
+                    size: Tuple[int, int] = (4000, 3000),
+                    image_format: str = 'jpeg',
+                    variants: int = 8) -> List[Path]:
+    """Fill a directory with synthetic images.
+    
+    Only a few distinct images are rendered, as rendering large images is
+    slow; the library repeats them under different names.
+    
+    Args:
+        directory: Directory to write the images to.
+        count: Number of image files.
+        size: The image (width, height).
+        image_format: Key of LIBRARY_FORMATS.
+        variants: Number of distinct images rendered.
+    
+    Returns:
+        The paths of the images, sorted.
+    """
+    _, extension = LIBRARY_FORMATS[image_format]
+    directory.mkdir(parents=True, exist_ok=True)
+    rendered = [renderImage(size, image_format, seed) for seed in range(max(1, min(variants, count)))]
+    
+    paths = []
+    for i in range(count):
+        path = directory / f"image_{i:05d}{extension}"
+        path.write_bytes(rendered[i % len(rendered)])
+        paths.append(path)
+    return paths
\ No newline at end of file
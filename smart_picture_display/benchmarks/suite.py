@@ -0,0 +1,308 @@
+"""The benchmarks: image list refresh, slide changes and Drive sync."""
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from ..services.download_scheduler import DownloadScheduler
+from ..services.image_index import ImageIndex
+from ..services.image_loader import ImageLoader
+from ..services.sync_state import SyncState
+from ..utils.storage import StoragePlanner
+from .fake_drive import FakeDriveService, FakeDriveSync, FakeLink
+from .library import LIBRARY_FORMATS, generateLibrary
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+def getPeakRss() -> Optional[float]:
+    """Get the peak resident set size of the process so far.
+    
+    Returns:
+        The peak RSS in MB, or None where it cannot be measured.
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Reported in bytes on macOS and in kilobytes elsewhere
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def summarizeTimes(samples: List[float]) -> Dict[str, Any]:
+    """Summarize durations as milliseconds and percentiles.
+    
+    Args:
+        samples: Durations in seconds.
+    
+    Returns:
+        A dictionary with the count, mean, p50, p90, p99 and max.
+    """
+    if not samples:
+        return {'count': 0}
+    
+    ordered = sorted(samples)
+    
+    def percentile(p: float) -> float:
+        return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))] * 1000
+    
+    return {
+        'count': len(ordered),
+        'mean_ms': statistics.mean(ordered) * 1000,
+        'p50_ms': percentile(50),
+        'p90_ms': percentile(90),
+        'p99_ms': percentile(99),
+        'max_ms': ordered[-1] * 1000,
+    }
+
+def timeCall(func: Callable[[], Any]) -> float:
+    """Time a single call.
+    
+    Args:
+        func: The function to call.
+    
+    Returns:
+        The duration in seconds.
+    """
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+def benchRefresh(work_dir: Path,
+                 count: int,
+                 image_size: Tuple[int, int],
+                 image_format: str,
+                 repeats: int = 3) -> Dict[str, Any]:
+    """Time building and refreshing the image list of a synthetic library.
+    
+    Args:
+        work_dir: Scratch directory.
+        count: Number of images in the library.
+        image_size: The image (width, height).
+        image_format: Key of LIBRARY_FORMATS.
+        repeats: Number of timed runs of each warm operation.
+    
+    Returns:
+        The refresh results, in seconds.
+    """
+    images_dir = work_dir / "library"
+    generateLibrary(images_dir, count, image_size, image_format)
+    index_path = work_dir / "refresh_index.db"
+    
+    # Every file is inspected and indexed on the first scan
+    start = time.perf_counter()
+    loader = ImageLoader(images_dir, ImageIndex(index_path))
+    cold_scan = time.perf_counter() - start
+    
+    warm_refresh = [timeCall(loader.refreshImageList) for _ in range(repeats)]
+    index_load = [timeCall(loader.loadFromIndex) for _ in range(repeats)]
+    change_scan = [timeCall(loader.scanForChanges) for _ in range(repeats)]
+    
+    return {
+        'images': loader.getImageCount(),
+        'cold_scan_s': cold_scan,
+        'warm_refresh_s': statistics.median(warm_refresh),
+        'index_load_s': statistics.median(index_load),
+        'scan_for_changes_s': statistics.median(change_scan),
+        'peak_rss_mb': getPeakRss(),
+    }
+
+def benchSlides(images_dir: Path,
+                slides: int,
+                display_size: Tuple[int, int],
+                dwell: float) -> Dict[str, Any]:
+    """Time decoding images and changing slides in the carousel.
+    
+    Runs on the Qt "offscreen" platform unless QT_QPA_PLATFORM is set.
+    
+    Args:
+        images_dir: Directory holding the images, e.g. from benchRefresh.
+        slides: Number of slide changes timed.
+        display_size: Size (width, height) of the image display area.
+        dwell: Seconds each slide stays up, giving the prefetcher time to
+            decode the next ones as in a slideshow.
+    
+    Returns:
+        Decode, direct display and slide change latency percentiles, and
+        prefetch and cache statistics.
+    """
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    from PyQt6.QtCore import QEventLoop, QSize, QTimer
+    from PyQt6.QtWidgets import QApplication
+    
+    from ..gui.carousel import ImageCarousel, ImageDisplay
+    from ..services.prefetcher import decodeImage
+    
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    loader = ImageLoader(images_dir, ImageIndex(Path(':memory:')))
+    paths = loader.image_paths[:slides]
+    target_size = QSize(*display_size)
+    
+    # Decoding for the display size alone, as the prefetcher does
+    decode_times = [timeCall(lambda: decodeImage(path, target_size)) for path in paths]
+    
+    # Loading and scaling on the GUI thread without any prefetching
+    display = ImageDisplay()
+    display.resize(target_size)
+    set_image_times = [timeCall(lambda: display.setImage(path)) for path in paths]
+    display.deleteLater()
+    
+    # Slide changes through the carousel, from nextImage to the image on screen
+    carousel = ImageCarousel(loader)
+    carousel.resize(display_size[0], display_size[1])
+    carousel.show()
+    
+    loop = QEventLoop()
+    timeout = QTimer()
+    timeout.setSingleShot(True)
+    timeout.timeout.connect(loop.quit)
+    carousel.imageChanged.connect(loop.quit)
+    carousel.prefetcher.imageFailed.connect(loop.quit)
+    
+    def runEvents(seconds: float) -> None:
+        # Quits early only if an image is shown, which dwelling never expects
+        timeout.start(int(seconds * 1000))
+        loop.exec()
+        timeout.stop()
+    
+    runEvents(max(dwell, 0.5))
+    change_times = []
+    for _ in range(min(slides, loader.getImageCount())):
+        start = time.perf_counter()
+        carousel.nextImage()
+        expected = loader.getCurrentImage()
+        if carousel.image_display.current_image_path != expected:
+            runEvents(30)
+        change_times.append(time.perf_counter() - start)
+        if dwell:
+            runEvents(dwell)
+    
+    results = {
+        'images': len(paths),
+        'decode': summarizeTimes(decode_times),
+        'set_image': summarizeTimes(set_image_times),
+        'slide_change': summarizeTimes(change_times),
+        'prefetch': carousel.prefetcher.getStats(),
+        'image_cache': carousel.image_cache.getStats(),
+        'peak_rss_mb': getPeakRss(),
+    }
+    carousel.close()
+    carousel.prefetcher.pool.waitForDone()
+    carousel.deleteLater()
+    app.processEvents()
+    return results
+
+def benchSync(work_dir: Path,
+              files: int,
+              file_size: int,
+              latency: float,
+              bandwidth: float,
+              workers: int) -> Dict[str, Any]:
+    """Time a full sync from a fake Drive and a repeat sync with nothing to do.
+    
+    Args:
+        work_dir: Scratch directory.
+        files: Number of files in the fake Drive folder.
+        file_size: Size of each file in bytes.
+        latency: Seconds of latency per request.
+        bandwidth: Bytes per second of the link, or 0 for unlimited.
+        workers: Number of concurrent downloads.
+    
+    Returns:
+        The sync results.
+    """
+    # Distinct contents, so checksums differ, without generating each file
+    block = os.urandom(file_size)
+    contents = [i.to_bytes(8, 'big') + block[8:] for i in range(files)]
+    link = FakeLink(latency, bandwidth)
+    service = FakeDriveService(contents, link)
+    
+    images_dir = work_dir / "synced"
+    drive_sync = FakeDriveSync(
+        service, images_dir,
+        sync_mode="full",
+        sync_state=SyncState(work_dir / "sync_state.json"),
+        download_scheduler=DownloadScheduler(workers),
+        storage_planner=StoragePlanner(images_dir),
+    )
+    
+    start = time.perf_counter()
+    synced, errors = drive_sync.syncDriveImages()
+    first_sync = time.perf_counter() - start
+    stats = drive_sync.last_transfer_stats
+    first_requests = link.requests
+    
+    resync = timeCall(drive_sync.syncDriveImages)
+    
+    elapsed = stats.getElapsed() if stats else first_sync
+    transferred = stats.bytes if stats else 0
+    return {
+        'files': files,
+        'file_size_bytes': file_size,
+        'synced': synced,
+        'errors': errors,
+        'sync_s': first_sync,
+        'files_per_s': synced / elapsed if elapsed else 0.0,
+        'mb_per_s': transferred / (1024 * 1024) / elapsed if elapsed else 0.0,
+        'requests': first_requests,
+        'resync_s': resync,
+        'resync_requests': link.requests - first_requests,
+        'peak_rss_mb': getPeakRss(),
+    }
+
+def runBenchmarks(names: List[str],
+                  work_dir: Optional[Path] = None,
+                  images: int = 200,
+                  image_size: Tuple[int, int] = (4000, 3000),
+                  image_format: str = 'jpeg',
+                  repeats: int = 3,
+                  slides: int = 50,
+                  display_size: Tuple[int, int] = (1920, 1080),
+                  dwell: float = 0.5,
+                  drive_files: int = 50,
+                  drive_file_size: int = 2 * 1024 * 1024,
+                  latency: float = 0.05,
+                  bandwidth: float = 0.0,
+                  workers: int = 4) -> Dict[str, Any]:
+    """Run a selection of the benchmarks.
+    
+    Args:
+        names: Benchmarks to run: "refresh", "slides" and/or "sync". The
+            slide benchmark uses the library of the refresh benchmark,
+            which is generated if "refresh" is not selected.
+        work_dir: Scratch directory, a temporary one if not given.
+        images: Number of images in the synthetic library.
+        image_size: The image (width, height).
+        image_format: Key of LIBRARY_FORMATS.
+        repeats: Number of timed runs of each warm refresh operation.
+        slides: Number of slide changes timed.
+        display_size: Size (width, height) of the image display area.
+        dwell: Seconds each slide stays up.
+        drive_files: Number of files in the fake Drive folder.
+        drive_file_size: Size of each Drive file in bytes.
+        latency: Seconds of latency per Drive request.
+        bandwidth: Bytes per second of the Drive link, or 0 for unlimited.
+        workers: Number of concurrent downloads.
+    
+    Returns:
+        The results of each benchmark by name.
+    """
+    if image_format not in LIBRARY_FORMATS:
+        raise ValueError(f"Unknown image format: {image_format}")
+    
+    with tempfile.TemporaryDirectory(prefix="spd-bench-") as tmp:
+        work_dir = work_dir or Path(tmp)
+        results: Dict[str, Any] = {}
+        
+        if 'refresh' in names:
+            results['refresh'] = benchRefresh(work_dir, images, image_size, image_format, repeats)
+        if 'slides' in names:
+            if 'refresh' not in names:
+                generateLibrary(work_dir / "library", images, image_size, image_format)
+            results['slides'] = benchSlides(work_dir / "library", slides, display_size, dwell)
+        if 'sync' in names:
+            results['sync'] = benchSync(work_dir, drive_files, drive_file_size, latency, bandwidth, workers)
+        return results
\ No newline at end of file
@@ -8,6 +8,11 @@ IMAGES_DIR = BASE_DIR / "images"
 CACHE_DIR = BASE_DIR / ".cache"
 CREDENTIALS_PATH = BASE_DIR / "credentials.json"
 TOKEN_PATH = BASE_DIR / "token.pickle"
+IMAGE_INDEX_PATH = CACHE_DIR / "image_index.db"
+SYNC_STATE_PATH = CACHE_DIR / "drive_sync_state.json"
+RENDITIONS_DIR = CACHE_DIR / "renditions"
+LAST_IMAGE_PATH = CACHE_DIR / "last_image"
+PROFILE_DIR = CACHE_DIR / "profiles"
 
 # Create directories if they don't exist
 IMAGES_DIR.mkdir(exist_ok=True)
@@ -16,15 +21,64 @@ CACHE_DIR.mkdir(exist_ok=True)
 # Google Drive settings
 DRIVE_FOLDER_ID = "root"  # Default to root, should be overridden by user
 GOOGLE_API_SCOPES = ['https://www.googleapis.com/auth/drive.readonly']
+DRIVE_SYNC_MODE = "changes"  # "changes" to follow the Drive change feed, "full" to re-list every sync
+DRIVE_PAGE_SIZE = 1000  # files requested per Drive listing page (API maximum)
+DOWNLOAD_WORKERS = 4  # concurrent Drive downloads
+DOWNLOAD_CHUNK_SIZE = 4 * 1024 * 1024  # bytes per streamed download request
+DRIVE_MAX_RETRIES = 5  # retries with exponential backoff on 429/5xx responses
+DRIVE_BATCH_SIZE = 100  # metadata requests per Drive batch request (API maximum)
+DRIVE_TOKEN_REFRESH_MARGIN = 600  # seconds before expiry the Drive access token is refreshed in the background
+DRIVE_DOWNLOAD_VARIANT = "original"  # "original" files, or "rendition" to fetch screen-sized copies via thumbnailLink
+DRIVE_RENDITION_SIZE = 1920  # longest edge in pixels of the renditions fetched from Drive
 
 # Application settings
 APP_NAME = "Smart Picture Display"
 SLIDESHOW_INTERVAL = 5  # seconds
+SHUFFLE = False  # play the images in random order, each once per cycle, instead of by name
+SHUFFLE_HISTORY = 1000  # shown images remembered for going back in shuffled order
 SYNC_INTERVAL = 10  # minutes
+FAST_START = True  # show the last image from the image index before scanning, syncing or watching
+DEFERRED_START_TIMEOUT = 3  # seconds to wait for the first image before starting sync and watching anyway
+LAST_IMAGE_SAVE_INTERVAL = 60  # seconds between saves of the displayed image to resume with
 MAX_STORAGE_PERCENT = 50  # maximum percentage of disk to use
+STORAGE_EVICTION_POLICY = "oldest"  # "oldest", "least_recently_displayed" or "largest"
+DOWNLOAD_PRIORITY = "newest"  # "newest" (EXIF capture time, else modified time) or "recently_modified": downloaded first, evicted last
+
+# Prefetch settings
+PREFETCH_AHEAD = 2  # images decoded ahead of the current one
+PREFETCH_BEHIND = 1  # images decoded behind the current one
+PREFETCH_WORKERS = 2  # background decode threads
+
+# Images directory watch settings
+WATCH_MODE = "auto"  # "auto" for inotify via watchdog when installed, "polling", or "off"
+WATCH_DEBOUNCE = 1.0  # seconds without file events before changes are applied
+WATCH_MAX_DELAY = 5.0  # longest changes are held back during a burst of events
+WATCH_POLL_INTERVAL = 2.0  # seconds between directory checks when polling
+
+# Display-sized rendition settings
+RENDITION_FORMAT = "JPEG"  # "JPEG" or "WEBP"
+RENDITION_QUALITY = 90  # encoder quality of the renditions
+RENDITION_WORKERS = 1  # background threads creating renditions
+
+# Decoded image cache settings
+IMAGE_CACHE_MAX_BYTES = 128 * 1024 * 1024  # memory budget for decoded frames
 
 # Supported image extensions
 SUPPORTED_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.bmp'}
+IMAGE_VALIDATION = "deferred"  # "deferred" to check headers at listing and verify in the background, "full" to verify at listing
+VERIFY_BATCH_SIZE = 20  # images fully verified per background batch
+VERIFY_NICENESS = 10  # nice value of the background verification thread
+
+# Metrics settings
+METRICS_PORT = 0  # local HTTP port serving /metrics in the Prometheus text format, 0 to disable
+METRICS_HOST = "127.0.0.1"  # address the metrics endpoint listens on, "0.0.0.0" to allow remote scrapers
+METRICS_SUMMARY_INTERVAL = 15  # minutes between metrics summary log lines, 0 to disable
+
+# Profiling settings (F9 or SIGUSR1 toggles a capture, F10 toggles slow-slide mode)
+PROFILE_TOP_N = 25  # functions and allocation sites listed in the profile summary log
+PROFILE_SLOW_SLIDE_MS = 500  # slide changes slower than this are kept in slow-slide mode
+PROFILE_SLOW_SLIDES = False  # start with slow-slide mode on
 
 # UI settings
-FULLSCREEN_THRESHOLD = 800  # px - If screen height is less than this, use fullscreen 
\ No newline at end of file
+FULLSCREEN_THRESHOLD = 800  # px - If screen height is less than this, use fullscreen
+RESIZE_SETTLE_MS = 200  # ms without resize events before the image is rescaled smoothly 
\ No newline at end of file
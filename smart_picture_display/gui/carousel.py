@@ -1,6 +1,6 @@
 """Image carousel widget for the Smart Picture Display application."""
 from PyQt6.QtCore import Qt, QTimer, pyqtSignal, QSize
-from PyQt6.QtGui import QPixmap, QPalette, QColor, QIcon
+from PyQt6.QtGui import QPixmap, QPalette, QColor, QIcon, QImage
 from PyQt6.QtWidgets import (
     QWidget, QLabel, QVBoxLayout, QHBoxLayout, 
     QPushButton, QSizePolicy, QFrame
@@ -8,13 +8,29 @@ from PyQt6.QtWidgets import (
 from pathlib import Path
 from typing import Optional, Callable
 import os
+import time
 
-from ..config import SLIDESHOW_INTERVAL
+from ..config import SLIDESHOW_INTERVAL, RESIZE_SETTLE_MS, IMAGE_CACHE_MAX_BYTES
+from ..services.image_cache import ImageCache
 from ..services.image_loader import ImageLoader
+from ..services.prefetcher import ImagePrefetcher
+from ..services.rendition_store import RenditionStore
 from ..utils.logger import logger
+from ..utils.metrics import IMAGE_DECODE_SECONDS, IMAGE_SCALE_SECONDS, SLIDE_CHANGE_SECONDS
+from ..utils.profiler import profiler
 
 class ImageDisplay(QLabel):
-    """Custom widget for displaying images with appropriate scaling."""
+    """Custom widget for displaying images with appropriate scaling.
+    
+    While the widget is being resized the image is rescaled with a fast
+    transformation; one smooth rescale follows once the size has settled.
+    Smoothly scaled pixmaps are remembered per image file and size, within
+    the byte budget of the decoded frame cache, so toggling between two
+    sizes does not rescale again even when the image is decoded anew.
+    """
+    
+    # Signal emitted when the display area has settled at a new size
+    resized = pyqtSignal(QSize)
     
     def __init__(self, parent=None):
         """Initialize the image display widget.
@@ -33,7 +49,18 @@ class ImageDisplay(QLabel):
         
         # Current image path and pixmap
         self.current_image_path: Optional[Path] = None
+        self.current_mtime = 0.0
         self.original_pixmap: Optional[QPixmap] = None
+        
+        # Smoothly scaled pixmaps keyed by image path, mtime and widget size
+        self._scaled_pixmaps = ImageCache(IMAGE_CACHE_MAX_BYTES)
+        
+        # Restarted by every resize event; fires once the size has settled
+        self._settled_size = QSize()
+        self._resize_timer = QTimer(self)
+        self._resize_timer.setSingleShot(True)
+        self._resize_timer.setInterval(RESIZE_SETTLE_MS)
+        self._resize_timer.timeout.connect(self._onResizeSettled)
     
     def setImage(self, image_path: Optional[Path]) -> bool:
         """Set the image to display.
@@ -51,32 +78,90 @@ class ImageDisplay(QLabel):
             return False
         
         try:
-            pixmap = QPixmap(str(image_path))
+            with IMAGE_DECODE_SECONDS.time(stage='display'):
+                pixmap = QPixmap(str(image_path))
             if pixmap.isNull():
                 logger.error(f"Failed to load image: {image_path}")
                 return False
             
-            self.current_image_path = image_path
-            self.original_pixmap = pixmap
-            self.updatePixmap()
+            self._setCurrentImage(image_path, pixmap)
             return True
             
         except Exception as e:
             logger.error(f"Error loading image {image_path}: {e}")
             return False
     
-    def updatePixmap(self) -> None:
-        """Update the displayed pixmap with appropriate scaling."""
+    def setDecodedImage(self, image_path: Path, image: QImage) -> bool:
+        """Set an image that has already been decoded, e.g. by the prefetcher.
+        
+        Args:
+            image_path: Path to the image file.
+            image: The decoded image.
+            
+        Returns:
+            True if the image was set successfully, False otherwise.
+        """
+        pixmap = QPixmap.fromImage(image)
+        if pixmap.isNull():
+            logger.error(f"Failed to convert decoded image: {image_path}")
+            return False
+        
+        self._setCurrentImage(image_path, pixmap)
+        return True
+    
+    def _setCurrentImage(self, image_path: Path, pixmap: QPixmap) -> None:
+        """Show a pixmap as the current image.
+        
+        Args:
+            image_path: Path to the image file.
+            pixmap: The full-size pixmap of the image.
+        """
+        try:
+            mtime = image_path.stat().st_mtime
+        except OSError:
+            mtime = 0.0
+        
+        self.current_image_path = image_path
+        self.current_mtime = mtime
+        self.original_pixmap = pixmap
+        self.updatePixmap()
+    
+    def updatePixmap(self, fast: bool = False) -> None:
+        """Update the displayed pixmap with appropriate scaling.
+        
+        Args:
+            fast: Use a fast, lower quality scale that is not remembered,
+                e.g. while the widget is being resized.
+        """
         if not self.original_pixmap:
             return
-            
+        
+        # Images decoded for this size need no scaling at all
+        target_size = self.original_pixmap.size().scaled(self.size(), Qt.AspectRatioMode.KeepAspectRatio)
+        if target_size == self.original_pixmap.size():
+            self.setPixmap(self.original_pixmap)
+            return
+        
+        size = (self.width(), self.height())
+        scaled_pixmap = self._scaled_pixmaps.get(self.current_image_path, self.current_mtime, size)
+        if scaled_pixmap is not None:
+            self.setPixmap(scaled_pixmap)
+            return
+        
         # Scale the pixmap to fit the widget while maintaining aspect ratio
+        transformation = Qt.TransformationMode.FastTransformation if fast else Qt.TransformationMode.SmoothTransformation
+        start = time.perf_counter()
         scaled_pixmap = self.original_pixmap.scaled(
             self.size(),
             Qt.AspectRatioMode.KeepAspectRatio,
-            Qt.TransformationMode.SmoothTransformation
+            transformation
         )
         
+        if not fast:
+            IMAGE_SCALE_SECONDS.observe(time.perf_counter() - start)
+            nbytes = scaled_pixmap.width() * scaled_pixmap.height() * scaled_pixmap.depth() // 8
+            self._scaled_pixmaps.put(self.current_image_path, self.current_mtime, size, scaled_pixmap, nbytes)
+        
         self.setPixmap(scaled_pixmap)
     
     def resizeEvent(self, event) -> None:
@@ -86,7 +171,21 @@ class ImageDisplay(QLabel):
             event: The resize event.
         """
         super().resizeEvent(event)
+        
+        # The first size is final; later ones are debounced
+        if not self._settled_size.isValid():
+            self._onResizeSettled()
+            return
+        
+        self.updatePixmap(fast=True)
+        self._resize_timer.start()
+    
+    def _onResizeSettled(self) -> None:
+        """Scale the image smoothly once resizing has stopped."""
         self.updatePixmap()
+        if self.size() != self._settled_size:
+            self._settled_size = self.size()
+            self.resized.emit(self.size())
 
 
 class ImageCarousel(QWidget):
@@ -95,12 +194,17 @@ class ImageCarousel(QWidget):
     # Signal emitted when the image changes
     imageChanged = pyqtSignal(Path)
     
-    def __init__(self, image_loader: ImageLoader, parent=None):
+    def __init__(self,
+                 image_loader: ImageLoader,
+                 parent=None,
+                 rendition_store: Optional[RenditionStore] = None):
         """Initialize the image carousel.
         
         Args:
             image_loader: The image loader service.
             parent: Parent widget.
+            rendition_store: Store of display-sized renditions to show
+                instead of the originals when available.
         """
         super().__init__(parent)
         self.image_loader = image_loader
@@ -109,10 +213,27 @@ class ImageCarousel(QWidget):
         self.slideshow_timer.timeout.connect(self.nextImage)
         self.slideshow_interval = SLIDESHOW_INTERVAL * 1000  # Convert to milliseconds
         
+        # Decoded frames, dropped when a refresh sees the file change
+        self.image_cache = ImageCache()
+        self.image_loader.addChangeListener(self.image_cache.onImagesChanged)
+        
+        # Background decoding of the images around the current one
+        self.prefetcher = ImagePrefetcher(image_loader, self.image_cache, self,
+                                          rendition_store=rendition_store)
+        self.prefetcher.imageReady.connect(self._onImageReady)
+        self.prefetcher.imageFailed.connect(self._onImageFailed)
+        self._awaiting_image: Optional[Path] = None
+        
+        # When the slide change being waited for started, for its latency
+        self._change_started: Optional[float] = None
+        
+        # Remember when each image was shown for storage eviction
+        self.imageChanged.connect(self.image_loader.image_index.markDisplayed)
+        
         self.setupUI()
         
-        # Load the first image if available
-        self.refreshImages()
+        # Show the loader's current image; its list is already up to date
+        self._displayImages()
     
     def setupUI(self) -> None:
         """Set up the user interface."""
@@ -123,6 +244,7 @@ class ImageCarousel(QWidget):
         
         # Image display
         self.image_display = ImageDisplay(self)
+        self.image_display.resized.connect(self._onDisplayResized)
         layout.addWidget(self.image_display, 1)
         
         # Controls area
@@ -190,20 +312,135 @@ class ImageCarousel(QWidget):
     def refreshImages(self) -> None:
         """Refresh the image list and display the first image."""
         self.image_loader.refreshImageList()
+        self._displayImages()
+    
+    def _displayImages(self) -> None:
+        """Display the current image, or a placeholder if there are no images."""
         if self.image_loader.getImageCount() > 0:
             self.displayCurrentImage()
         else:
-            self.image_display.clear()
-            self.image_display.setText("No images available")
+            self._showNoImages()
+    
+    def _showNoImages(self) -> None:
+        """Show the message that there are no images."""
+        self._awaiting_image = None
+        self.image_display.clear()
+        self.image_display.setText("No images available")
+    
+    def applyImageChanges(self, added: list, removed: list, changed: list) -> None:
+        """Apply an incremental update of the image list.
+        
+        Unlike refreshImages this does not rescan the images directory, and
+        the current image is only redisplayed if it was affected.
+        
+        Args:
+            added: Paths of new, already verified images.
+            removed: Paths of images that are gone.
+            changed: Paths of verified images whose content changed.
+        """
+        previous_image = self.image_loader.getCurrentImage()
+        previous_mtime = self.image_loader.getImageMtime(previous_image) if previous_image else 0.0
+        self.image_loader.applyChanges(added, removed, changed)
+        
+        if self.image_loader.getImageCount() == 0:
+            self._showNoImages()
+        elif (previous_image != self.image_loader.getCurrentImage()
+              or previous_mtime != self.image_loader.getImageMtime(previous_image)):
+            self.displayCurrentImage()
+        else:
+            self.prefetcher.schedule()
     
     def displayCurrentImage(self) -> None:
-        """Display the current image from the loader."""
+        """Display the current image from the loader.
+        
+        Cached and prefetched images are shown immediately. Otherwise the
+        image is decoded in the background and shown once it is ready, so the GUI
+        thread never decodes.
+        """
         current_image = self.image_loader.getCurrentImage()
-        if current_image and self.image_display.setImage(current_image):
-            self.imageChanged.emit(current_image)
+        if not current_image:
+            self._showError()
+            return
+        
+        self._change_started = time.perf_counter()
+        profiler.beginSlide()
+        self.image_display.setToolTip(self.image_loader.getDisplayName(current_image))
+        image = self.prefetcher.take(current_image)
+        if image is not None:
+            self._awaiting_image = None
+            if self.image_display.setDecodedImage(current_image, image):
+                self._recordSlideChange()
+                self.imageChanged.emit(current_image)
+            else:
+                self._showError()
         else:
-            self.image_display.clear()
-            self.image_display.setText("Error loading image")
+            self._awaiting_image = current_image
+            self.prefetcher.request(current_image)
+        
+        self.prefetcher.schedule()
+    
+    def _showError(self) -> None:
+        """Show the image loading error message."""
+        self._awaiting_image = None
+        self._cancelSlideChange()
+        self.image_display.clear()
+        self.image_display.setText("Error loading image")
+    
+    def _onImageReady(self, image_path: Path, image: QImage) -> None:
+        """Show a decoded image if it is the one waiting to be displayed.
+        
+        Args:
+            image_path: Path to the decoded image file.
+            image: The decoded image.
+        """
+        if image_path != self._awaiting_image:
+            return
+        
+        self._awaiting_image = None
+        is_new_image = image_path != self.image_display.current_image_path
+        if self.image_display.setDecodedImage(image_path, image):
+            self._recordSlideChange()
+            if is_new_image:
+                self.imageChanged.emit(image_path)
+        else:
+            self._showError()
+    
+    def _recordSlideChange(self) -> None:
+        """Record the latency of the slide change that just completed, if any."""
+        if self._change_started is not None:
+            latency = time.perf_counter() - self._change_started
+            self._change_started = None
+            SLIDE_CHANGE_SECONDS.observe(latency)
+            profiler.endSlide(latency)
+    
+    def _cancelSlideChange(self) -> None:
+        """Stop timing a slide change that will not complete."""
+        self._change_started = None
+        profiler.cancelSlide()
+    
+    def _onImageFailed(self, image_path: Path) -> None:
+        """Show an error if the image waiting to be displayed failed to decode.
+        
+        Args:
+            image_path: Path to the image file that failed to decode.
+        """
+        if image_path == self._awaiting_image:
+            self._showError()
+    
+    def _onDisplayResized(self, size: QSize) -> None:
+        """Decode for the new display size and refresh the current image.
+        
+        Args:
+            size: The new size of the display area.
+        """
+        self.prefetcher.setTargetSize(size)
+        current_image = self.image_loader.getCurrentImage()
+        if current_image:
+            # Redisplaying at a new size is not a slide change
+            if current_image != self._awaiting_image:
+                self._cancelSlideChange()
+            self._awaiting_image = current_image
+            self.prefetcher.request(current_image)
     
     def nextImage(self) -> None:
         """Display the next image in the sequence."""
@@ -0,0 +1,86 @@
+"""Watches the images directory and reports changes to the GUI."""
+import threading
+from pathlib import Path
+from typing import List
+from PyQt6.QtCore import QObject, pyqtSignal
+
+from ..config import WATCH_MODE
+from ..services.file_watcher import DirectoryWatcher
+from ..services.image_loader import ImageLoader
+from ..services.image_verifier import ImageVerifier
+
+class LibraryWatcher(QObject):
+    """Turns file system events in the images directory into list updates.
+    
+    Batches of touched files arrive on the watcher thread, where they are
+    checked and indexed. Images that later fail full verification in the
+    background are dropped the same way. Only the resulting incremental
+    updates are emitted, so connect filesChanged with a queued connection.
+    """
+    
+    # Signal emitted with the added, removed and changed image paths
+    filesChanged = pyqtSignal(list, list, list)
+    
+    def __init__(self, image_loader: ImageLoader, parent=None, mode: str = WATCH_MODE):
+        """Initialize the library watcher.
+        
+        Args:
+            image_loader: The image loader whose directory to watch.
+            parent: Parent QObject.
+            mode: Watch mode, see DirectoryWatcher.
+        """
+        super().__init__(parent)
+        self.image_loader = image_loader
+        self.watcher = DirectoryWatcher(image_loader.images_dir, self._onFilesTouched, mode=mode)
+        self.verifier = ImageVerifier(image_loader, self._onVerificationFailed)
+    
+    def start(self, catch_up: bool = False) -> bool:
+        """Start watching.
+        
+        Args:
+            catch_up: Also scan the directory once in the background, for
+                an image list that was loaded from the index and may miss
+                changes made while the application was not running.
+        
+        Returns:
+            True if the watcher started, False if watching is turned off.
+        """
+        if catch_up:
+            threading.Thread(target=self._catchUp, name="image-catch-up", daemon=True).start()
+        self.verifier.start()
+        return self.watcher.start()
+    
+    def stop(self) -> None:
+        """Stop watching and verifying."""
+        self.watcher.stop()
+        self.verifier.stop()
+    
+    def _onFilesTouched(self, updated: List[Path], deleted: List[Path]) -> None:
+        """Verify touched files and forward the change to the GUI.
+        
+        Args:
+            updated: Paths of files that were created or modified.
+            deleted: Paths of files that no longer exist.
+        """
+        valid = set(self.image_loader.inspectFiles(updated))
+        
+        # Whether a valid file is new to the list is decided on the GUI thread
+        removed = deleted + [p for p in updated if p not in valid]
+        changed = [p for p in updated if p in valid]
+        
+        if removed or changed:
+            self.filesChanged.emit([], removed, changed)
+    
+    def _catchUp(self) -> None:
+        """Scan the directory and forward any differences to the GUI."""
+        added, removed, changed = self.image_loader.scanForChanges()
+        if added or removed or changed:
+            self.filesChanged.emit(added, removed, changed)
+    
+    def _onVerificationFailed(self, failed: List[Path]) -> None:
+        """Drop images that failed full verification from the list.
+        
+        Args:
+            failed: Paths of the broken images.
+        """
+        self.filesChanged.emit([], failed, [])
\ No newline at end of file
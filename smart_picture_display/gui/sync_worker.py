@@ -0,0 +1,87 @@
+"""Runs Google Drive sync on background threads and reports to the GUI."""
+import threading
+from pathlib import Path
+from typing import List
+from PyQt6.QtCore import QObject, pyqtSignal
+
+from ..services.drive_sync import DriveSync
+from ..services.image_loader import ImageLoader
+from ..utils.logger import logger
+from ..utils.profiler import profiler
+
+class SyncWorker(QObject):
+    """Drives DriveSync from scheduler threads and reports through signals.
+    
+    run() is called on APScheduler or plain worker threads. It never
+    touches widgets; everything the GUI needs is emitted as a signal, which
+    should be connected with a queued connection so the slots run on the
+    GUI thread. Newly downloaded files are verified and indexed on the sync
+    thread, so the carousel only receives an incremental update.
+    """
+    
+    # Signal emitted when a sync starts
+    syncStarted = pyqtSignal()
+    
+    # Signal emitted with the downloads succeeded and failed so far
+    syncProgress = pyqtSignal(int, int)
+    
+    # Signal emitted with the files downloaded and the errors of a finished sync
+    syncFinished = pyqtSignal(int, int)
+    
+    # Signal emitted with the error message when a sync fails
+    syncFailed = pyqtSignal(str)
+    
+    # Signal emitted with the added, removed and changed image paths
+    filesChanged = pyqtSignal(list, list, list)
+    
+    def __init__(self, drive_sync: DriveSync, image_loader: ImageLoader, parent=None):
+        """Initialize the sync worker.
+        
+        Args:
+            drive_sync: The Drive sync service.
+            image_loader: The image loader whose index new files go into.
+            parent: Parent QObject.
+        """
+        super().__init__(parent)
+        self.drive_sync = drive_sync
+        self.image_loader = image_loader
+        self._running = threading.Lock()
+        
+        self.drive_sync.addProgressListener(self.syncProgress.emit)
+        self.drive_sync.addChangeListener(self._onFilesChanged)
+    
+    def run(self) -> None:
+        """Run one sync; does nothing if a sync is already running."""
+        if not self._running.acquire(blocking=False):
+            logger.info("Drive sync already running, skipping")
+            return
+        
+        try:
+            self.syncStarted.emit()
+            with profiler.section():
+                _, errors = self.drive_sync.syncDriveImages()
+            downloaded = self.drive_sync.last_transfer_stats.files
+            self.syncFinished.emit(downloaded, errors)
+        except Exception as e:
+            logger.error(f"Error syncing with Drive: {e}")
+            self.syncFailed.emit(str(e))
+        finally:
+            self._running.release()
+    
+    def _onFilesChanged(self, added: List[Path], removed: List[Path], changed: List[Path]) -> None:
+        """Verify the synced files and forward the change to the GUI.
+        
+        Args:
+            added: Paths of files the sync created.
+            removed: Paths of files the sync deleted.
+            changed: Paths of files the sync replaced.
+        """
+        valid = set(self.image_loader.inspectFiles(added + changed))
+        
+        # A replaced file that is no longer a valid image drops out of the list
+        removed = removed + [p for p in changed if p not in valid]
+        added = [p for p in added if p in valid]
+        changed = [p for p in changed if p in valid]
+        
+        if added or removed or changed:
+            self.filesChanged.emit(added, removed, changed)
\ No newline at end of file
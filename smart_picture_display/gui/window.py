@@ -1,44 +1,83 @@
 """Main application window for the Smart Picture Display."""
 import sys
 import os
+import signal
+import socket
+import time
 from pathlib import Path
-from typing import Optional, Tuple
-from PyQt6.QtCore import Qt, QSize
+from typing import TYPE_CHECKING, Optional, Tuple
+from PyQt6.QtCore import Qt, QSize, QSocketNotifier, QTimer
 from PyQt6.QtGui import QIcon, QGuiApplication
 from PyQt6.QtWidgets import (
     QMainWindow, QApplication, QVBoxLayout, QWidget, 
     QLabel, QStatusBar, QMessageBox
 )
 
-from ..config import APP_NAME, FULLSCREEN_THRESHOLD, SYNC_INTERVAL
+from ..config import (
+    APP_NAME, FULLSCREEN_THRESHOLD, SYNC_INTERVAL, FAST_START,
+    DEFERRED_START_TIMEOUT, LAST_IMAGE_SAVE_INTERVAL, METRICS_PORT, METRICS_SUMMARY_INTERVAL,
+    PROFILE_SLOW_SLIDES
+)
 from ..services.image_loader import ImageLoader
 from ..services.drive_sync import DriveSync
-from ..services.scheduler import TaskScheduler
+from ..services.metrics_server import MetricsServer
+from ..services.rendition_store import RenditionStore
+from ..utils.storage import StoragePlanner
+from ..utils.metrics import logSummary
+from ..utils.profiler import profiler
+from ..utils.startup import StartupTimer, loadLastImage, saveLastImage
 from .carousel import ImageCarousel
+from .library_watcher import LibraryWatcher
+from .sync_worker import SyncWorker
 from ..utils.logger import logger
 
+if TYPE_CHECKING:
+    # apscheduler is imported when the services start, not at startup
+    from ..services.scheduler import TaskScheduler
+
 class MainWindow(QMainWindow):
     """Main application window."""
     
     def __init__(self, 
                  image_loader: ImageLoader, 
-                 drive_sync: DriveSync,
-                 scheduler: TaskScheduler):
+                 drive_sync: Optional[DriveSync] = None,
+                 scheduler: Optional['TaskScheduler'] = None,
+                 rendition_store: Optional[RenditionStore] = None,
+                 startup_timer: Optional[StartupTimer] = None):
         """Initialize the main window.
         
+        Without drive_sync and scheduler the window shows the current image
+        first and creates the services once it is on screen, or after
+        DEFERRED_START_TIMEOUT seconds at the latest.
+        
         Args:
             image_loader: The image loader service.
-            drive_sync: The Drive sync service.
-            scheduler: The task scheduler service.
+            drive_sync: The Drive sync service, or None to create it later.
+            scheduler: The task scheduler service, or None to create it later.
+            rendition_store: Store of screen-sized renditions of the images.
+            startup_timer: Timer to record the startup phases in.
         """
         super().__init__()
         self.image_loader = image_loader
-        self.drive_sync = drive_sync
-        self.scheduler = scheduler
+        self.drive_sync = None
+        self.scheduler = None
+        self.rendition_store = rendition_store
+        self.startup_timer = startup_timer
+        self.library_watcher = None
+        self.sync_worker = None
+        self.metrics_server = None
         self.is_fullscreen = False
+        self._last_image_saved = 0.0
         
+        self.setupRenditions()
         self.setupUI()
-        self.setupSync()
+        self.setupProfiling()
+        self.carousel.imageChanged.connect(self._rememberImage)
+        
+        if drive_sync is not None and scheduler is not None:
+            self.startServices(drive_sync, scheduler)
+        else:
+            self.deferServices()
         
         # Set window state based on screen size
         self.adjustWindowMode()
@@ -56,7 +95,7 @@ class MainWindow(QMainWindow):
         layout.setSpacing(0)
         
         # Create and add image carousel
-        self.carousel = ImageCarousel(self.image_loader)
+        self.carousel = ImageCarousel(self.image_loader, rendition_store=self.rendition_store)
         layout.addWidget(self.carousel)
         
         # Set central widget
@@ -70,8 +109,180 @@ class MainWindow(QMainWindow):
         # Set focus policy for keyboard navigation
         self.setFocusPolicy(Qt.FocusPolicy.StrongFocus)
     
+    def setupProfiling(self) -> None:
+        """Let SIGUSR1 toggle a profile capture, like the F9 key.
+        
+        Python only runs signal handlers between bytecodes, which the Qt
+        event loop never executes while idle. The signal therefore also
+        writes to a socket that a QSocketNotifier watches, waking the
+        event loop so the handler runs right away.
+        """
+        if PROFILE_SLOW_SLIDES:
+            profiler.setSlowSlides(True)
+        
+        self._signal_socket = None
+        if not hasattr(signal, 'SIGUSR1'):
+            return
+        
+        try:
+            read_socket, write_socket = socket.socketpair()
+            read_socket.setblocking(False)
+            write_socket.setblocking(False)
+            signal.set_wakeup_fd(write_socket.fileno())
+        except (OSError, ValueError) as e:
+            logger.warning(f"Profiling signal not available: {e}")
+            return
+        
+        self._signal_socket = read_socket
+        self._signal_write_socket = write_socket
+        self._signal_notifier = QSocketNotifier(read_socket.fileno(), QSocketNotifier.Type.Read, self)
+        self._signal_notifier.activated.connect(self._drainSignalSocket)
+        signal.signal(signal.SIGUSR1, lambda signum, frame: self.toggleProfiling())
+    
+    def _drainSignalSocket(self) -> None:
+        """Discard the wake-up bytes written for received signals."""
+        try:
+            while self._signal_socket.recv(64):
+                pass
+        except OSError:
+            pass
+    
+    def toggleProfiling(self) -> None:
+        """Start a profile capture, or stop it and write the dumps."""
+        if profiler.isCapturing():
+            path = profiler.stop()
+            message = f"Profile written to {path}" if path else "Profiling stopped"
+        else:
+            profiler.start()
+            message = "Profiling..."
+        self.status_bar.showMessage(message, 5000)
+    
+    def toggleSlowSlideProfiling(self) -> None:
+        """Turn recording the profiles of slow slide changes on or off."""
+        profiler.setSlowSlides(not profiler.slow_slides)
+        state = "on" if profiler.slow_slides else "off"
+        self.status_bar.showMessage(f"Slow-slide profiling {state}", 5000)
+    
+    def setupRenditions(self) -> None:
+        """Size the renditions for the screen.
+        
+        Existing renditions are used right away; bringing them up to date
+        is left to startServices.
+        """
+        screen = QGuiApplication.primaryScreen()
+        if not self.rendition_store or not screen:
+            return
+        
+        # Only the size; rebuilding here would compete with the first decode
+        size = screen.size() * screen.devicePixelRatio()
+        self.rendition_store.setSize((size.width(), size.height()))
+        screen.geometryChanged.connect(self._onScreenResized)
+    
+    def startServices(self, drive_sync: DriveSync, scheduler: 'TaskScheduler', catch_up: bool = False) -> None:
+        """Start the background services.
+        
+        Args:
+            drive_sync: The Drive sync service.
+            scheduler: The task scheduler service.
+            catch_up: Rescan the images directory in the background, for
+                an image list that was loaded from the image index.
+        """
+        self.drive_sync = drive_sync
+        self.scheduler = scheduler
+        if self.rendition_store and self.rendition_store.isEnabled():
+            self.rendition_store.rebuild(self.image_loader.image_paths)
+        self.setupWatcher(catch_up)
+        self.setupSync()
+        self.setupMetrics()
+    
+    def deferServices(self) -> None:
+        """Create and start the services once the first image is shown."""
+        self.carousel.imageChanged.connect(self._startDeferredServices)
+        
+        # Nothing will be shown without images, so there is no point waiting
+        timeout = DEFERRED_START_TIMEOUT * 1000 if self.image_loader.getImageCount() else 0
+        QTimer.singleShot(int(timeout), self._startDeferredServices)
+    
+    def _startDeferredServices(self) -> None:
+        """Create and start the services unless that already happened."""
+        if self.drive_sync is not None:
+            return
+        
+        self.carousel.imageChanged.disconnect(self._startDeferredServices)
+        if self.startup_timer:
+            self.startup_timer.mark("first image")
+        
+        drive_sync, scheduler = createServices(self.image_loader, self.rendition_store)
+        self.startServices(drive_sync, scheduler, catch_up=True)
+        
+        if self.startup_timer:
+            self.startup_timer.mark("services")
+            self.startup_timer.report()
+    
+    def _rememberImage(self, image_path: Path) -> None:
+        """Remember the displayed image to resume with on the next start.
+        
+        Saved at most every LAST_IMAGE_SAVE_INTERVAL seconds to spare the
+        SD card, and when the window closes.
+        
+        Args:
+            image_path: Path of the displayed image.
+        """
+        now = time.monotonic()
+        if now - self._last_image_saved >= LAST_IMAGE_SAVE_INTERVAL:
+            self._last_image_saved = now
+            saveLastImage(image_path)
+    
+    def _onScreenResized(self) -> None:
+        """Rebuild the renditions if the screen resolution changed."""
+        screen = QGuiApplication.primaryScreen()
+        if not screen:
+            return
+        
+        size = screen.size() * screen.devicePixelRatio()
+        if self.rendition_store.setSize((size.width(), size.height())):
+            self.rendition_store.rebuild(self.image_loader.image_paths)
+    
+    def setupWatcher(self, catch_up: bool = False) -> None:
+        """Set up incremental updates from the images directory.
+        
+        Args:
+            catch_up: Rescan the images directory once in the background.
+        """
+        self.library_watcher = LibraryWatcher(self.image_loader, self)
+        self.library_watcher.filesChanged.connect(
+            self.carousel.applyImageChanges, Qt.ConnectionType.QueuedConnection
+        )
+        if self.rendition_store:
+            self.library_watcher.filesChanged.connect(
+                self._updateRenditions, Qt.ConnectionType.QueuedConnection
+            )
+        self.library_watcher.start(catch_up)
+    
+    def _updateRenditions(self, added: list, removed: list, changed: list) -> None:
+        """Update renditions of images that changed outside of a sync.
+        
+        Args:
+            added: Paths of new images.
+            removed: Paths of images that are gone.
+            changed: Paths of images whose content changed.
+        """
+        for path in removed:
+            self.rendition_store.remove(path)
+        for path in added + changed:
+            self.rendition_store.schedule(path)
+    
     def setupSync(self) -> None:
         """Set up Google Drive synchronization."""
+        # Sync runs on scheduler threads; results come back as queued signals
+        self.sync_worker = SyncWorker(self.drive_sync, self.image_loader, self)
+        queued = Qt.ConnectionType.QueuedConnection
+        self.sync_worker.syncStarted.connect(self._onSyncStarted, queued)
+        self.sync_worker.syncProgress.connect(self._onSyncProgress, queued)
+        self.sync_worker.syncFinished.connect(self._onSyncFinished, queued)
+        self.sync_worker.syncFailed.connect(self._onSyncFailed, queued)
+        self.sync_worker.filesChanged.connect(self.carousel.applyImageChanges, queued)
+        
         # Schedule periodic sync
         self.scheduler.scheduleTask(
             "drive_sync",
@@ -80,21 +291,66 @@ class MainWindow(QMainWindow):
             run_immediately=True
         )
     
+    def setupMetrics(self) -> None:
+        """Serve the metrics and log a summary of them periodically."""
+        if METRICS_PORT:
+            self.metrics_server = MetricsServer()
+            self.metrics_server.start()
+        
+        if METRICS_SUMMARY_INTERVAL:
+            self.scheduler.scheduleTask(
+                "metrics_summary",
+                logSummary,
+                minutes=METRICS_SUMMARY_INTERVAL,
+                run_immediately=False
+            )
+    
     def syncDrive(self) -> None:
-        """Synchronize images from Google Drive."""
-        try:
-            self.status_bar.showMessage("Syncing with Google Drive...")
-            files_synced, errors = self.drive_sync.syncDriveImages()
-            
-            if files_synced > 0:
-                self.carousel.refreshImages()
-                self.status_bar.showMessage(f"Sync completed: {files_synced} new images downloaded", 5000)
-            else:
-                self.status_bar.showMessage("Sync completed: No new images", 5000)
-                
-        except Exception as e:
-            logger.error(f"Error syncing with Drive: {e}")
-            self.status_bar.showMessage(f"Sync error: {str(e)}", 5000)
+        """Synchronize images from Google Drive.
+        
+        Safe to call from any thread; the GUI is updated through the sync
+        worker's signals.
+        """
+        self.sync_worker.run()
+    
+    def _onSyncStarted(self) -> None:
+        """Show that a sync is running."""
+        self.status_bar.showMessage("Syncing with Google Drive...")
+    
+    def _onSyncProgress(self, downloaded: int, failed: int) -> None:
+        """Show the progress of the running sync.
+        
+        Args:
+            downloaded: Number of files processed successfully so far.
+            failed: Number of files that failed so far.
+        """
+        message = f"Syncing with Google Drive... {downloaded} files"
+        if failed:
+            message += f", {failed} errors"
+        self.status_bar.showMessage(message)
+    
+    def _onSyncFinished(self, downloaded: int, errors: int) -> None:
+        """Show the result of a finished sync.
+        
+        Args:
+            downloaded: Number of files downloaded.
+            errors: Number of errors encountered.
+        """
+        if downloaded > 0:
+            message = f"Sync completed: {downloaded} new images downloaded"
+        else:
+            message = "Sync completed: No new images"
+        if errors:
+            message += f" ({errors} errors)"
+        self.status_bar.showMessage(message, 5000)
+    
+    def _onSyncFailed(self, error: str) -> None:
+        """Show a sync error.
+        
+        Args:
+            error: The error message.
+        """
+        self.status_bar.showMessage(f"Sync error: {error}", 5000)
     
     def adjustWindowMode(self) -> None:
         """Adjust window mode (fullscreen/windowed) based on screen size."""
@@ -151,6 +407,10 @@ class MainWindow(QMainWindow):
         
         if key == Qt.Key.Key_F11 or key == Qt.Key.Key_F:
             self.toggleFullscreen()
+        elif key == Qt.Key.Key_F9:
+            self.toggleProfiling()
+        elif key == Qt.Key.Key_F10:
+            self.toggleSlowSlideProfiling()
         elif key == Qt.Key.Key_Escape and self.is_fullscreen:
             self.toggleFullscreen(False)
         else:
@@ -163,26 +423,94 @@ class MainWindow(QMainWindow):
             event: The close event.
         """
         # Shut down the scheduler
-        if hasattr(self, 'scheduler'):
+        if self.scheduler:
             self.scheduler.stop()
+        
+        # Stop refreshing the Drive credentials
+        if self.drive_sync:
+            self.drive_sync.close()
+        
+        # Stop watching the images directory
+        if self.library_watcher:
+            self.library_watcher.stop()
+        
+        # Stop serving metrics
+        if self.metrics_server:
+            self.metrics_server.stop()
+        
+        # Write out a capture that is still running
+        if profiler.isCapturing():
+            profiler.stop()
+        if self._signal_socket:
+            signal.set_wakeup_fd(-1)
+        
+        # Resume with the current image next time
+        current_image = self.image_loader.getCurrentImage()
+        if current_image:
+            saveLastImage(current_image)
+        
+        # Drop queued rendition work
+        if self.rendition_store:
+            self.rendition_store.shutdown()
+        
+        # Persist the display history used for storage eviction
+        self.image_loader.image_index.flushDisplayTimes()
             
         super().closeEvent(event)
 
 
+def createServices(image_loader: ImageLoader,
+                   rendition_store: Optional[RenditionStore] = None) -> Tuple[DriveSync, 'TaskScheduler']:
+    """Create the Drive sync and task scheduler services.
+    
+    Args:
+        image_loader: The image loader service.
+        rendition_store: Store of screen-sized renditions of the images.
+    
+    Returns:
+        A tuple of (drive_sync, scheduler).
+    """
+    from ..services.scheduler import TaskScheduler
+    
+    storage_planner = StoragePlanner(
+        display_times=lambda: image_loader.image_index.getDisplayTimes(image_loader.images_dir)
+    )
+    drive_sync = DriveSync(storage_planner=storage_planner, rendition_store=rendition_store)
+    # Loaded with the services rather than at startup, as it can be large
+    image_loader.manifest = drive_sync.state
+    return drive_sync, TaskScheduler()
+
+
 def runApplication() -> None:
     """Initialize and run the application."""
+    startup_timer = StartupTimer()
+    
     # Create QApplication instance
     app = QApplication(sys.argv)
     app.setApplicationName(APP_NAME)
+    startup_timer.mark("qt")
     
-    # Initialize services
-    image_loader = ImageLoader()
-    drive_sync = DriveSync()
-    scheduler = TaskScheduler()
+    # With FAST_START the list comes from the image index and the
+    # slideshow resumes where it stopped; the directory is rescanned later
+    image_loader = ImageLoader(scan=not FAST_START)
+    if FAST_START:
+        image_loader.setCurrentImage(loadLastImage())
+    rendition_store = RenditionStore()
+    startup_timer.mark("image list")
     
     # Create and show the main window
-    main_window = MainWindow(image_loader, drive_sync, scheduler)
+    if FAST_START:
+        main_window = MainWindow(image_loader, rendition_store=rendition_store,
+                                 startup_timer=startup_timer)
+    else:
+        drive_sync, scheduler = createServices(image_loader, rendition_store)
+        startup_timer.mark("services")
+        main_window = MainWindow(image_loader, drive_sync, scheduler, rendition_store,
+                                 startup_timer=startup_timer)
     main_window.show()
+    startup_timer.mark("window")
+    if not FAST_START:
+        startup_timer.report()
     
     # Run the application
     sys.exit(app.exec()) 
\ No newline at end of file
@@ -0,0 +1,96 @@
+"""Background refresh of OAuth credentials before they expire."""
+import threading
+from datetime import datetime, timezone
+from typing import Any, Callable, Optional
+
+from ..config import DRIVE_TOKEN_REFRESH_MARGIN
+
+# Longest wait between expiry checks, so that a clock that stood still,
+# e.g. while the device was suspended, does not delay a refresh for long
+MAX_WAIT = 300
+
+# Wait before trying again after a failed refresh
+RETRY_DELAY = 60
+
+def getSecondsToExpiry(credentials: Any) -> Optional[float]:
+    """Get the time left until credentials expire.
+    
+    Args:
+        credentials: google-auth credentials, whose expiry is naive UTC.
+    
+    Returns:
+        Seconds until the access token expires, or None if it does not.
+    """
+    expiry = getattr(credentials, 'expiry', None)
+    if expiry is None:
+        return None
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    return (expiry - now).total_seconds()
+
+
+class CredentialRefresher:
+    """Refreshes credentials on a daemon thread ahead of their expiry.
+    
+    google-auth refreshes an access token only once a request finds it
+    expired, so that request, and whatever waits on it, stalls for the
+    token round-trip. Refreshing a margin ahead of the expiry keeps the
+    token valid for every request instead.
+    """
+    
+    def __init__(self,
+                 credentials: Any,
+                 refresh: Callable[[], bool],
+                 margin: float = DRIVE_TOKEN_REFRESH_MARGIN):
+        """Initialize the refresher.
+        
+        Args:
+            credentials: The credentials to keep fresh.
+            refresh: Refreshes the credentials, returning True on success.
+            margin: Seconds before the expiry to refresh at.
+        """
+        self.credentials = credentials
+        self.margin = margin
+        self._refresh = refresh
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+    
+    def start(self) -> None:
+        """Start refreshing in the background."""
+        if self._thread is not None:
+            return
+        
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="drive-token-refresh", daemon=True)
+        self._thread.start()
+    
+    def stop(self) -> None:
+        """Stop refreshing and wait for the thread to finish."""
+        if self._thread is None:
+            return
+        
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+    
+    def isExpiring(self) -> bool:
+        """Check whether the credentials are due for a refresh.
+        
+        Returns:
+            True if they expire within the margin.
+        """
+        remaining = getSecondsToExpiry(self.credentials)
+        return remaining is not None and remaining <= self.margin
+    
+    def _run(self) -> None:
+        """Wait for each refresh to become due and do it."""
+        delay = 0.0
+        while not self._stop.wait(delay):
+            if self.isExpiring() and not self._refresh():
+                delay = RETRY_DELAY
+                continue
+            
+            remaining = getSecondsToExpiry(self.credentials)
+            if remaining is None:
+                delay = MAX_WAIT
+            else:
+                delay = min(max(remaining - self.margin, RETRY_DELAY), MAX_WAIT)
\ No newline at end of file
@@ -0,0 +1,68 @@
+"""Scores deciding which Drive files are downloaded first and kept longest."""
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Optional, Union
+
+from ..utils.logger import logger
+
+# Scores a Drive file record, or its record in the sync state; higher
+# scores are downloaded first and evicted last
+DownloadScorer = Callable[[Dict[str, Any]], float]
+
+# Format of the EXIF capture time Drive reports in imageMediaMetadata.time
+CAPTURE_TIME_FORMAT = '%Y:%m:%d %H:%M:%S'
+
+def getCaptureTime(file: Dict[str, Any]) -> Optional[float]:
+    """Get when a photo was taken, from the EXIF data Drive extracted.
+    
+    Args:
+        file: The Drive file record.
+    
+    Returns:
+        The capture time as a Unix timestamp, taking the camera's local
+        time as UTC, or None if the photo has none.
+    """
+    value = (file.get('imageMediaMetadata') or {}).get('time')
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, CAPTURE_TIME_FORMAT).replace(tzinfo=timezone.utc).timestamp()
+    except ValueError:
+        return None  # e.g. "0000:00:00 00:00:00" from cameras without a clock
+
+def getModifiedTime(file: Dict[str, Any]) -> Optional[float]:
+    """Get when a Drive file was last modified.
+    
+    Args:
+        file: The Drive file record.
+    
+    Returns:
+        The modification time as a Unix timestamp, or None if unknown.
+    """
+    value = file.get('modifiedTime')
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
+    except ValueError:
+        return None
+
+DOWNLOAD_SCORERS: Dict[str, DownloadScorer] = {
+    "newest": lambda file: getCaptureTime(file) or getModifiedTime(file) or 0.0,
+    "recently_modified": lambda file: getModifiedTime(file) or 0.0,
+}
+
+def getScorer(scorer: Union[str, DownloadScorer]) -> DownloadScorer:
+    """Resolve a download priority setting to a scoring function.
+    
+    Args:
+        scorer: Name of an entry in DOWNLOAD_SCORERS, or a scoring function.
+    
+    Returns:
+        The scoring function.
+    """
+    if callable(scorer):
+        return scorer
+    if scorer in DOWNLOAD_SCORERS:
+        return DOWNLOAD_SCORERS[scorer]
+    logger.warning(f"Unknown download priority '{scorer}', using 'newest'")
+    return DOWNLOAD_SCORERS["newest"]
\ No newline at end of file
@@ -0,0 +1,161 @@
+"""Concurrent scheduling of Drive downloads with bounded parallelism."""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+from ..config import DOWNLOAD_WORKERS
+from ..utils.logger import logger
+
+class DownloadStats:
+    """Thread-safe aggregate transfer statistics for one sync."""
+    
+    def __init__(self):
+        """Initialize the statistics and start the clock."""
+        self.files = 0
+        self.bytes = 0
+        self.errors = 0
+        self.started = time.monotonic()
+        self.finished: Optional[float] = None
+        self._lock = threading.Lock()
+    
+    def recordDownload(self, nbytes: int) -> None:
+        """Record a completed file transfer.
+        
+        Args:
+            nbytes: Number of bytes transferred.
+        """
+        with self._lock:
+            self.files += 1
+            self.bytes += nbytes
+    
+    def recordErrors(self, count: int = 1) -> None:
+        """Record failed file transfers.
+        
+        Args:
+            count: Number of failed transfers.
+        """
+        with self._lock:
+            self.errors += count
+    
+    def finish(self) -> None:
+        """Stop the clock."""
+        self.finished = time.monotonic()
+    
+    def getElapsed(self) -> float:
+        """Get the elapsed transfer time.
+        
+        Returns:
+            Seconds since the statistics were created, up to finish().
+        """
+        end = self.finished if self.finished is not None else time.monotonic()
+        return max(end - self.started, 1e-6)
+    
+    def getSummary(self) -> Dict[str, float]:
+        """Get the aggregate throughput.
+        
+        Returns:
+            A dictionary with file and byte counts, elapsed seconds,
+            files per second and megabytes per second.
+        """
+        elapsed = self.getElapsed()
+        return {
+            'files': self.files,
+            'bytes': self.bytes,
+            'errors': self.errors,
+            'seconds': elapsed,
+            'files_per_second': self.files / elapsed,
+            'mb_per_second': self.bytes / elapsed / (1024 * 1024),
+        }
+    
+    def logSummary(self) -> None:
+        """Log the aggregate throughput."""
+        summary = self.getSummary()
+        logger.info(
+            f"Transferred {summary['files']} files ({summary['bytes'] / (1024 * 1024):.1f} MB) "
+            f"in {summary['seconds']:.1f}s: {summary['files_per_second']:.2f} files/s, "
+            f"{summary['mb_per_second']:.2f} MB/s, {summary['errors']} errors"
+        )
+
+
+class DownloadScheduler:
+    """Runs downloads on a bounded pool of worker threads.
+    
+    Files are pulled lazily from an iterable, such as a streaming Drive
+    listing, and no more than a couple of files per worker are queued at a
+    time so the listing is consumed at the pace of the downloads.
+    """
+    
+    def __init__(self, workers: int = DOWNLOAD_WORKERS):
+        """Initialize the scheduler.
+        
+        Args:
+            workers: Maximum number of concurrent downloads.
+        """
+        self.workers = max(1, workers)
+    
+    def run(self,
+            files: Iterable[Dict[str, Any]],
+            download: Callable[[Dict[str, Any]], bool],
+            should_stop: Optional[Callable[[], bool]] = None,
+            progress: Optional[Callable[[int, int], None]] = None) -> Tuple[int, int, bool]:
+        """Download files concurrently.
+        
+        Args:
+            files: Drive file metadata of the files to download.
+            download: Function downloading one file, returning True on success.
+            should_stop: Checked after every finished download; when it
+                returns True no further downloads are started.
+            progress: Called with the number of downloads succeeded and
+                failed so far after every finished download.
+        
+        Returns:
+            A tuple of (number of files downloaded, number of errors,
+            whether the run was stopped early).
+        """
+        succeeded = 0
+        failed = 0
+        stopped = False
+        in_flight: Dict[Future, Dict[str, Any]] = {}
+        max_in_flight = self.workers * 2
+        
+        def collect() -> None:
+            # Wait for at least one download to finish and account for it
+            nonlocal succeeded, failed, stopped
+            done, _ = wait(list(in_flight), return_when=FIRST_COMPLETED)
+            for future in done:
+                file = in_flight.pop(future)
+                if future.cancelled():
+                    continue
+                try:
+                    success = future.result()
+                except Exception as e:
+                    logger.error(f"Error downloading {file.get('name')}: {e}")
+                    success = False
+                
+                if success:
+                    succeeded += 1
+                else:
+                    failed += 1
+                
+                if progress:
+                    progress(succeeded, failed)
+                
+                if not stopped and should_stop and should_stop():
+                    stopped = True
+                    # Drop queued downloads that have not started yet
+                    for pending in in_flight:
+                        pending.cancel()
+        
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="drive-download") as pool:
+            for file in files:
+                while len(in_flight) >= max_in_flight and not stopped:
+                    collect()
+                if stopped:
+                    break
+                in_flight[pool.submit(download, file)] = file
+            
+            while in_flight:
+                collect()
+        
+        return succeeded, failed, stopped
\ No newline at end of file
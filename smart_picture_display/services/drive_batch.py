@@ -0,0 +1,134 @@
+"""Batched Drive API calls, many requests per HTTP round-trip."""
+import random
+import time
+from typing import Any, Callable, Dict, Tuple
+
+from ..config import DRIVE_BATCH_SIZE, DRIVE_MAX_RETRIES
+from ..utils.logger import logger
+from ..utils.metrics import DRIVE_API_CALLS
+
+# HTTP statuses of batch items and whole batches worth retrying
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Reasons of 403 responses that are rate limits rather than missing permissions
+RATE_LIMIT_REASONS = (b'rateLimitExceeded', b'userRateLimitExceeded')
+
+def _isRetryable(error: Exception) -> bool:
+    """Check whether a failed request may succeed when sent again.
+    
+    Args:
+        error: The exception the request failed with.
+    
+    Returns:
+        True for rate limits and server errors.
+    """
+    resp = getattr(error, 'resp', None)
+    if resp is None:
+        # Transport errors, e.g. a dropped connection or a timeout
+        return isinstance(error, OSError)
+    
+    status = int(resp.status)
+    if status == 403:
+        content = getattr(error, 'content', b'') or b''
+        return any(reason in content for reason in RATE_LIMIT_REASONS)
+    return status in RETRY_STATUSES
+
+
+class DriveBatcher:
+    """Sends Drive API requests in batches and retries the failed ones.
+    
+    A Drive batch carries up to 100 calls in one HTTP request, each with
+    its own response. Items that fail with a rate limit or server error
+    are collected and sent again, in new batches after an exponential
+    backoff, while the items that succeeded are kept.
+    """
+    
+    def __init__(self,
+                 batch_size: int = DRIVE_BATCH_SIZE,
+                 max_retries: int = DRIVE_MAX_RETRIES,
+                 sleep: Callable[[float], None] = time.sleep):
+        """Initialize the batcher.
+        
+        Args:
+            batch_size: Requests per batch, at most 100.
+            max_retries: Times a failed item is sent again.
+            sleep: Function waiting between retries.
+        """
+        self.batch_size = max(1, min(batch_size, 100))
+        self.max_retries = max_retries
+        self._sleep = sleep
+    
+    def execute(self, service: Any, requests: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Exception]]:
+        """Send requests in batches.
+        
+        Args:
+            service: The Drive service the requests were made with.
+            requests: Prepared requests (e.g. files().get(...)) by a key
+                unique among them, such as the file ID.
+        
+        Returns:
+            A tuple of (responses by key, errors by key). Each key is in
+            exactly one of them.
+        """
+        results: Dict[str, Any] = {}
+        errors: Dict[str, Exception] = {}
+        pending = dict(requests)
+        
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                delay = min(2 ** (attempt - 1), 32) + random.random()
+                logger.info(f"Retrying {len(pending)} failed Drive requests in {delay:.1f}s")
+                self._sleep(delay)
+            
+            keys = list(pending)
+            failed: Dict[str, Exception] = {}
+            for start in range(0, len(keys), self.batch_size):
+                self._executeBatch(service, {key: pending[key] for key in keys[start:start + self.batch_size]},
+                                   results, failed)
+            
+            # Items that cannot succeed are given up on right away
+            for key, error in failed.items():
+                if not _isRetryable(error):
+                    errors[key] = error
+            pending = {key: requests[key] for key in failed if key not in errors}
+            if not pending:
+                break
+        
+        for key in pending:
+            errors[key] = failed[key]
+        if errors:
+            logger.warning(f"{len(errors)} of {len(requests)} batched Drive requests failed")
+        return results, errors
+    
+    def _executeBatch(self,
+                      service: Any,
+                      requests: Dict[str, Any],
+                      results: Dict[str, Any],
+                      failed: Dict[str, Exception]) -> None:
+        """Send one batch, sorting the responses into results and failures.
+        
+        Args:
+            service: The Drive service.
+            requests: At most batch_size requests by key.
+            results: Receives the responses by key.
+            failed: Receives the errors by key.
+        """
+        def collect(key: str, response: Any, exception: Exception) -> None:
+            if exception is None:
+                results[key] = response
+            else:
+                failed[key] = exception
+        
+        batch = service.new_batch_http_request(callback=collect)
+        for key, request in requests.items():
+            batch.add(request, request_id=key)
+        
+        DRIVE_API_CALLS.inc(method='batch')
+        try:
+            batch.execute()
+        except Exception as e:
+            # The whole batch failed; every item that did not answer is retried with it
+            logger.warning(f"Drive batch request failed: {e}")
+            for key in requests:
+                if key not in results and key not in failed:
+                    failed[key] = e
\ No newline at end of file
@@ -1,26 +1,118 @@
 """Service for synchronizing images from Google Drive."""
 import os
-import io
+import re
+import hashlib
+import json
+import math
 import pickle
+import random
+import threading
 import time
+from contextlib import contextmanager
 from pathlib import Path
-from typing import List, Dict, Any, Optional, Tuple
+from types import SimpleNamespace
+from typing import Callable, List, Dict, Any, Iterable, Iterator, Optional, Set, Tuple, Union
 import mimetypes
 
-import google.auth.exceptions
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaIoBaseDownload
-from googleapiclient.errors import HttpError
-
 from ..config import (
     IMAGES_DIR, CREDENTIALS_PATH, TOKEN_PATH, 
-    DRIVE_FOLDER_ID, GOOGLE_API_SCOPES, SUPPORTED_EXTENSIONS
+    DRIVE_FOLDER_ID, GOOGLE_API_SCOPES, SUPPORTED_EXTENSIONS,
+    DRIVE_SYNC_MODE, DRIVE_PAGE_SIZE, DRIVE_MAX_RETRIES, DOWNLOAD_CHUNK_SIZE,
+    DRIVE_DOWNLOAD_VARIANT, DRIVE_RENDITION_SIZE, DOWNLOAD_PRIORITY
 )
 from ..utils.logger import logger
-from ..utils.storage import hasAvailableStorage, cleanupOldestImages
+from ..utils.metrics import (
+    DOWNLOAD_ERRORS, DOWNLOADED_BYTES, DOWNLOADED_FILES, DRIVE_API_CALLS, SYNC_SECONDS, SYNCS
+)
+from ..utils.profiler import profiler
+from ..utils.storage import StoragePlanner
+from .credential_refresher import CredentialRefresher
+from .download_priority import DownloadScorer, getScorer
+from .download_scheduler import DownloadScheduler, DownloadStats
+from .drive_batch import DriveBatcher, _isRetryable
+from .rendition_store import RenditionStore
+from .sync_state import SyncState
+
+# The Google API client libraries take long to import on slow storage, so
+# they are imported by _importGoogleApi when Drive is first used
+RefreshError = Request = InstalledAppFlow = build = MediaIoBaseDownload = HttpError = None
+AuthorizedHttp = HttpRequest = build_http = build_from_document = get_static_doc = None
+
+# The parsed Drive v3 discovery document, shared by every client built
+_discovery_document: Optional[Dict[str, Any]] = None
+
+def _importGoogleApi() -> None:
+    """Import the Google API client libraries into the module namespace."""
+    global RefreshError, Request, InstalledAppFlow, build, MediaIoBaseDownload, HttpError
+    global AuthorizedHttp, HttpRequest, build_http, build_from_document, get_static_doc
+    if HttpError is not None:
+        return
+    
+    from google.auth.exceptions import RefreshError
+    from google.auth.transport.requests import Request
+    from google_auth_httplib2 import AuthorizedHttp
+    from google_auth_oauthlib.flow import InstalledAppFlow
+    from googleapiclient.discovery import build, build_from_document
+    from googleapiclient.discovery_cache import get_static_doc
+    from googleapiclient.http import HttpRequest, MediaIoBaseDownload, build_http
+    from googleapiclient.errors import HttpError
+
+def _getDiscoveryDocument() -> Optional[Dict[str, Any]]:
+    """Get the Drive v3 discovery document bundled with the client library.
+    
+    Returns:
+        The parsed document, or None if the library has no copy of it.
+    """
+    global _discovery_document
+    if _discovery_document is None:
+        content = get_static_doc('drive', 'v3')
+        if content is None:
+            return None
+        _discovery_document = json.loads(content)
+    return _discovery_document
+
+# Callback receiving (added, removed, changed) local image paths after a sync
+ChangeListener = Callable[[List[Path], List[Path], List[Path]], None]
+
+# Callback receiving (files done, errors) while a sync is downloading
+ProgressListener = Callable[[int, int], None]
+
+# HTTP statuses returned by the Changes API for an expired or unknown page token
+INVALID_TOKEN_STATUSES = {400, 404, 410}
+
+# HTTP statuses after which a partial download cannot be resumed
+DISCARD_PARTIAL_STATUSES = {404, 410, 416}
+
+# Suffix of files that are still being downloaded
+PARTIAL_SUFFIX = '.part'
+
+# Fields requested for each change in the Drive change feed
+CHANGE_FIELDS = (
+    'nextPageToken, newStartPageToken, '
+    'changes(fileId, removed, file(id, name, mimeType, size, md5Checksum, modifiedTime, parents, trashed, '
+    'thumbnailLink, imageMediaMetadata(width, height, time)))'
+)
+
+# Fields requested for each file, in listings and metadata lookups
+FILE_FIELDS = (
+    'id, name, mimeType, size, md5Checksum, modifiedTime, thumbnailLink, imageMediaMetadata(width, height, time)'
+)
+
+# Fields requested for each file in a folder listing
+LIST_FIELDS = f'nextPageToken, files({FILE_FIELDS})'
+
+# Local copies of Drive files: the file itself, or a screen-sized copy Drive renders
+VARIANT_ORIGINAL = 'original'
+VARIANT_RENDITION = 'rendition'
+
+# Size parameter at the end of a thumbnailLink, e.g. "=s220"
+THUMBNAIL_SIZE_PATTERN = re.compile(r'=s\d+$')
+
+# Extensions of blobs, so the same content under e.g. .jpg and .jpeg is stored once
+BLOB_EXTENSIONS = {'.jpeg': '.jpg'}
+
+# Rough size of Drive's JPEG renditions, for planning storage before they arrive
+RENDITION_BYTES_PER_PIXEL = 0.4
 
 class DriveSync:
     """Handles synchronization of images from Google Drive."""
@@ -29,7 +121,15 @@ class DriveSync:
                  folder_id: str = DRIVE_FOLDER_ID,
                  credentials_path: Path = CREDENTIALS_PATH,
                  token_path: Path = TOKEN_PATH,
-                 images_dir: Path = IMAGES_DIR):
+                 images_dir: Path = IMAGES_DIR,
+                 sync_mode: str = DRIVE_SYNC_MODE,
+                 sync_state: Optional[SyncState] = None,
+                 download_scheduler: Optional[DownloadScheduler] = None,
+                 storage_planner: Optional[StoragePlanner] = None,
+                 rendition_store: Optional[RenditionStore] = None,
+                 download_variant: str = DRIVE_DOWNLOAD_VARIANT,
+                 rendition_size: int = DRIVE_RENDITION_SIZE,
+                 download_priority: Union[str, DownloadScorer] = DOWNLOAD_PRIORITY):
         """Initialize the Drive sync service.
         
         Args:
@@ -37,14 +137,76 @@ class DriveSync:
             credentials_path: Path to the Google API credentials file.
             token_path: Path to save the authentication token.
             images_dir: Directory to save downloaded images.
+            sync_mode: "changes" to follow the Drive change feed between
+                syncs, "full" to list the whole folder on every sync.
+            sync_state: Persistent change-feed state, loaded from the
+                default location if not given.
+            download_scheduler: Scheduler running concurrent downloads.
+            storage_planner: Planner deciding which local images to evict
+                to make room for each batch of downloads.
+            rendition_store: Store of display-sized renditions, updated
+                as soon as a file is downloaded or removed.
+            download_variant: "original" to download the files, or
+                "rendition" to download copies Drive scales to
+                rendition_size, falling back to the original for files
+                without one.
+            rendition_size: Longest edge in pixels of the copies
+                downloaded in "rendition" mode.
+            download_priority: Name of an entry in DOWNLOAD_SCORERS, or a
+                function scoring file records; the highest-scored files
+                are downloaded first and local images scored lower are
+                evicted to make room for them.
         """
         self.folder_id = folder_id
         self.credentials_path = credentials_path
         self.token_path = token_path
         self.images_dir = images_dir
+        self.sync_mode = sync_mode
+        self.state = sync_state or SyncState()
+        self.downloader = download_scheduler or DownloadScheduler()
+        self.planner = storage_planner or StoragePlanner(images_dir)
+        self.batcher = DriveBatcher()
+        self.renditions = rendition_store
+        self.download_variant = download_variant
+        self.rendition_size = rendition_size
+        self.scorer = getScorer(download_priority)
         self.service = None
+        self.credentials = None
         self.is_authenticated = False
         self.last_sync_time = 0
+        self.last_listing_complete = False
+        self.last_transfer_stats: Optional[DownloadStats] = None
+        
+        # Download workers each get their own client, as the HTTP transport
+        # is not thread-safe. Clients go back to a pool when a worker is
+        # done with them, so that later syncs reuse their connections.
+        self._thread_local = threading.local()
+        self._clients_lock = threading.Lock()
+        self._idle_clients: List[SimpleNamespace] = []
+        self._refresher: Optional[CredentialRefresher] = None
+        self._credentials_lock = threading.Lock()
+        
+        # Serializes the fallback planning done when a download does not fit
+        # the current batch budget
+        self._storage_lock = threading.Lock()
+        
+        # Blobs planned for download in the running sync, which must not be
+        # evicted before they are recorded, and files skipped for lack of room
+        self._planned: Set[Path] = set()
+        self._skipped = 0
+        
+        # Downloads of the same blob wait for each other
+        self._blob_locks_lock = threading.Lock()
+        self._blob_locks: Dict[Path, threading.Lock] = {}
+        
+        # Local files touched by the running sync, reported to listeners
+        self._change_listeners: List[ChangeListener] = []
+        self._progress_listeners: List[ProgressListener] = []
+        self._changes_lock = threading.Lock()
+        self._added: Set[Path] = set()
+        self._removed: Set[Path] = set()
+        self._changed: Set[Path] = set()
+        self._transfer_stats = DownloadStats()
         
         # Ensure the images directory exists
         self.images_dir.mkdir(parents=True, exist_ok=True)
@@ -55,6 +217,7 @@ class DriveSync:
         Returns:
             True if authentication succeeded, False otherwise.
         """
+        _importGoogleApi()
         creds = None
         
         # Load existing token, if it exists
@@ -71,7 +234,7 @@ class DriveSync:
         elif creds and creds.expired and creds.refresh_token:
             try:
                 creds.refresh(Request())
-            except google.auth.exceptions.RefreshError as e:
+            except RefreshError as e:
                 logger.error(f"Failed to refresh token: {e}")
                 creds = None
         else:
@@ -89,155 +252,1374 @@ class DriveSync:
                 return False
         
         # Save the credentials for next run
-        try:
-            with open(self.token_path, 'wb') as token:
-                pickle.dump(creds, token)
-        except Exception as e:
-            logger.warning(f"Failed to save token: {e}")
+        self._saveToken(creds)
         
         # Build the service
         try:
-            self.service = build('drive', 'v3', credentials=creds)
+            self.credentials = creds
+            self.service = self._buildService()
+            self._thread_local = threading.local()
+            with self._clients_lock:
+                self._idle_clients = []
             self.is_authenticated = True
             logger.info("Successfully authenticated with Google Drive")
-            return True
         except Exception as e:
             logger.error(f"Failed to build Drive service: {e}")
             self.is_authenticated = False
             return False
+        
+        # Keep the access token valid so that no request waits for a refresh
+        if self._refresher is not None:
+            self._refresher.stop()
+        self._refresher = CredentialRefresher(creds, self._refreshCredentials)
+        self._refresher.start()
+        return True
     
-    def listDriveImages(self) -> List[Dict[str, Any]]:
-        """List all images in the configured Google Drive folder.
+    def close(self) -> None:
+        """Stop refreshing the credentials and drop the pooled clients."""
+        if self._refresher is not None:
+            self._refresher.stop()
+            self._refresher = None
+        with self._clients_lock:
+            self._idle_clients = []
+    
+    def _saveToken(self, creds: Any) -> None:
+        """Save the credentials for the next run.
+        
+        Args:
+            creds: The credentials to save.
+        """
+        try:
+            with open(self.token_path, 'wb') as token:
+                pickle.dump(creds, token)
+        except Exception as e:
+            logger.warning(f"Failed to save token: {e}")
+    
+    def _refreshCredentials(self) -> bool:
+        """Refresh the access token ahead of its expiry.
+        
+        Called on the refresher thread, and on the sync thread when a sync
+        starts with the token about to expire.
         
         Returns:
-            A list of file metadata for images in the Drive folder.
+            True if the token was refreshed.
         """
+        with self._credentials_lock:
+            # Another thread may have refreshed it while this one waited
+            if self._refresher is not None and not self._refresher.isExpiring():
+                return True
+            try:
+                self.credentials.refresh(Request())
+            except Exception as e:
+                logger.warning(f"Failed to refresh Drive credentials: {e}")
+                return False
+            self._saveToken(self.credentials)
+        
+        logger.debug("Refreshed Drive credentials")
+        return True
+    
+    def _buildService(self, http: Optional[Any] = None) -> Any:
+        """Build a Drive API client from the current credentials.
+        
+        The client is built from the discovery document bundled with the
+        library, parsed once, so no discovery request is made.
+        
+        Args:
+            http: Authorized transport for the client, a new one if not given.
+        
+        Returns:
+            A Drive v3 service object.
+        """
+        http = http or self._buildHttp()
+        document = _getDiscoveryDocument()
+        if document is None:
+            return build('drive', 'v3', http=http)
+        return build_from_document(document, http=http)
+    
+    def _buildHttp(self) -> Any:
+        """Build an authorized HTTP transport.
+        
+        Returns:
+            An httplib2-based transport keeping its connections alive
+            between requests.
+        """
+        return AuthorizedHttp(self.credentials, http=build_http())
+    
+    def _getClient(self) -> SimpleNamespace:
+        """Get the clients of the calling thread.
+        
+        Returns:
+            The clients leased by the thread, or otherwise its own, with
+            service and http built when first used.
+        """
+        client = getattr(self._thread_local, 'client', None)
+        if client is None:
+            client = SimpleNamespace(service=None, http=None)
+            self._thread_local.client = client
+        return client
+    
+    @contextmanager
+    def _leaseClient(self) -> Iterator[None]:
+        """Give the calling thread a pooled client for a block of work.
+        
+        Worker threads come and go with each sync; the clients, with their
+        open connections, outlive them in the pool.
+        """
+        if getattr(self._thread_local, 'client', None) is not None:
+            yield
+            return
+        
+        with self._clients_lock:
+            client = self._idle_clients.pop() if self._idle_clients else None
+        self._thread_local.client = client or SimpleNamespace(service=None, http=None)
+        try:
+            yield
+        finally:
+            client = self._thread_local.client
+            self._thread_local.client = None
+            with self._clients_lock:
+                self._idle_clients.append(client)
+    
+    def _getService(self) -> Any:
+        """Get the Drive client to use on the calling thread.
+        
+        Returns:
+            The main service on the main thread, otherwise a client owned
+            or leased by the calling worker thread.
+        """
+        if threading.current_thread() is threading.main_thread():
+            return self.service
+        
+        client = self._getClient()
+        if client.service is None:
+            client.service = self._buildService(self._getHttp(client))
+        return client.service
+    
+    def _getHttp(self, client: SimpleNamespace) -> Any:
+        """Get the authorized transport of a client, building it if needed.
+        
+        Args:
+            client: The clients of the calling thread.
+        
+        Returns:
+            The transport, shared by its service and media requests.
+        """
+        if client.http is None:
+            client.http = self._buildHttp()
+        return client.http
+    
+    def listDriveImages(self) -> Iterator[Dict[str, Any]]:
+        """List all images in the configured Google Drive folder.
+        
+        Pages are requested one at a time by following nextPageToken, and
+        files are yielded as soon as their page arrives so callers can start
+        working before the listing is finished. last_listing_complete tells
+        whether the last listing reached the final page.
+        
+        Yields:
+            File metadata for each image in the Drive folder.
+        """
+        self.last_listing_complete = False
+        
         if not self.is_authenticated and not self.authenticate():
             logger.error("Not authenticated, cannot list Drive images")
-            return []
+            return
+        
+        # File mimetypes to search for
+        query = f"'{self.folder_id}' in parents and (mimeType contains 'image/') and trashed = false"
+        page_token = None
+        file_count = 0
         
         try:
-            # File mimetypes to search for
-            query = f"'{self.folder_id}' in parents and (mimeType contains 'image/') and trashed = false"
-            
-            # List files in the folder
-            results = self.service.files().list(
-                q=query,
-                spaces='drive',
-                fields='files(id, name, mimeType, size, modifiedTime)'
-            ).execute()
-            
-            files = results.get('files', [])
-            if not files:
-                logger.info(f"No images found in Drive folder {self.folder_id}")
-                return []
+            while True:
+                # List one page of files in the folder
+                DRIVE_API_CALLS.inc(method='files.list')
+                results = self.service.files().list(
+                    q=query,
+                    spaces='drive',
+                    pageSize=DRIVE_PAGE_SIZE,
+                    pageToken=page_token,
+                    fields=LIST_FIELDS
+                ).execute(num_retries=DRIVE_MAX_RETRIES)
                 
-            logger.info(f"Found {len(files)} images in Drive folder")
-            return files
-            
+                for file in results.get('files', []):
+                    file_count += 1
+                    yield file
+                
+                page_token = results.get('nextPageToken')
+                if not page_token:
+                    break
+                    
         except HttpError as e:
             logger.error(f"Error listing Drive files: {e}")
-            return []
+            return
+        
+        self.last_listing_complete = True
+        if not file_count:
+            logger.info(f"No images found in Drive folder {self.folder_id}")
+        else:
+            logger.info(f"Found {file_count} images in Drive folder")
     
-    def downloadImage(self, file_id: str, file_name: str) -> bool:
+    def getFilesMetadata(self, file_ids: Iterable[str], fields: str = FILE_FIELDS) -> Dict[str, Dict[str, Any]]:
+        """Look up the metadata of many Drive files with batched requests.
+        
+        Args:
+            file_ids: IDs of the files.
+            fields: Fields to request for each file.
+        
+        Returns:
+            The file records by ID; files that could not be looked up,
+            e.g. because they were deleted, are left out.
+        """
+        service = self._getService()
+        requests = {file_id: service.files().get(fileId=file_id, fields=fields) for file_id in file_ids}
+        if not requests:
+            return {}
+        
+        results, errors = self.batcher.execute(service, requests)
+        for file_id, error in errors.items():
+            logger.warning(f"Could not look up Drive file {file_id}: {error}")
+        return results
+    
+    def downloadImage(self, file: Dict[str, Any]) -> bool:
         """Download a single image from Google Drive.
         
+        The listing record supplies the size used for storage decisions and
+        the checksum and modification time used to tell whether an existing
+        local copy is still current, so no extra metadata request is made.
+        Safe to call from several threads at once. Requests that fail with
+        429 or 5xx responses are retried with exponential backoff.
+        
         Args:
-            file_id: The ID of the file to download.
-            file_name: The name to save the file as.
+            file: The Drive file record from a listing or change, with at
+                least id and name, and ideally size, md5Checksum and
+                modifiedTime.
             
         Returns:
-            True if the download succeeded, False otherwise.
+            True if the file is available locally and current, False otherwise.
+        """
+        return self._downloadFile(file) is not None
+    
+    def _downloadFile(self,
+                      file: Dict[str, Any],
+                      on_stored: Optional[Callable[[str], None]] = None) -> Optional[str]:
+        """Download a Drive file, as a rendition if configured and available.
+        
+        Nothing is transferred if the content is already stored, whichever
+        Drive file it was stored for. Concurrent downloads of the same
+        content wait for each other instead of fetching it twice.
+        
+        Args:
+            file: The Drive file record.
+            on_stored: Called with the stored variant while its blob is
+                still locked, so that the blob cannot be released before
+                the file is recorded.
+        
+        Returns:
+            The variant now stored locally, VARIANT_ORIGINAL or
+            VARIANT_RENDITION, or None if the download failed.
         """
         if not self.is_authenticated and not self.authenticate():
-            return False
+            return None
         
-        file_path = self.images_dir / file_name
+        stored = self._findStoredVariant(file, on_stored)
+        if stored:
+            logger.debug(f"Content already stored, skipping: {file['name']}")
+            return stored
         
-        # Skip if file already exists (assuming we don't want duplicates)
-        if file_path.exists():
-            logger.debug(f"File already exists, skipping: {file_name}")
-            return True
+        rendition_url = self._getRenditionUrl(file)
+        if rendition_url:
+            file_path = self._getLocalPath(file, VARIANT_RENDITION)
+            with self._lockBlob(file_path):
+                downloaded = self._isStored(file, file_path) or \
+                    self._downloadRendition(file, rendition_url, file_path)
+                if downloaded and on_stored:
+                    on_stored(VARIANT_RENDITION)
+            if downloaded is not None:
+                return VARIANT_RENDITION if downloaded else None
+            logger.info(f"No rendition of {file['name']} available, downloading the original")
+        
+        file_path = self._getLocalPath(file, VARIANT_ORIGINAL)
+        with self._lockBlob(file_path):
+            if self._isStored(file, file_path) or self._downloadOriginal(file, file_path):
+                if on_stored:
+                    on_stored(VARIANT_ORIGINAL)
+                return VARIANT_ORIGINAL
+        return None
+    
+    def _downloadOriginal(self, file: Dict[str, Any], file_path: Path) -> bool:
+        """Download the original content of a Drive file.
+        
+        Args:
+            file: The Drive file record.
+            file_path: Path of the blob to store it in.
+        
+        Returns:
+            True if the file was stored, False otherwise.
+        """
+        file_id = file['id']
+        file_name = file['name']
+        service = self._getService()
+        part_path = self._getPartialPath(file_path)
+        reserved_bytes = 0
         
         try:
-            # Get file metadata to check size
-            file_metadata = self.service.files().get(fileId=file_id, fields='size').execute()
-            file_size = int(file_metadata.get('size', 0))
-            
-            # Check if we have enough storage space
-            if not hasAvailableStorage(file_size):
-                # Try to clean up some space
-                if cleanupOldestImages() == 0 or not hasAvailableStorage(file_size):
-                    logger.error(f"Not enough storage space for {file_name} ({file_size} bytes)")
-                    return False
+            if 'size' in file:
+                file_size = int(file['size'])
+            else:
+                # Syncs complete records in batches first; this is for
+                # records passed in directly
+                DRIVE_API_CALLS.inc(method='files.get')
+                file_metadata = service.files().get(fileId=file_id, fields='size').execute(
+                    num_retries=DRIVE_MAX_RETRIES)
+                file_size = int(file_metadata.get('size', 0))
             
-            # Download the file
-            request = self.service.files().get_media(fileId=file_id)
+            # Pick up where an interrupted download stopped, unless the
+            # partial file cannot belong to the current remote file
+            resume_from = part_path.stat().st_size if part_path.exists() else 0
+            if resume_from and not 0 < resume_from < file_size:
+                part_path.unlink()
+                resume_from = 0
             
-            with io.BytesIO() as fh:
-                downloader = MediaIoBaseDownload(fh, request)
-                done = False
-                
-                while not done:
-                    status, done = downloader.next_chunk()
+            # Take the space out of the budget planned for this batch
+            if not self._reserveStorage(file_path, file_size - resume_from, self.scorer(file)):
+                logger.error(f"Not enough storage space for {file_name} ({file_size} bytes)")
+                return False
+            reserved_bytes = file_size - resume_from
+            
+            # Stream the file to disk chunk by chunk
+            request = service.files().get_media(fileId=file_id)
+            
+            with open(part_path, 'ab' if resume_from else 'wb') as fh:
+                if resume_from:
+                    logger.info(f"Resuming download of {file_name} at {resume_from} bytes")
+                    resume_from = self._downloadRemainder(request, fh, resume_from, file_size)
+                else:
+                    downloader = MediaIoBaseDownload(fh, request, chunksize=DOWNLOAD_CHUNK_SIZE)
+                    done = False
                     
-                # Write the downloaded file
-                fh.seek(0)
-                with open(file_path, 'wb') as f:
-                    f.write(fh.read())
+                    while not done:
+                        DRIVE_API_CALLS.inc(method='files.get_media')
+                        status, done = downloader.next_chunk(num_retries=DRIVE_MAX_RETRIES)
+                
+                fh.flush()
+                os.fsync(fh.fileno())
+            
+            # Files without a listed size cannot be checked
+            if file_size and part_path.stat().st_size != file_size:
+                logger.warning(f"Download of {file_name} is {part_path.stat().st_size} bytes "
+                               f"instead of {file_size}, discarding")
+                part_path.unlink()
+                return False
             
-            logger.info(f"Downloaded: {file_name}")
+            # A resumed file may have been started from an older revision
+            if resume_from and file.get('md5Checksum') \
+                    and self._md5(part_path) != file['md5Checksum']:
+                logger.warning(f"Checksum mismatch after resuming {file_name}, discarding")
+                part_path.unlink()
+                return False
+            
+            self._publishDownload(part_path, file_path, file_size - resume_from, file_name)
+            self.planner.settle(file_path, reserved_bytes, file_size - resume_from)
+            reserved_bytes = 0
             return True
             
         except HttpError as e:
             logger.error(f"Error downloading {file_name}: {e}")
-            # Clean up partial download if it exists
-            if file_path.exists():
-                file_path.unlink()
+            # Keep the partial download for resuming unless the file is gone
+            # or the requested range no longer fits it
+            if e.resp.status in DISCARD_PARTIAL_STATUSES and part_path.exists():
+                part_path.unlink()
             return False
+        
+        finally:
+            # Give back the space of downloads that did not complete
+            if reserved_bytes:
+                self.planner.release(file_path, reserved_bytes)
+    
+    def _downloadRemainder(self, request: Any, fh: Any, offset: int, file_size: int) -> int:
+        """Append the rest of a file to an interrupted download.
+        
+        MediaIoBaseDownload always starts at the first byte, so the rest is
+        requested in DOWNLOAD_CHUNK_SIZE ranges of its own, each appended
+        to the partial file as it arrives.
+        
+        Args:
+            request: The media request for the file.
+            fh: The partial file, opened for appending.
+            offset: Number of bytes already downloaded.
+            file_size: Size of the whole file.
+        
+        Returns:
+            The offset the download continued at, which is 0 if the server
+            ignored the range and sent the whole file.
+            
+        Raises:
+            HttpError: If the server did not return the content.
+        """
+        headers = dict(request.headers)
+        progress = offset
+        while progress < file_size:
+            end = min(progress + DOWNLOAD_CHUNK_SIZE, file_size) - 1
+            headers['range'] = f"bytes={progress}-{end}"
+            resp, content = self._requestChunk(request, headers)
+            
+            if resp.status == 200:
+                logger.info(f"Range ignored, downloading {request.uri} from the start")
+                fh.seek(0)
+                fh.truncate()
+                fh.write(content)
+                return 0
+            if not content or not resp.get('content-range', '').startswith(f"bytes {progress}-"):
+                raise HttpError(resp, content, uri=request.uri)
+            fh.write(content)
+            progress += len(content)
+        return offset
+    
+    def _requestChunk(self, request: Any, headers: Dict[str, str]) -> Tuple[Any, bytes]:
+        """Send a ranged media request, retrying like MediaIoBaseDownload.
+        
+        Rate limits, server errors and dropped connections are retried up
+        to DRIVE_MAX_RETRIES times with randomized exponential backoff.
+        
+        Args:
+            request: The media request for the file.
+            headers: Headers to send, including the range.
+        
+        Returns:
+            A tuple of (response, content) of a 200 or 206 response.
+            
+        Raises:
+            HttpError: If the last attempt got another response.
+            OSError: If the last attempt failed in the transport.
+        """
+        error: Optional[Exception] = None
+        for attempt in range(DRIVE_MAX_RETRIES + 1):
+            if attempt:
+                time.sleep(random.random() * 2 ** attempt)
+            
+            DRIVE_API_CALLS.inc(method='files.get_media')
+            try:
+                resp, content = request.http.request(request.uri, 'GET', headers=headers)
+            except OSError as e:
+                error = e
+                continue
+            
+            if resp.status in (200, 206):
+                return resp, content
+            error = HttpError(resp, content, uri=request.uri)
+            if not _isRetryable(error):
+                break
+        raise error
+    
+    def _downloadRendition(self, file: Dict[str, Any], url: str, file_path: Path) -> Optional[bool]:
+        """Download the screen-sized rendition Drive serves for an image.
+        
+        Renditions are small, so they are always fetched from the start
+        rather than resumed.
+        
+        Args:
+            file: The Drive file record.
+            url: The rendition URL from _getRenditionUrl.
+            file_path: Path of the blob to store it in.
+        
+        Returns:
+            True if the rendition was stored, False if it failed for lack of
+            storage, or None if Drive did not serve it and the original
+            should be downloaded instead.
+        """
+        file_name = file['name']
+        part_path = self._getPartialPath(file_path)
+        expected_bytes = self._getExpectedSize(file)
+        
+        if not self._reserveStorage(file_path, expected_bytes, self.scorer(file)):
+            logger.error(f"Not enough storage space for {file_name} (about {expected_bytes} bytes)")
+            return False
+        
+        try:
+            with open(part_path, 'wb') as fh:
+                downloader = MediaIoBaseDownload(fh, self._getRenditionRequest(url),
+                                                 chunksize=DOWNLOAD_CHUNK_SIZE)
+                done = False
+                while not done:
+                    DRIVE_API_CALLS.inc(method='thumbnail')
+                    status, done = downloader.next_chunk(num_retries=DRIVE_MAX_RETRIES)
+                fh.flush()
+                os.fsync(fh.fileno())
+            file_size = part_path.stat().st_size
+        
+        except (HttpError, OSError) as e:
+            # Rendition links expire and are missing for some formats
+            logger.warning(f"Could not download a rendition of {file_name}: {e}")
+            self.planner.release(file_path, expected_bytes)
+            if part_path.exists():
+                part_path.unlink()
+            return None
+        
+        self.planner.settle(file_path, expected_bytes, file_size)
+        self._publishDownload(part_path, file_path, file_size, file_name)
+        return True
+    
+    def _publishDownload(self, part_path: Path, file_path: Path, nbytes: int, file_name: str) -> None:
+        """Move a completed download into place and record it.
+        
+        The file is published atomically so readers never see a
+        half-written image, replacing any outdated local copy.
+        
+        Args:
+            part_path: Path the file was downloaded to.
+            file_path: Final path of the file.
+            nbytes: Number of bytes transferred.
+            file_name: Drive name of the file, for the log.
+        """
+        replaced = file_path.exists()
+        os.replace(part_path, file_path)
+        self._fsyncDirectory()
+        
+        self._transfer_stats.recordDownload(nbytes)
+        DOWNLOADED_FILES.inc()
+        DOWNLOADED_BYTES.inc(nbytes)
+        logger.info(f"Downloaded: {file_name}")
+        if replaced:
+            self._recordLocalChange(changed=[file_path])
+        else:
+            self._recordLocalChange(added=[file_path])
+    
+    def _getRenditionUrl(self, file: Dict[str, Any]) -> Optional[str]:
+        """Get the URL of a screen-sized rendition of a Drive image.
+        
+        Args:
+            file: The Drive file record.
+        
+        Returns:
+            The URL, or None if renditions are not wanted, Drive has none
+            for the file, or the original is no larger than the rendition.
+        """
+        link = file.get('thumbnailLink')
+        if self.download_variant != VARIANT_RENDITION or not link:
+            return None
+        
+        # Images that already fit the screen are better off as originals
+        metadata = file.get('imageMediaMetadata') or {}
+        if metadata.get('width') and max(metadata['width'], metadata.get('height', 0)) <= self.rendition_size:
+            return None
+        
+        size = f"=s{self.rendition_size}"
+        if THUMBNAIL_SIZE_PATTERN.search(link):
+            return THUMBNAIL_SIZE_PATTERN.sub(size, link)
+        return link + size
+    
+    def _getRenditionRequest(self, url: str) -> Any:
+        """Prepare an authorized GET of a rendition URL.
+        
+        Args:
+            url: The rendition URL.
+        
+        Returns:
+            A request for MediaIoBaseDownload, sent with the calling
+            thread's own authorized HTTP transport.
+        """
+        return HttpRequest(self._getHttp(self._getClient()), None, url)
+    
+    def _getExpectedSize(self, file: Dict[str, Any]) -> int:
+        """Estimate the bytes that downloading a Drive file will store.
+        
+        Args:
+            file: The Drive file record.
+        
+        Returns:
+            The file size, or for renditions an estimate from the image
+            dimensions, never more than the original.
+        """
+        original = int(file.get('size', 0))
+        if not self._getRenditionUrl(file):
+            return original
+        
+        metadata = file.get('imageMediaMetadata') or {}
+        width, height = metadata.get('width', 4), metadata.get('height', 3)
+        scale = self.rendition_size / max(width, height, 1)
+        estimate = int(width * scale * height * scale * RENDITION_BYTES_PER_PIXEL)
+        return min(estimate, original) if original else estimate
+    
+    def _getLocalPath(self, file: Dict[str, Any], variant: str) -> Path:
+        """Get the path of the blob holding a Drive file's content.
+        
+        Blobs are named after the md5Checksum, so identical files share one
+        and Drive names never collide. Files without a checksum get a blob
+        of their own, named after their ID.
+        
+        Args:
+            file: The Drive file record.
+            variant: VARIANT_ORIGINAL or VARIANT_RENDITION.
+        
+        Returns:
+            The path in the images directory.
+        """
+        key = file.get('md5Checksum') or f"id-{file['id']}"
+        if variant == VARIANT_RENDITION:
+            key += f"-s{self.rendition_size}"
+        extension = os.path.splitext(file['name'])[1].lower()
+        return self.images_dir / (key + BLOB_EXTENSIONS.get(extension, extension))
+    
+    def _isStored(self, file: Dict[str, Any], file_path: Path) -> bool:
+        """Check whether a blob holds the current content of a Drive file.
+        
+        Args:
+            file: The Drive file record.
+            file_path: Path of the blob from _getLocalPath.
+        
+        Returns:
+            True if the blob does not need to be downloaded.
+        """
+        if not file_path.exists():
+            return False
+        if file.get('md5Checksum'):
+            return True
+        
+        # Blobs named after the file ID may hold an older revision
+        known = self.state.getFile(file['id'])
+        return bool(known) and known.get('blob') == file_path.name and self._isSameRevision(known, file)
+    
+    def _findStoredVariant(self,
+                           file: Dict[str, Any],
+                           on_stored: Optional[Callable[[str], None]] = None) -> Optional[str]:
+        """Find a stored variant of a Drive file that serves the sync mode.
+        
+        An original serves in rendition mode too, but not the reverse.
+        
+        Args:
+            file: The Drive file record.
+            on_stored: Called with the variant found while its blob is
+                still locked.
+        
+        Returns:
+            VARIANT_ORIGINAL or VARIANT_RENDITION, or None if the file
+            needs to be downloaded.
+        """
+        variants = [VARIANT_ORIGINAL]
+        if self._getRenditionUrl(file):
+            variants.append(VARIANT_RENDITION)
+        
+        for variant in variants:
+            # Under the lock _releaseBlob holds while deleting the blob
+            file_path = self._getLocalPath(file, variant)
+            with self._lockBlob(file_path):
+                if self._isStored(file, file_path):
+                    if on_stored:
+                        on_stored(variant)
+                    return variant
+        return None
+    
+    @contextmanager
+    def _lockBlob(self, file_path: Path) -> Iterator[None]:
+        """Hold the lock of a blob while downloading, deduplicating or deleting it.
+        
+        Args:
+            file_path: Path of the blob.
+        """
+        with self._blob_locks_lock:
+            lock = self._blob_locks.setdefault(file_path, threading.Lock())
+        with lock:
+            yield
+    
+    def _releaseBlob(self, blob: Optional[str]) -> bool:
+        """Delete a blob once no synced Drive file is stored in it.
+        
+        Args:
+            blob: File name of the blob.
+        
+        Returns:
+            True if the blob was deleted.
+        """
+        if not blob:
+            return False
+        
+        file_path = self.images_dir / blob
+        with self._lockBlob(file_path):
+            # Checked under the lock, so that a file deduplicated to the blob
+            # meanwhile is either recorded already or finds it gone
+            if self.state.isBlobReferenced(blob):
+                return False
+            try:
+                part_path = self._getPartialPath(file_path)
+                if part_path.exists():
+                    part_path.unlink()
+                if not file_path.exists():
+                    return False
+                file_path.unlink()
+            except OSError as e:
+                logger.error(f"Failed to remove {file_path}: {e}")
+                return False
+        
+        self.planner.forget(file_path)
+        self._recordLocalChange(removed=[file_path])
+        return True
+    
+    def _migrateLegacyFiles(self) -> None:
+        """Move files synced under their Drive names to content-named blobs.
+        
+        Copies of the same content are deleted rather than moved.
+        """
+        migrated = 0
+        for file_id, record in list(self.state.files.items()):
+            if record.get('blob'):
+                continue
+            
+            file = dict(record, id=file_id)
+            variant = record.get('variant', VARIANT_ORIGINAL)
+            legacy_path = self.images_dir / record['name']
+            file_path = self._getLocalPath(file, variant)
+            try:
+                if legacy_path.exists():
+                    if file_path.exists():
+                        legacy_path.unlink()
+                        self._recordLocalChange(removed=[legacy_path])
+                    else:
+                        os.replace(legacy_path, file_path)
+                        self._recordLocalChange(added=[file_path], removed=[legacy_path])
+            except OSError as e:
+                logger.error(f"Failed to move {legacy_path} to {file_path.name}: {e}")
+                continue
+            
+            self.state.setFile(file_id, dict(record, blob=file_path.name))
+            migrated += 1
+        
+        if migrated:
+            self.state.save()
+            logger.info(f"Moved {migrated} synced images to content-addressed storage")
+    
+    def _md5(self, file_path: Path) -> str:
+        """Compute the MD5 checksum of a local file, as reported by Drive.
+        
+        Args:
+            file_path: Path of the file.
+            
+        Returns:
+            The hexadecimal MD5 digest.
+        """
+        digest = hashlib.md5()
+        with open(file_path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(block)
+        return digest.hexdigest()
+    
+    def _getPartialPath(self, file_path: Path) -> Path:
+        """Get the path an in-progress download of a file is written to.
+        
+        Args:
+            file_path: Final path of the downloaded file.
+            
+        Returns:
+            The path of the partial file next to it.
+        """
+        return file_path.with_name(file_path.name + PARTIAL_SUFFIX)
+    
+    def _fsyncDirectory(self) -> None:
+        """Flush the images directory so completed renames survive a crash."""
+        try:
+            fd = os.open(self.images_dir, os.O_RDONLY)
+        except OSError:
+            # Not supported on every platform; the rename is still atomic
+            return
+        try:
+            os.fsync(fd)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
+    
+    def _reserveStorage(self, file_path: Path, file_size: int, score: float) -> bool:
+        """Reserve space for a download from the planned storage budget.
+        
+        Args:
+            file_path: Path the file will be stored at.
+            file_size: Number of bytes about to be downloaded.
+            score: Priority of the file, see DOWNLOAD_SCORERS.
+            
+        Returns:
+            True if space was reserved, False if there is not enough even
+            after evicting the local images scored lower.
+        """
+        if self.planner.reserve(file_path, file_size):
+            return True
+        
+        # Outside a planned batch, or the batch needed more than planned;
+        # plan room for this file alone
+        with self._storage_lock:
+            if self.planner.reserve(file_path, file_size):
+                return True
+            plan = self.planner.prepareBatch(file_size, protected=self._planned | {file_path},
+                                             score=score, scores=self._getLocalScores())
+            self._recordEvictions(plan.evictions)
+            return self.planner.reserve(file_path, file_size)
     
     def syncDriveImages(self) -> Tuple[int, int]:
         """Sync images from Google Drive to local storage.
         
+        In "changes" mode only the changes since the previous sync are
+        fetched and applied, falling back to a full listing when no valid
+        change-feed position is known. Downloads run concurrently and the
+        aggregate throughput is logged at the end.
+        
         Returns:
             A tuple of (number of files synced, number of errors).
         """
         # Update last sync time regardless of success
         self.last_sync_time = time.time()
+        self._transfer_stats = DownloadStats()
+        self._blob_locks = {}
+        self._planned = set()
+        self._skipped = 0
+        self._migrateLegacyFiles()
+        self.planner.scan()
+        with self._changes_lock:
+            self._added, self._removed, self._changed = set(), set(), set()
         
-        # Get list of images from Drive
-        drive_files = self.listDriveImages()
-        if not drive_files:
-            return 0, 0
+        # A token that would expire during the sync is refreshed before it
+        # starts, in case the refresher thread is late, e.g. after a suspend
+        if self._refresher is not None and self._refresher.isExpiring():
+            self._refreshCredentials()
         
-        # Track metrics
-        files_synced = 0
-        errors = 0
+        result = (0, 1)
+        try:
+            with self._leaseClient():
+                result = self._runSync()
+            return result
+        
+        finally:
+            self._transfer_stats.finish()
+            self._transfer_stats.logSummary()
+            self.last_transfer_stats = self._transfer_stats
+            SYNC_SECONDS.observe(self._transfer_stats.getElapsed())
+            SYNCS.inc(result='error' if result[1] else 'ok')
+            self._notifyChanges()
+    
+    def _runSync(self) -> Tuple[int, int]:
+        """Sync incrementally when possible, otherwise with a full listing.
         
-        # Filter files with supported extensions
-        for file in drive_files:
-            file_name = file['name']
-            _, ext = os.path.splitext(file_name)
+        Returns:
+            A tuple of (number of files synced, number of errors).
+        """
+        # A change-feed position recorded for another folder would only
+        # report changes to that folder's files
+        if self.state.page_token and self.state.configured_folder_id != self.folder_id:
+            logger.info(f"Drive folder changed to {self.folder_id}, doing a full sync")
+            self.state.reset()
+            self.state.save()
+        
+        if self.sync_mode == "changes" and self.state.page_token:
+            if not self.is_authenticated and not self.authenticate():
+                logger.error("Not authenticated, cannot sync Drive changes")
+                return 0, 1
+            try:
+                return self._syncChanges()
+            except HttpError as e:
+                if e.resp.status not in INVALID_TOKEN_STATUSES:
+                    logger.error(f"Error fetching Drive changes: {e}")
+                    return 0, 1
+                logger.warning(f"Drive change token is no longer valid, doing a full sync: {e}")
+                self.state.reset()
+                self.state.save()
+        
+        return self._syncFull()
+    
+    def addChangeListener(self, listener: ChangeListener) -> None:
+        """Register a callback notified of the local files a sync changed.
+        
+        The callback runs on the thread that ran the sync.
+        
+        Args:
+            listener: Callable receiving lists of added, removed and changed
+                local image paths.
+        """
+        self._change_listeners.append(listener)
+    
+    def addProgressListener(self, listener: ProgressListener) -> None:
+        """Register a callback notified each time a download finishes.
+        
+        The callback runs on the thread that ran the sync.
+        
+        Args:
+            listener: Callable receiving the number of files done and the
+                number of errors so far.
+        """
+        self._progress_listeners.append(listener)
+    
+    def _notifyProgress(self, files_done: int, errors: int) -> None:
+        """Tell progress listeners how far the running sync is.
+        
+        Args:
+            files_done: Number of files finished so far.
+            errors: Number of errors so far.
+        """
+        for listener in self._progress_listeners:
+            try:
+                listener(files_done, errors)
+            except Exception as e:
+                logger.error(f"Error in sync progress listener: {e}")
+    
+    def _notifyChanges(self) -> None:
+        """Tell change listeners which local files the sync changed."""
+        with self._changes_lock:
+            # A file removed and added again in one sync was replaced
+            changed = self._changed | (self._added & self._removed)
+            added = sorted(self._added - changed)
+            removed = sorted(self._removed - self._added)
+            changed = sorted(changed)
+        
+        if not (added or removed or changed):
+            return
+        
+        for listener in self._change_listeners:
+            try:
+                listener(added, removed, changed)
+            except Exception as e:
+                logger.error(f"Error in sync change listener: {e}")
+    
+    def _recordLocalChange(self,
+                           added: Iterable[Path] = (),
+                           removed: Iterable[Path] = (),
+                           changed: Iterable[Path] = ()) -> None:
+        """Remember local files touched by the running sync.
+        
+        Renditions of the files are updated right away.
+        
+        Args:
+            added: Paths of files that appeared.
+            removed: Paths of files that were deleted.
+            changed: Paths of files whose content was replaced.
+        """
+        added, removed, changed = list(added), list(removed), list(changed)
+        with self._changes_lock:
+            self._added.update(added)
+            self._removed.update(removed)
+            self._changed.update(changed)
+        
+        if self.renditions:
+            for path in removed:
+                self.renditions.remove(path)
+            for path in added + changed:
+                self.renditions.schedule(path)
+    
+    def _recordEvictions(self, evictions: Iterable[Path]) -> None:
+        """Remember the local files the storage planner deleted.
+        
+        The Drive files stored in evicted blobs are dropped from the
+        manifest, so that a later full sync fetches them again, and the
+        renditions of the blobs are deleted with them.
+        
+        Args:
+            evictions: Paths the planner tried to delete.
+        """
+        removed = [path for path in evictions if not path.exists()]
+        for path in removed:
+            self.state.removeBlob(path.name)
+        self._recordLocalChange(removed=removed)
+    
+    def _syncFull(self) -> Tuple[int, int]:
+        """Sync by listing the whole Drive folder.
+        
+        Returns:
+            A tuple of (number of files synced, number of errors).
+        """
+        # Take the change-feed position before listing so that nothing
+        # changed during the listing is missed by the next incremental sync
+        start_token = None
+        if self.sync_mode == "changes":
+            start_token = self._getStartPageToken()
+        
+        listed_ids: Set[str] = set()
+        
+        def candidates() -> Iterator[Dict[str, Any]]:
+            # Filter files with supported extensions as the listing pages arrive
+            for file in self.listDriveImages():
+                listed_ids.add(file['id'])
+                if self._isSupportedFile(file['name']):
+                    yield file
+        
+        files_synced, errors, stopped = self.downloader.run(
+            self._planBatches(candidates()), self._syncFile, progress=self._notifyProgress)
+        self._transfer_stats.recordErrors(errors)
+        
+        completed = not stopped and self.last_listing_complete
+        
+        # Drop local copies of previously synced files that left the folder,
+        # which is only known once the whole folder has been listed
+        removed = self._removeMissingFiles(listed_ids) if completed else 0
+        
+        # Only start following changes once everything listed is local,
+        # otherwise the files that failed would never be retried. Files
+        # skipped for lack of storage rank below every local image and are
+        # only offered again by a full sync.
+        if start_token and completed and errors == 0:
+            self.state.page_token = start_token
+            self.state.folder_id = self._resolveFolderId()
+            self.state.configured_folder_id = self.folder_id
+        self.state.save()
+        
+        logger.info(f"Sync completed: {files_synced} files downloaded, {removed} removed, "
+                    f"{self._skipped} skipped for lack of storage, {errors} errors")
+        return files_synced, errors
+    
+    def _syncChanges(self) -> Tuple[int, int]:
+        """Sync by applying the Drive changes since the stored page token.
+        
+        The stored token is only advanced when every change was applied, so
+        a failed download is retried by replaying the same changes.
+        
+        Returns:
+            A tuple of (number of files synced, number of errors).
             
-            # Skip unsupported file types
-            if ext.lower() not in SUPPORTED_EXTENSIONS:
-                continue
+        Raises:
+            HttpError: If the Changes API request fails, including when the
+                stored page token is no longer valid.
+        """
+        files_removed = 0
+        new_start_token = None
+        
+        def downloads() -> Iterator[Dict[str, Any]]:
+            # Apply removals and renames inline and hand downloads to the pool
+            nonlocal files_removed, new_start_token
+            page_token = self.state.page_token
+            while page_token:
+                DRIVE_API_CALLS.inc(method='changes.list')
+                response = self.service.changes().list(
+                    pageToken=page_token,
+                    spaces='drive',
+                    includeRemoved=True,
+                    pageSize=DRIVE_PAGE_SIZE,
+                    fields=CHANGE_FIELDS
+                ).execute(num_retries=DRIVE_MAX_RETRIES)
                 
-            # Download the file
-            success = self.downloadImage(file['id'], file_name)
-            if success:
-                files_synced += 1
-            else:
-                errors += 1
+                for change in response.get('changes', []):
+                    result = self._applyChange(change)
+                    if result == 'removed':
+                        files_removed += 1
+                    elif isinstance(result, dict):
+                        yield result
                 
-            # Check if we've hit storage limits
-            if not hasAvailableStorage():
-                logger.warning("Storage limit reached, stopping sync")
-                break
+                page_token = response.get('nextPageToken')
+                new_start_token = response.get('newStartPageToken', new_start_token)
+        
+        files_synced, errors, stopped = self.downloader.run(
+            self._planBatches(downloads()), self._syncFile, progress=self._notifyProgress)
+        self._transfer_stats.recordErrors(errors)
         
-        logger.info(f"Sync completed: {files_synced} files downloaded, {errors} errors")
+        if not stopped and errors == 0 and new_start_token:
+            self.state.page_token = new_start_token
+        self.state.save()
+        
+        logger.info(f"Change sync completed: {files_synced} files downloaded, {files_removed} removed, "
+                    f"{self._skipped} skipped for lack of storage, {errors} errors")
         return files_synced, errors
-
+    
+    def _syncFile(self, file: Dict[str, Any]) -> bool:
+        """Download a listed Drive file and record it in the sync state.
+        
+        Runs on a download worker thread.
+        
+        Args:
+            file: The Drive file metadata.
+            
+        Returns:
+            True if the file is now available locally, False otherwise.
+        """
+        with profiler.section(), self._leaseClient():
+            replaced: List[Optional[str]] = []
+            variant = self._downloadFile(file, lambda stored: replaced.append(self._recordFile(file, stored)))
+            # Released only now, as no two blob locks may be held at once
+            for blob in replaced:
+                self._releaseBlob(blob)
+            if variant:
+                return True
+        DOWNLOAD_ERRORS.inc()
+        return False
+    
+    def _planBatches(self, files: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """Group files into batches, ranked by priority, and make room for each at once.
+        
+        Files are batched as the listing or change feed delivers them, so
+        downloads start with the first page. Within a batch the files most
+        worth having come first and may replace local images that score
+        lower; a later batch only gets the room left. Files skipped for
+        lack of room compete again with the stored ones on the next sync.
+        
+        Args:
+            files: Drive file records to download.
+            
+        Yields:
+            The records that fit, highest score first within each batch,
+            after the storage for their batch is planned.
+        """
+        local_scores = self._getLocalScores()
+        batch: List[Dict[str, Any]] = []
+        for file in files:
+            batch.append(file)
+            if len(batch) >= DRIVE_PAGE_SIZE:
+                yield from self._planBatch(batch, local_scores)
+                batch = []
+        
+        if batch:
+            yield from self._planBatch(batch, local_scores)
+    
+    def _planBatch(self, batch: List[Dict[str, Any]], local_scores: Dict[Path, float]) -> List[Dict[str, Any]]:
+        """Rank a batch of files and make room for the ones that fit.
+        
+        Args:
+            batch: Drive file records to download.
+            local_scores: Scores of the local blobs, see _getLocalScores().
+        
+        Returns:
+            The records that fit, highest score first.
+        """
+        batch.sort(key=self.scorer, reverse=True)
+        self._completeMetadata(batch)
+        return self._prepareBatch(batch, local_scores)
+    
+    def _completeMetadata(self, batch: List[Dict[str, Any]]) -> None:
+        """Fill in records that lack the size, with one batched lookup.
+        
+        The size is needed to plan storage and to resume downloads; looking
+        it up here saves a request per file in the download workers.
+        
+        Args:
+            batch: Drive file records about to be downloaded, updated in place.
+        """
+        incomplete = {file['id']: file for file in batch if 'size' not in file}
+        if not incomplete:
+            return
+        
+        for file_id, metadata in self.getFilesMetadata(incomplete).items():
+            incomplete[file_id].update(metadata)
+    
+    def _prepareBatch(self, batch: List[Dict[str, Any]], local_scores: Dict[Path, float]) -> List[Dict[str, Any]]:
+        """Evict local images so that the best of a batch of downloads fits the budget.
+        
+        Args:
+            batch: Drive file records about to be downloaded.
+            local_scores: Scores of the local blobs, see _getLocalScores().
+        
+        Returns:
+            The records of the batch that fit.
+        """
+        incoming: Dict[Path, Tuple[int, float]] = {}
+        targets: List[Path] = []
+        for file in batch:
+            # Files stored already compete for the space like any local
+            # image, so that higher-scored downloads can replace them
+            variant = self._findStoredVariant(file)
+            if variant:
+                file_path = self._getLocalPath(file, variant)
+                local_scores[file_path] = max(local_scores.get(file_path, -math.inf), self.scorer(file))
+                targets.append(file_path)
+                continue
+            
+            # Copies of the same content in one batch are downloaded once
+            variant = VARIANT_RENDITION if self._getRenditionUrl(file) else VARIANT_ORIGINAL
+            file_path = self._getLocalPath(file, variant)
+            targets.append(file_path)
+            if file_path not in incoming:
+                incoming[file_path] = (self._getExpectedSize(file), self.scorer(file))
+        
+        # Files downloaded earlier in the sync may not be recorded yet
+        with self._storage_lock:
+            plan = self.planner.prepareRanked(
+                [(path, size, score) for path, (size, score) in incoming.items()],
+                local_scores, self._planned)
+            skipped = set(plan.skipped)
+            self._planned.update(path for path in incoming if path not in skipped)
+        self._recordEvictions(plan.evictions)
+        
+        unavailable = skipped.union(plan.evictions)
+        ready = [file for file, file_path in zip(batch, targets) if file_path not in unavailable]
+        if skipped:
+            count = sum(1 for file_path in targets if file_path in skipped)
+            self._skipped += count
+            logger.warning(f"Skipping {count} files that do not fit the storage budget, "
+                           f"even in place of lower-scored local images")
+        return ready
+    
+    def _getLocalScores(self) -> Dict[Path, float]:
+        """Score the local blobs by the Drive files stored in them.
+        
+        Returns:
+            The highest score of the files in each blob, by blob path.
+        """
+        scores: Dict[Path, float] = {}
+        for record in self.state.getRecords():
+            blob = record.get('blob')
+            if not blob:
+                continue
+            path = self.images_dir / blob
+            scores[path] = max(scores.get(path, -math.inf), self.scorer(record))
+        return scores
+    
+    def _applyChange(self, change: Dict[str, Any]) -> Union[str, Dict[str, Any], None]:
+        """Apply a single Drive change to local storage.
+        
+        Removals and renames are applied immediately; downloads are left to
+        the caller.
+        
+        Args:
+            change: A change resource from the Changes API.
+            
+        Returns:
+            "removed" if a local file was deleted, the Drive file metadata
+            if the file needs to be downloaded, or None if there is nothing
+            to do.
+        """
+        file_id = change.get('fileId')
+        file = change.get('file') or {}
+        known = self.state.getFile(file_id)
+        
+        in_folder = self.state.folder_id in file.get('parents', [])
+        is_image = file.get('mimeType', '').startswith('image/')
+        
+        if change.get('removed') or file.get('trashed') or not in_folder or not is_image \
+                or not self._isSupportedFile(file.get('name', '')):
+            if known and self._removeLocalFile(file_id):
+                return 'removed'
+            return None
+        
+        if known and known.get('name') != file['name'] and self._isSameRevision(known, file):
+            # Renamed on Drive; blobs are named after the content, so only
+            # the manifest changes
+            self._releaseBlob(self._recordFile(file, known.get('variant', VARIANT_ORIGINAL), known.get('blob')))
+            logger.info(f"Renamed image: {known['name']} -> {file['name']}")
+            return None
+        
+        # New or edited files; downloadImage skips content that is stored,
+        # and the blob of an edited file's old content is released once
+        # the new content is recorded
+        return file
+    
+    def _getStartPageToken(self) -> Optional[str]:
+        """Get the current position of the Drive change feed.
+        
+        Returns:
+            The start page token, or None if it could not be fetched.
+        """
+        if not self.is_authenticated and not self.authenticate():
+            return None
+        
+        try:
+            DRIVE_API_CALLS.inc(method='changes.getStartPageToken')
+            response = self.service.changes().getStartPageToken().execute(
+                num_retries=DRIVE_MAX_RETRIES)
+            return response.get('startPageToken')
+        except HttpError as e:
+            logger.error(f"Error getting Drive start page token: {e}")
+            return None
+    
+    def _resolveFolderId(self) -> str:
+        """Resolve the configured folder ID (which may be an alias like "root").
+        
+        Change resources list real parent IDs, so aliases must be resolved
+        before they can be compared.
+        
+        Returns:
+            The real folder ID, or the configured one if it cannot be resolved.
+        """
+        try:
+            DRIVE_API_CALLS.inc(method='files.get')
+            folder = self.service.files().get(fileId=self.folder_id, fields='id').execute(
+                num_retries=DRIVE_MAX_RETRIES)
+            return folder.get('id', self.folder_id)
+        except HttpError as e:
+            logger.error(f"Error resolving Drive folder {self.folder_id}: {e}")
+            return self.folder_id
+    
+    def _isSupportedFile(self, file_name: str) -> bool:
+        """Check whether a Drive file has a supported image extension.
+        
+        Args:
+            file_name: Name of the Drive file.
+            
+        Returns:
+            True if the file should be synced, False otherwise.
+        """
+        _, ext = os.path.splitext(file_name)
+        return ext.lower() in SUPPORTED_EXTENSIONS
+    
+    def _recordFile(self,
+                    file: Dict[str, Any],
+                    variant: str = VARIANT_ORIGINAL,
+                    blob: Optional[str] = None) -> Optional[str]:
+        """Remember a synced Drive file in the sync state.
+        
+        Args:
+            file: The Drive file metadata.
+            variant: Which variant of the file is stored locally.
+            blob: File name of the blob holding it, derived from the
+                checksum if not given.
+        
+        Returns:
+            The blob of content the file no longer has, to pass to
+            _releaseBlob, or None.
+        """
+        blob = blob or self._getLocalPath(file, variant).name
+        previous = self.state.getFile(file['id'])
+        self.state.setFile(file['id'], {
+            'name': file['name'],
+            'size': file.get('size'),
+            'md5Checksum': file.get('md5Checksum'),
+            'modifiedTime': file.get('modifiedTime'),
+            'imageMediaMetadata': file.get('imageMediaMetadata'),
+            'variant': variant,
+            'blob': blob,
+        })
+        if previous and previous.get('blob') != blob:
+            return previous.get('blob')
+        return None
+    
+    def _isSameRevision(self, known: Dict[str, Any], file: Dict[str, Any]) -> bool:
+        """Check whether a recorded file and a Drive record have the same content.
+        
+        Args:
+            known: The metadata recorded when the file was synced.
+            file: The current Drive file record.
+            
+        Returns:
+            True if the content is unchanged.
+        """
+        if known.get('md5Checksum') and file.get('md5Checksum'):
+            return known['md5Checksum'] == file['md5Checksum']
+        return known.get('modifiedTime') == file.get('modifiedTime')
+    
+    def _removeLocalFile(self, file_id: str) -> bool:
+        """Forget a synced Drive file and delete its blob if no longer needed.
+        
+        Args:
+            file_id: The Drive file ID.
+            
+        Returns:
+            True if a local file was deleted, False otherwise.
+        """
+        record = self.state.removeFile(file_id)
+        if not record:
+            return False
+        
+        # Content another Drive file still has stays
+        if not self._releaseBlob(record.get('blob')):
+            return False
+        logger.info(f"Removed image deleted from Drive: {record['name']}")
+        return True
+    
+    def _removeMissingFiles(self, listed_ids: Set[str]) -> int:
+        """Delete local copies of synced files that are no longer on Drive.
+        
+        Args:
+            listed_ids: IDs of all files currently in the Drive folder.
+            
+        Returns:
+            The number of local files removed.
+        """
+        removed = 0
+        for file_id in list(self.state.files):
+            if file_id not in listed_ids and self._removeLocalFile(file_id):
+                removed += 1
+        return removed
+    
     def getTimeSinceLastSync(self) -> float:
         """Get the time since the last sync in seconds.
         
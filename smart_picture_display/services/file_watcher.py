@@ -0,0 +1,250 @@
+"""Watches the images directory and reports changed files in batches."""
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from ..config import (
+    SUPPORTED_EXTENSIONS, WATCH_MODE, WATCH_DEBOUNCE, WATCH_MAX_DELAY, WATCH_POLL_INTERVAL
+)
+from ..utils.logger import logger
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:  # watchdog is optional, polling is used without it
+    FileSystemEventHandler = object
+    Observer = None
+
+# Callback receiving (updated, deleted) image paths after a burst of events
+BatchListener = Callable[[List[Path], List[Path]], None]
+
+# Polls between full stat scans, to catch files rewritten in place
+FULL_SCAN_EVERY = 30
+
+class _EventHandler(FileSystemEventHandler):
+    """Forwards watchdog events to a DirectoryWatcher."""
+    
+    def __init__(self, watcher: 'DirectoryWatcher'):
+        """Initialize the handler.
+        
+        Args:
+            watcher: The watcher to forward events to.
+        """
+        super().__init__()
+        self.watcher = watcher
+    
+    def on_any_event(self, event) -> None:
+        """Record the paths touched by any file event.
+        
+        Args:
+            event: The watchdog event.
+        """
+        if event.is_directory:
+            return
+        self.watcher.touch(Path(os.fsdecode(event.src_path)))
+        dest_path = getattr(event, 'dest_path', None)
+        if dest_path:
+            self.watcher.touch(Path(os.fsdecode(dest_path)))
+
+
+class DirectoryWatcher:
+    """Reports created, modified, deleted and renamed images in a directory.
+    
+    Events come from inotify (or the platform equivalent) through watchdog
+    when it is installed, and from a polling thread otherwise. Touched
+    paths are collected and delivered together once the directory has been
+    quiet for a moment, so a sync writing hundreds of files produces a few
+    batches instead of hundreds of updates. Whether a path was updated or
+    deleted is decided when the batch is delivered, so a file that is
+    created and deleted within one batch is reported only as deleted.
+    """
+    
+    def __init__(self,
+                 directory: Path,
+                 listener: BatchListener,
+                 mode: str = WATCH_MODE,
+                 debounce: float = WATCH_DEBOUNCE,
+                 max_delay: float = WATCH_MAX_DELAY,
+                 poll_interval: float = WATCH_POLL_INTERVAL):
+        """Initialize the watcher.
+        
+        Args:
+            directory: The directory to watch.
+            listener: Called on the watcher thread with lists of updated
+                and deleted image paths.
+            mode: "auto" to use watchdog if available and polling otherwise,
+                "polling" to always poll, or "off".
+            debounce: Seconds without events before a batch is delivered.
+            max_delay: Longest a batch is held back during a steady stream
+                of events.
+            poll_interval: Seconds between directory checks when polling.
+        """
+        self.directory = directory
+        self.listener = listener
+        self.mode = mode
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.poll_interval = poll_interval
+        
+        self._pending: Set[Path] = set()
+        self._first_event = 0.0
+        self._last_event = 0.0
+        self._stopping = False
+        self._condition = threading.Condition()
+        self._threads: List[threading.Thread] = []
+        self._observer = None
+    
+    def start(self) -> bool:
+        """Start watching.
+        
+        Returns:
+            True if the watcher started, False if watching is turned off.
+        """
+        if self.mode == "off":
+            return False
+        
+        self._stopping = False
+        if self.mode == "auto" and Observer is not None:
+            self._observer = Observer()
+            self._observer.schedule(_EventHandler(self), str(self.directory), recursive=False)
+            self._observer.start()
+            logger.info(f"Watching {self.directory} for changes")
+        else:
+            self._startThread(self._poll, "image-watch-poll")
+            logger.info(f"Polling {self.directory} for changes every {self.poll_interval}s")
+        
+        self._startThread(self._deliverBatches, "image-watch-batch")
+        return True
+    
+    def stop(self) -> None:
+        """Stop watching and wait for the watcher threads to exit."""
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+        
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join()
+            self._observer = None
+        
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+    
+    def touch(self, path: Path) -> None:
+        """Record that a path was created, modified or deleted.
+        
+        Args:
+            path: The touched path.
+        """
+        if path.suffix.lower() not in SUPPORTED_EXTENSIONS or path.parent != self.directory:
+            return
+        
+        with self._condition:
+            now = time.monotonic()
+            if not self._pending:
+                self._first_event = now
+            self._last_event = now
+            self._pending.add(path)
+            self._condition.notify_all()
+    
+    def _startThread(self, target: Callable[[], None], name: str) -> None:
+        """Start a daemon thread owned by the watcher.
+        
+        Args:
+            target: The thread function.
+            name: The thread name.
+        """
+        thread = threading.Thread(target=target, name=name, daemon=True)
+        thread.start()
+        self._threads.append(thread)
+    
+    def _deliverBatches(self) -> None:
+        """Hand touched paths to the listener once events settle down."""
+        while True:
+            with self._condition:
+                while not self._pending and not self._stopping:
+                    self._condition.wait()
+                
+                # Wait for a quiet period, but not longer than max_delay
+                while not self._stopping:
+                    deadline = min(self._last_event + self.debounce,
+                                   self._first_event + self.max_delay)
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+                
+                if self._stopping:
+                    return
+                batch = self._pending
+                self._pending = set()
+            
+            updated = sorted(p for p in batch if p.is_file())
+            deleted = sorted(p for p in batch if not p.is_file())
+            try:
+                self.listener(updated, deleted)
+            except Exception as e:
+                logger.error(f"Error handling file changes: {e}")
+    
+    def _poll(self) -> None:
+        """Detect changes by comparing directory snapshots."""
+        snapshot = self._snapshot()
+        dir_mtime = self._getDirectoryMtime()
+        polls = 0
+        
+        while True:
+            with self._condition:
+                if self._condition.wait_for(lambda: self._stopping, self.poll_interval):
+                    return
+            
+            # Creating, deleting or renaming an entry changes the directory
+            # mtime, so the listing is only re-read when it moved
+            polls += 1
+            current_mtime = self._getDirectoryMtime()
+            if current_mtime == dir_mtime and polls % FULL_SCAN_EVERY:
+                continue
+            dir_mtime = current_mtime
+            
+            current = self._snapshot()
+            for path, signature in current.items():
+                if snapshot.get(path) != signature:
+                    self.touch(path)
+            for path in snapshot.keys() - current.keys():
+                self.touch(path)
+            snapshot = current
+    
+    def _getDirectoryMtime(self) -> Optional[int]:
+        """Get the modification time of the watched directory.
+        
+        Returns:
+            The mtime in nanoseconds, or None if the directory is missing.
+        """
+        try:
+            return os.stat(self.directory).st_mtime_ns
+        except OSError:
+            return None
+    
+    def _snapshot(self) -> Dict[Path, Tuple[int, int]]:
+        """Stat the images in the watched directory.
+        
+        Returns:
+            A dictionary mapping image paths to (size, mtime) pairs.
+        """
+        snapshot = {}
+        try:
+            with os.scandir(self.directory) as entries:
+                for entry in entries:
+                    path = Path(entry.path)
+                    if path.suffix.lower() not in SUPPORTED_EXTENSIONS:
+                        continue
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    snapshot[path] = (stat.st_size, stat.st_mtime_ns)
+        except OSError as e:
+            logger.error(f"Error scanning {self.directory}: {e}")
+        return snapshot
\ No newline at end of file
@@ -0,0 +1,190 @@
+"""Memory-bounded LRU cache for decoded and scaled images."""
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from ..config import IMAGE_CACHE_MAX_BYTES
+from ..utils.logger import logger
+
+# Cache key: (image path, modification time, (target width, target height))
+CacheKey = Tuple[Path, float, Tuple[int, int]]
+
+class ImageCache:
+    """Least-recently-used cache of decoded frames with a byte budget.
+    
+    Entries are keyed by path, modification time and target size, so a file
+    that changes on disk or a display that changes size never gets a stale
+    frame. The cache does not know how frames are represented; callers pass
+    the byte cost of each value when storing it.
+    """
+    
+    def __init__(self, max_bytes: int = IMAGE_CACHE_MAX_BYTES):
+        """Initialize the cache.
+        
+        Args:
+            max_bytes: Maximum total size of the cached values in bytes.
+        """
+        self.max_bytes = max_bytes
+        self.bytes_used = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        
+        self._entries: 'OrderedDict[CacheKey, Tuple[Any, int]]' = OrderedDict()
+        self._keys_by_path: Dict[Path, Set[CacheKey]] = {}
+        self._lock = threading.Lock()
+    
+    def get(self, image_path: Path, mtime: float, size: Tuple[int, int]) -> Optional[Any]:
+        """Get a cached frame, marking it as recently used.
+        
+        Args:
+            image_path: Path to the image file.
+            mtime: Modification time of the image file.
+            size: Target (width, height) the frame was scaled to.
+            
+        Returns:
+            The cached value, or None if it is not cached.
+        """
+        key = (image_path, mtime, size)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+    
+    def peek(self, image_path: Path, mtime: float, size: Tuple[int, int]) -> Optional[Any]:
+        """Get a cached frame without touching statistics or order.
+        
+        Args:
+            image_path: Path to the image file.
+            mtime: Modification time of the image file.
+            size: Target (width, height) the frame was scaled to.
+            
+        Returns:
+            The cached value, or None if it is not cached.
+        """
+        with self._lock:
+            entry = self._entries.get((image_path, mtime, size))
+            return entry[0] if entry is not None else None
+    
+    def contains(self, image_path: Path, mtime: float, size: Tuple[int, int]) -> bool:
+        """Check whether a frame is cached without touching statistics or order.
+        
+        Args:
+            image_path: Path to the image file.
+            mtime: Modification time of the image file.
+            size: Target (width, height) the frame was scaled to.
+            
+        Returns:
+            True if the frame is cached, False otherwise.
+        """
+        with self._lock:
+            return (image_path, mtime, size) in self._entries
+    
+    def put(self, image_path: Path, mtime: float, size: Tuple[int, int],
+            value: Any, nbytes: int) -> bool:
+        """Store a frame, evicting least recently used frames to fit the budget.
+        
+        Args:
+            image_path: Path to the image file.
+            mtime: Modification time of the image file.
+            size: Target (width, height) the frame was scaled to.
+            value: The decoded frame.
+            nbytes: Memory used by the frame in bytes.
+            
+        Returns:
+            True if the frame was cached, False if it is larger than the budget.
+        """
+        if nbytes > self.max_bytes:
+            logger.debug(f"Frame too large to cache: {image_path.name} ({nbytes} bytes)")
+            return False
+        
+        key = (image_path, mtime, size)
+        with self._lock:
+            self._removeKey(key)
+            
+            while self._entries and self.bytes_used + nbytes > self.max_bytes:
+                oldest_key = next(iter(self._entries))
+                self._removeKey(oldest_key)
+                self.evictions += 1
+            
+            self._entries[key] = (value, nbytes)
+            self._keys_by_path.setdefault(image_path, set()).add(key)
+            self.bytes_used += nbytes
+        return True
+    
+    def invalidate(self, image_path: Path) -> int:
+        """Drop every cached frame of an image.
+        
+        Args:
+            image_path: Path to the image file.
+            
+        Returns:
+            The number of frames dropped.
+        """
+        with self._lock:
+            keys = list(self._keys_by_path.get(image_path, ()))
+            for key in keys:
+                self._removeKey(key)
+        return len(keys)
+    
+    def clear(self) -> None:
+        """Drop all cached frames."""
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_path.clear()
+            self.bytes_used = 0
+    
+    def onImagesChanged(self,
+                        added: List[Path],
+                        removed: List[Path],
+                        changed: List[Path]) -> None:
+        """Image loader change listener dropping frames of stale files.
+        
+        Args:
+            added: Image paths that appeared.
+            removed: Image paths that disappeared.
+            changed: Image paths that were modified.
+        """
+        for image_path in list(removed) + list(changed):
+            self.invalidate(image_path)
+    
+    def getStats(self) -> Dict[str, Any]:
+        """Get cache statistics.
+        
+        Returns:
+            A dictionary with entry count, byte usage and hit/miss/eviction counters.
+        """
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes_used': self.bytes_used,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+                'evictions': self.evictions,
+            }
+    
+    def _removeKey(self, key: CacheKey) -> None:
+        """Remove an entry. The caller must hold the lock.
+        
+        Args:
+            key: The cache key to remove.
+        """
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        
+        self.bytes_used -= entry[1]
+        keys = self._keys_by_path.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_path[key[0]]
\ No newline at end of file
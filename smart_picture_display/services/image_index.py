@@ -0,0 +1,293 @@
+"""Persistent index of local image metadata."""
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+from ..config import IMAGE_INDEX_PATH
+from ..utils.logger import logger
+
+class IndexedImage(NamedTuple):
+    """Metadata recorded for a local image file."""
+    path: Path
+    size: int
+    mtime: float
+    valid: bool
+    width: int = 0
+    height: int = 0
+    format: str = ""
+    verified: bool = False
+
+# Number of buffered display times that triggers a write
+DISPLAY_FLUSH_THRESHOLD = 50
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS images (
+    path TEXT PRIMARY KEY,
+    directory TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    valid INTEGER NOT NULL,
+    width INTEGER NOT NULL DEFAULT 0,
+    height INTEGER NOT NULL DEFAULT 0,
+    format TEXT NOT NULL DEFAULT '',
+    verified INTEGER NOT NULL DEFAULT 0,
+    indexed_at REAL NOT NULL,
+    last_displayed REAL NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS images_directory ON images (directory);
+"""
+
+_COLUMNS = "path, size, mtime, valid, width, height, format, verified"
+
+def _toIndexedImage(row: tuple) -> IndexedImage:
+    """Convert a row selected with _COLUMNS to an IndexedImage.
+    
+    Args:
+        row: The database row.
+    
+    Returns:
+        The indexed metadata.
+    """
+    path, size, mtime, valid, width, height, fmt, verified = row
+    return IndexedImage(Path(path), size, mtime, bool(valid), width, height, fmt, bool(verified))
+
+class ImageIndex:
+    """SQLite-backed index of image files keyed by path.
+    
+    The index lets a refresh compare each file's (size, mtime) against what
+    was recorded last time and only re-inspect files that changed. It also
+    records whether a file passed full verification, so that neither a
+    file that was verified nor one that failed is ever checked again.
+    """
+    
+    def __init__(self, db_path: Path = IMAGE_INDEX_PATH):
+        """Initialize the index, creating the database if needed.
+        
+        Args:
+            db_path: Path to the SQLite database file.
+        """
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = self._connect(db_path)
+        
+        # Display times are buffered so showing a slide does not write to disk
+        self._pending_display_times: Dict[Path, float] = {}
+    
+    def _connect(self, db_path: Path) -> sqlite3.Connection:
+        """Open the database, falling back to an in-memory index on failure.
+        
+        Args:
+            db_path: Path to the SQLite database file.
+        
+        Returns:
+            An open connection with the schema created.
+        """
+        try:
+            conn = sqlite3.connect(str(db_path), check_same_thread=False)
+            conn.executescript(_SCHEMA)
+            self._migrate(conn)
+            return conn
+        except sqlite3.Error as e:
+            logger.error(f"Could not open image index {db_path}, using in-memory index: {e}")
+            conn = sqlite3.connect(":memory:", check_same_thread=False)
+            conn.executescript(_SCHEMA)
+            return conn
+    
+    def _migrate(self, conn: sqlite3.Connection) -> None:
+        """Add columns missing from indexes created by older versions.
+        
+        Args:
+            conn: The open database connection.
+        """
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(images)")}
+        if 'last_displayed' not in columns:
+            conn.execute("ALTER TABLE images ADD COLUMN last_displayed REAL NOT NULL DEFAULT 0")
+            conn.commit()
+        if 'verified' not in columns:
+            # Older versions fully verified every file they indexed
+            conn.execute("ALTER TABLE images ADD COLUMN verified INTEGER NOT NULL DEFAULT 0")
+            conn.execute("UPDATE images SET verified = 1")
+            conn.commit()
+    
+    def getEntries(self, directory: Path) -> Dict[Path, IndexedImage]:
+        """Get all indexed images in a directory.
+        
+        Args:
+            directory: The directory whose images to return.
+        
+        Returns:
+            A dictionary mapping image paths to their indexed metadata.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {_COLUMNS} FROM images WHERE directory = ?",
+                (str(directory),)
+            ).fetchall()
+        
+        entries = {}
+        for row in rows:
+            entry = _toIndexedImage(row)
+            entries[entry.path] = entry
+        return entries
+    
+    def getUnverified(self, directory: Path, limit: int = 100) -> List[IndexedImage]:
+        """Get images that passed the header check but were never verified.
+        
+        Args:
+            directory: The directory whose images to return.
+            limit: Maximum number of images to return.
+        
+        Returns:
+            The indexed metadata of the images.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {_COLUMNS} FROM images "
+                "WHERE directory = ? AND valid = 1 AND verified = 0 LIMIT ?",
+                (str(directory), limit)
+            ).fetchall()
+        return [_toIndexedImage(row) for row in rows]
+    
+    def getEntry(self, image_path: Path) -> Optional[IndexedImage]:
+        """Get the indexed metadata of a single image.
+        
+        Args:
+            image_path: Path to the image file.
+        
+        Returns:
+            The indexed metadata, or None if the image is not indexed.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {_COLUMNS} FROM images WHERE path = ?",
+                (str(image_path),)
+            ).fetchone()
+        
+        return _toIndexedImage(row) if row is not None else None
+    
+    def update(self, entries: Iterable[IndexedImage]) -> None:
+        """Insert or replace the metadata of several images.
+        
+        Args:
+            entries: The image metadata to record.
+        """
+        now = time.time()
+        rows = [
+            (str(e.path), str(e.path.parent), e.size, e.mtime, int(e.valid),
+             e.width, e.height, e.format, int(e.verified), now)
+            for e in entries
+        ]
+        if not rows:
+            return
+        
+        with self._lock:
+            try:
+                with self._conn:
+                    # Upsert so that the display history of a file survives
+                    self._conn.executemany(
+                        "INSERT INTO images "
+                        "(path, directory, size, mtime, valid, width, height, format, verified, indexed_at) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                        "ON CONFLICT(path) DO UPDATE SET "
+                        "size = excluded.size, mtime = excluded.mtime, valid = excluded.valid, "
+                        "width = excluded.width, height = excluded.height, "
+                        "format = excluded.format, verified = excluded.verified, "
+                        "indexed_at = excluded.indexed_at",
+                        rows
+                    )
+            except sqlite3.Error as e:
+                logger.error(f"Error updating image index: {e}")
+    
+    def markVerified(self, entry: IndexedImage, valid: bool) -> bool:
+        """Record the result of fully verifying an image.
+        
+        Nothing is recorded if the file was re-indexed in the meantime.
+        
+        Args:
+            entry: The indexed metadata the verification was done for.
+            valid: Whether the image passed verification.
+        
+        Returns:
+            True if the result was recorded.
+        """
+        with self._lock:
+            try:
+                with self._conn:
+                    cursor = self._conn.execute(
+                        "UPDATE images SET verified = 1, valid = ? "
+                        "WHERE path = ? AND size = ? AND mtime = ?",
+                        (int(valid), str(entry.path), entry.size, entry.mtime)
+                    )
+                return cursor.rowcount > 0
+            except sqlite3.Error as e:
+                logger.error(f"Error recording verification of {entry.path}: {e}")
+                return False
+    
+    def remove(self, image_paths: Iterable[Path]) -> None:
+        """Remove images from the index.
+        
+        Args:
+            image_paths: Paths of the images to remove.
+        """
+        rows = [(str(p),) for p in image_paths]
+        if not rows:
+            return
+        
+        with self._lock:
+            try:
+                with self._conn:
+                    self._conn.executemany("DELETE FROM images WHERE path = ?", rows)
+            except sqlite3.Error as e:
+                logger.error(f"Error removing entries from image index: {e}")
+    
+    def markDisplayed(self, image_path: Path, when: Optional[float] = None) -> None:
+        """Record that an image was shown.
+        
+        Args:
+            image_path: Path to the image file.
+            when: Time it was shown, defaults to now.
+        """
+        with self._lock:
+            self._pending_display_times[image_path] = when or time.time()
+            should_flush = len(self._pending_display_times) >= DISPLAY_FLUSH_THRESHOLD
+        if should_flush:
+            self.flushDisplayTimes()
+    
+    def flushDisplayTimes(self) -> None:
+        """Write buffered display times to the database."""
+        with self._lock:
+            rows = [(when, str(path)) for path, when in self._pending_display_times.items()]
+            self._pending_display_times.clear()
+            if not rows:
+                return
+            try:
+                with self._conn:
+                    self._conn.executemany("UPDATE images SET last_displayed = ? WHERE path = ?", rows)
+            except sqlite3.Error as e:
+                logger.error(f"Error recording display times: {e}")
+    
+    def getDisplayTimes(self, directory: Path) -> Dict[Path, float]:
+        """Get when each image in a directory was last shown.
+        
+        Args:
+            directory: The directory whose images to return.
+        
+        Returns:
+            A dictionary mapping image paths to display times; images that
+            were never shown are omitted.
+        """
+        self.flushDisplayTimes()
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT path, last_displayed FROM images WHERE directory = ? AND last_displayed > 0",
+                (str(directory),)
+            ).fetchall()
+        return {Path(path): when for path, when in rows}
+    
+    def close(self) -> None:
+        """Flush buffered writes and close the database connection."""
+        self.flushDisplayTimes()
+        with self._lock:
+            self._conn.close()
\ No newline at end of file
@@ -1,73 +1,375 @@
 """Service for loading and managing local images."""
 import os
+import time
+from bisect import bisect_left, insort
 from pathlib import Path
-from typing import List, Optional
-import random
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
 from PIL import Image, UnidentifiedImageError
 
-from ..config import IMAGES_DIR, SUPPORTED_EXTENSIONS
+from ..config import IMAGES_DIR, IMAGE_VALIDATION, SHUFFLE, SUPPORTED_EXTENSIONS
+from ..utils.imaging import verifyImage
 from ..utils.logger import logger
+from ..utils.metrics import IMAGE_REFRESH_SECONDS, IMAGES_INDEXED, IMAGES_LISTED
+from .image_index import ImageIndex, IndexedImage
+from .shuffle_order import ShuffleOrder
+from .sync_state import SyncState
+
+# Callback receiving (added, removed, changed) image paths after a refresh
+ChangeListener = Callable[[List[Path], List[Path], List[Path]], None]
 
 class ImageLoader:
     """Handles loading and managing images from the local file system."""
     
-    def __init__(self, images_dir: Path = IMAGES_DIR):
+    def __init__(self,
+                 images_dir: Path = IMAGES_DIR,
+                 image_index: Optional[ImageIndex] = None,
+                 validation: str = IMAGE_VALIDATION,
+                 scan: bool = True,
+                 shuffle: bool = SHUFFLE,
+                 manifest: Optional[SyncState] = None):
         """Initialize the image loader.
         
         Args:
             images_dir: Directory path where images are stored.
+            image_index: Persistent metadata index, created if not given.
+            validation: "deferred" to only check file headers while listing
+                and leave full verification to verifyPending, or "full" to
+                fully verify new files while listing.
+            scan: Scan the images directory now. If False the list is
+                filled from the image index instead, which is much faster
+                but may be out of date until scanForChanges is applied.
+            shuffle: Move through the images in shuffled order rather
+                than by name.
+            manifest: Drive sync manifest naming the content-addressed
+                images synced from Drive.
         """
         self.images_dir = images_dir
+        self.image_index = image_index or ImageIndex()
+        self.validation = validation
         self.image_paths: List[Path] = []
+        self.image_mtimes: Dict[Path, float] = {}
         self.current_index = 0
-        self.refreshImageList()
+        self.shuffle = shuffle
+        self.shuffle_order = ShuffleOrder()
+        self.manifest = manifest
+        self._change_listeners: List[ChangeListener] = []
+        # Verified entries whose result could not be written to the index;
+        # skipped so they are not verified over and over
+        self._unrecorded: Set[IndexedImage] = set()
+        if scan:
+            self.refreshImageList()
+        else:
+            self.loadFromIndex()
+    
+    def addChangeListener(self, listener: ChangeListener) -> None:
+        """Register a callback notified when a refresh finds changed files.
+        
+        Args:
+            listener: Callable receiving lists of added, removed and changed
+                (modified since the previous refresh) image paths.
+        """
+        self._change_listeners.append(listener)
     
     def refreshImageList(self) -> None:
-        """Refresh the list of available images from the file system."""
+        """Refresh the list of available images from the file system.
+        
+        Only files whose size or modification time differ from the image
+        index are opened and verified; everything else is a stat call. The
+        current image stays current if it still exists.
+        """
+        previous_mtimes = self.image_mtimes
+        previous_image = self.getCurrentImage()
         self.image_paths = []
+        self.image_mtimes = {}
+        start = time.perf_counter()
         try:
-            for file_path in self.images_dir.glob("*"):
-                if self._isValidImage(file_path):
-                    self.image_paths.append(file_path)
+            self.image_mtimes = self._scanDirectory()
+            IMAGE_REFRESH_SECONDS.observe(time.perf_counter() - start)
             
             # Sort by filename for consistent ordering
-            self.image_paths.sort()
+            self.image_paths = sorted(self.image_mtimes)
             
             if not self.image_paths:
                 logger.warning(f"No images found in {self.images_dir}")
             else:
                 logger.info(f"Found {len(self.image_paths)} images in {self.images_dir}")
                 
-            # Reset current index if needed
-            if self.current_index >= len(self.image_paths):
+            # Keep showing the same image, or reset the index if it is gone
+            if previous_image in self.image_mtimes:
+                self.current_index = bisect_left(self.image_paths, previous_image)
+            elif self.current_index >= len(self.image_paths):
                 self.current_index = 0 if self.image_paths else -1
                 
         except Exception as e:
             logger.error(f"Error refreshing image list: {e}")
+        
+        self._notifyChanges(previous_mtimes)
+    
+    def loadFromIndex(self) -> None:
+        """Fill the image list from the image index without touching the files.
+        
+        The files are not even stat'ed, so this takes a single query. Files
+        that changed while the application was not running are picked up
+        by applying the result of scanForChanges.
+        """
+        entries = self.image_index.getEntries(self.images_dir)
+        self.image_mtimes = {path: entry.mtime for path, entry in entries.items() if entry.valid}
+        self.image_paths = sorted(self.image_mtimes)
+        self.current_index = 0 if self.image_paths else -1
+        self.shuffle_order.reset()
+        IMAGES_LISTED.set(len(self.image_paths))
+        logger.info(f"Loaded {len(self.image_paths)} images from the image index")
+    
+    def scanForChanges(self) -> Tuple[List[Path], List[Path], List[Path]]:
+        """Compare the images directory with the image list.
+        
+        Does file I/O, so it is meant to run off the GUI thread. New and
+        changed files are inspected and indexed, but the image list itself
+        is not changed; pass the result to applyChanges.
+        
+        Returns:
+            A tuple of (added, removed, changed) image paths.
+        """
+        known = dict(self.image_mtimes)
+        try:
+            found = self._scanDirectory()
+        except Exception as e:
+            logger.error(f"Error scanning for image changes: {e}")
+            return [], [], []
+        
+        added = [p for p in found if p not in known]
+        removed = [p for p in known if p not in found]
+        changed = [p for p, mtime in found.items() if p in known and known[p] != mtime]
+        return added, removed, changed
+    
+    def _scanDirectory(self) -> Dict[Path, float]:
+        """Scan the images directory, bringing the image index up to date.
+        
+        Only files whose size or modification time differ from the image
+        index are inspected; everything else is a stat call.
+        
+        Returns:
+            A dictionary mapping the paths of valid images to their
+            modification times.
+        """
+        indexed = self.image_index.getEntries(self.images_dir)
+        updated: List[IndexedImage] = []
+        found: Dict[Path, float] = {}
+        
+        with os.scandir(self.images_dir) as entries:
+            for entry in entries:
+                file_path = Path(entry.path)
+                if file_path.suffix.lower() not in SUPPORTED_EXTENSIONS:
+                    continue
+                if not entry.is_file():
+                    continue
+                
+                stat = entry.stat()
+                record = indexed.pop(file_path, None)
+                if record is None or record.size != stat.st_size or record.mtime != stat.st_mtime:
+                    record = self._inspectImage(file_path, stat)
+                    updated.append(record)
+                
+                if record.valid:
+                    found[file_path] = stat.st_mtime
+        
+        # Whatever is left in the index no longer exists on disk
+        self.image_index.update(updated)
+        self.image_index.remove(indexed.keys())
+        if updated:
+            logger.info(f"Indexed {len(updated)} new or changed files")
+        return found
     
-    def _isValidImage(self, file_path: Path) -> bool:
-        """Check if the file is a valid image.
+    def _notifyChanges(self, previous_mtimes: Dict[Path, float]) -> None:
+        """Tell listeners which images were added, removed or modified.
         
         Args:
-            file_path: Path to the file to check.
+            previous_mtimes: Image modification times before the refresh.
+        """
+        added = [p for p in self.image_mtimes if p not in previous_mtimes]
+        removed = [p for p in previous_mtimes if p not in self.image_mtimes]
+        changed = [p for p, mtime in self.image_mtimes.items()
+                   if p in previous_mtimes and previous_mtimes[p] != mtime]
+        self._notifyListeners(added, removed, changed)
+    
+    def _notifyListeners(self, added: List[Path], removed: List[Path], changed: List[Path]) -> None:
+        """Call the change listeners if anything changed.
+        
+        Args:
+            added: Image paths that appeared.
+            removed: Image paths that disappeared.
+            changed: Image paths that were modified.
+        """
+        if not (added or removed or changed):
+            return
+        
+        self.shuffle_order.update(added, removed)
+        IMAGES_LISTED.set(len(self.image_paths))
+        for listener in self._change_listeners:
+            try:
+                listener(added, removed, changed)
+            except Exception as e:
+                logger.error(f"Error in image change listener: {e}")
+    
+    def inspectFiles(self, file_paths: Iterable[Path]) -> List[Path]:
+        """Verify and index specific files, e.g. ones a sync just wrote.
+        
+        Does file I/O, so it is meant to run off the GUI thread. Files the
+        index already knows in their current state are not opened again.
+        The image list itself is not changed; see applyChanges.
+        
+        Args:
+            file_paths: Paths of the files to inspect.
             
         Returns:
-            True if the file is a valid image, False otherwise.
+            The paths that are valid images.
         """
-        if not file_path.is_file():
-            return False
+        records = []
+        updated = []
+        for file_path in file_paths:
+            if file_path.suffix.lower() not in SUPPORTED_EXTENSIONS:
+                continue
+            try:
+                stat = file_path.stat()
+            except OSError as e:
+                logger.warning(f"Could not inspect {file_path}: {e}")
+                continue
             
-        if file_path.suffix.lower() not in SUPPORTED_EXTENSIONS:
-            return False
+            record = self.image_index.getEntry(file_path)
+            if record is None or record.size != stat.st_size or record.mtime != stat.st_mtime:
+                record = self._inspectImage(file_path, stat)
+                updated.append(record)
+            records.append(record)
+        
+        self.image_index.update(updated)
+        return [record.path for record in records if record.valid]
+    
+    def applyChanges(self,
+                     added: Iterable[Path],
+                     removed: Iterable[Path],
+                     changed: Iterable[Path] = ()) -> None:
+        """Update the image list in place without rescanning the directory.
+        
+        The current image stays current if it is still available; if it
+        was removed, the image that took its place becomes current.
+        
+        Args:
+            added: Paths of new valid images.
+            removed: Paths of images that are gone.
+            changed: Paths of images whose content changed.
+        """
+        current = self.getCurrentImage()
+        changed = list(changed)
+        previous_mtimes = {p: self.image_mtimes[p] for p in changed if p in self.image_mtimes}
+        removed = [p for p in removed if p in self.image_mtimes]
+        # A changed file that was not listed before is new to the list
+        added = [p for p in list(added) + changed if p not in self.image_mtimes]
+        changed = [p for p in changed if p in self.image_mtimes]
+        
+        for path in removed:
+            index = bisect_left(self.image_paths, path)
+            if index < len(self.image_paths) and self.image_paths[index] == path:
+                del self.image_paths[index]
+            del self.image_mtimes[path]
+        
+        for path in added + changed:
+            try:
+                mtime = path.stat().st_mtime
+            except OSError:
+                continue
+            if path not in self.image_mtimes:
+                insort(self.image_paths, path)
+            self.image_mtimes[path] = mtime
+        
+        # Updates reported twice, e.g. by a sync and the watcher, are not changes
+        added = [p for p in added if p in self.image_mtimes]
+        changed = [p for p in changed if self.image_mtimes[p] != previous_mtimes.get(p)]
+        
+        # Keep pointing at the same image across the update
+        if not self.image_paths:
+            self.current_index = -1
+        elif current is not None:
+            index = bisect_left(self.image_paths, current)
+            self.current_index = min(index, len(self.image_paths) - 1)
+        else:
+            self.current_index = 0
+        
+        self._notifyListeners(added, removed, changed)
+    
+    def verifyPending(self, limit: int = 100) -> List[Path]:
+        """Fully verify images that so far only passed the header check.
+        
+        Does file I/O, so it is meant to run off the GUI thread. Results
+        are recorded in the index, so no file is verified twice; an image
+        whose result cannot be recorded is skipped until it is re-indexed.
+        The image list itself is not changed.
+        
+        Args:
+            limit: Maximum number of images to verify.
+        
+        Returns:
+            Paths of the images that failed verification.
+        """
+        failed = []
+        for entry in self._getUnverified(limit):
+            valid = verifyImage(entry.path)
+            if not self.image_index.markVerified(entry, valid):
+                self._unrecorded.add(entry)
+            elif not valid:
+                logger.warning(f"Invalid image file: {entry.path}")
+                failed.append(entry.path)
+        return failed
+    
+    def hasPendingVerification(self) -> bool:
+        """Check whether any listed image still needs full verification.
+        
+        Returns:
+            True if verifyPending has work to do.
+        """
+        return bool(self._getUnverified(1))
+    
+    def _getUnverified(self, limit: int) -> List[IndexedImage]:
+        """Get images still to be verified, leaving out unrecordable ones.
+        
+        Args:
+            limit: Maximum number of images to return.
+        
+        Returns:
+            The indexed metadata of the images.
+        """
+        entries = self.image_index.getUnverified(self.images_dir, limit + len(self._unrecorded))
+        return [entry for entry in entries if entry not in self._unrecorded][:limit]
+    
+    def _inspectImage(self, file_path: Path, stat: os.stat_result) -> IndexedImage:
+        """Check an image, collecting its index metadata.
+        
+        In deferred validation mode only the header is read, which checks
+        the signature and yields the dimensions without decoding.
+        
+        Args:
+            file_path: Path to the file to check.
+            stat: Result of stat() on the file.
             
-        # Try to open the image to verify it's valid
+        Returns:
+            The metadata to record, with valid set to False if the file is
+            not a readable image.
+        """
+        IMAGES_INDEXED.inc()
         try:
             with Image.open(file_path) as img:
-                img.verify()
-            return True
+                width, height = img.size
+                image_format = img.format or ""
+            if width <= 0 or height <= 0:
+                raise SyntaxError("image has no pixels")
         except (UnidentifiedImageError, IOError, SyntaxError):
             logger.warning(f"Invalid image file: {file_path}")
-            return False
+            return IndexedImage(file_path, stat.st_size, stat.st_mtime, False, verified=True)
+        
+        verified = self.validation == "full"
+        if verified and not verifyImage(file_path):
+            logger.warning(f"Invalid image file: {file_path}")
+            return IndexedImage(file_path, stat.st_size, stat.st_mtime, False, verified=True)
+        return IndexedImage(file_path, stat.st_size, stat.st_mtime, True, width, height, image_format, verified)
     
     def getCurrentImage(self) -> Optional[Path]:
         """Get the current image path.
@@ -83,42 +385,158 @@ class ImageLoader:
             
         return self.image_paths[self.current_index]
     
+    def setCurrentImage(self, image_path: Optional[Path]) -> bool:
+        """Make an image the current one.
+        
+        Args:
+            image_path: Path of the image to show.
+        
+        Returns:
+            True if the image is in the list and is now current.
+        """
+        if image_path not in self.image_mtimes:
+            return False
+        
+        self.current_index = bisect_left(self.image_paths, image_path)
+        return True
+    
+    def setShuffle(self, enabled: bool) -> None:
+        """Switch between shuffled and by-name order.
+        
+        Args:
+            enabled: True to move through the images in shuffled order.
+        """
+        self.shuffle = enabled
+        logger.info(f"Shuffle {'on' if enabled else 'off'}")
+    
     def getNextImage(self) -> Optional[Path]:
         """Get the next image in the sequence.
         
+        In shuffle mode this is the next image of the shuffled order, or
+        the one shown after the current one if it was reached by going back.
+        
         Returns:
             The next image path or None if no images are available.
         """
         if not self.image_paths:
             return None
             
+        if self.shuffle:
+            return self._moveTo(self.shuffle_order.forward(self.image_paths, self.getCurrentImage()))
+        
         self.current_index = (self.current_index + 1) % len(self.image_paths)
         return self.getCurrentImage()
     
     def getPreviousImage(self) -> Optional[Path]:
         """Get the previous image in the sequence.
         
+        Right after a random jump, and always in shuffle mode, this is the
+        image shown before the current one rather than its neighbour.
+        
         Returns:
             The previous image path or None if no images are available.
         """
         if not self.image_paths:
             return None
             
+        previous = self.shuffle_order.back(self.getCurrentImage())
+        if previous is not None or self.shuffle:
+            # At the start of the shuffle history there is nothing to go back to
+            return self._moveTo(previous)
+        
         self.current_index = (self.current_index - 1) % len(self.image_paths)
         return self.getCurrentImage()
     
     def getRandomImage(self) -> Optional[Path]:
         """Get a random image from the available images.
         
+        Images come from the shuffled order, so none repeats before every
+        image was shown, and getPreviousImage returns to the image before.
+        
         Returns:
             A random image path or None if no images are available.
         """
         if not self.image_paths:
             return None
             
-        self.current_index = random.randint(0, len(self.image_paths) - 1)
+        return self._moveTo(self.shuffle_order.forward(self.image_paths, self.getCurrentImage(), replay=False))
+    
+    def _moveTo(self, image_path: Optional[Path]) -> Optional[Path]:
+        """Make an image current if given, keeping the current one otherwise.
+        
+        Args:
+            image_path: Path of the image to show.
+        
+        Returns:
+            The current image path.
+        """
+        if image_path is not None:
+            self.setCurrentImage(image_path)
         return self.getCurrentImage()
     
+    def getUpcomingImages(self, ahead: int, behind: int) -> List[Path]:
+        """Get the images likely to be shown after the current one.
+        
+        Args:
+            ahead: Number of images to return after the current one.
+            behind: Number of images to return before the current one.
+        
+        Returns:
+            Image paths ordered by how soon they are likely to be shown,
+            without the current image and without duplicates.
+        """
+        if not self.image_paths:
+            return []
+        
+        if self.shuffle:
+            current = self.getCurrentImage()
+            upcoming = self.shuffle_order.peek(self.image_paths, current, ahead, behind)
+            return [path for i, path in enumerate(upcoming) if path != current and path not in upcoming[:i]]
+        
+        count = len(self.image_paths)
+        index = self.current_index if 0 <= self.current_index < count else 0
+        
+        offsets = []
+        for step in range(1, max(ahead, behind) + 1):
+            if step <= ahead:
+                offsets.append(step)
+            if step <= behind:
+                offsets.append(-step)
+        
+        upcoming: List[Path] = []
+        for offset in offsets:
+            path = self.image_paths[(index + offset) % count]
+            if path != self.image_paths[index] and path not in upcoming:
+                upcoming.append(path)
+        return upcoming
+    
+    def getImageMtime(self, image_path: Path) -> float:
+        """Get the modification time recorded for an image.
+        
+        Args:
+            image_path: Path to the image file.
+            
+        Returns:
+            The modification time seen by the last refresh, or 0 if unknown.
+        """
+        return self.image_mtimes.get(image_path, 0.0)
+    
+    def getDisplayName(self, image_path: Path) -> str:
+        """Get the name to show for an image.
+        
+        Args:
+            image_path: Path to the image file.
+        
+        Returns:
+            The Drive names of a synced image, joined when copies of the
+            same photo were stored once, otherwise the file name.
+        """
+        if self.manifest and image_path.parent == self.images_dir:
+            names = self.manifest.getNames(image_path.name)
+            if names:
+                return ", ".join(names)
+        return image_path.name
+    
     def getImageCount(self) -> int:
         """Get the total number of available images.
         
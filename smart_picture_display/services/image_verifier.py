@@ -0,0 +1,100 @@
+"""Background full verification of images that only passed a header check."""
+import os
+import threading
+from pathlib import Path
+from typing import Callable, List
+
+from ..config import VERIFY_BATCH_SIZE, VERIFY_NICENESS
+from ..utils.logger import logger
+from .image_loader import ImageLoader
+
+# Callback receiving the paths of images that failed verification
+FailureListener = Callable[[List[Path]], None]
+
+class ImageVerifier:
+    """Fully verifies listed images on a low-priority background thread.
+    
+    Listing only checks image headers so the slideshow can start right
+    away. This thread then works through the unverified images in small
+    batches and reports the ones that turn out to be broken, so they can
+    be dropped from rotation. It sleeps until the image list changes.
+    """
+    
+    def __init__(self,
+                 image_loader: ImageLoader,
+                 listener: FailureListener,
+                 batch_size: int = VERIFY_BATCH_SIZE):
+        """Initialize the verifier.
+        
+        Args:
+            image_loader: The image loader whose images to verify.
+            listener: Called on the verifier thread with the paths of
+                images that failed verification.
+            batch_size: Number of images verified between checks for stop.
+        """
+        self.image_loader = image_loader
+        self.listener = listener
+        self.batch_size = batch_size
+        
+        self._wake = threading.Event()
+        self._stopping = False
+        self._thread = None
+        
+        self.image_loader.addChangeListener(self._onImagesChanged)
+    
+    def start(self) -> None:
+        """Start verifying in the background."""
+        self._stopping = False
+        self._wake.set()
+        self._thread = threading.Thread(target=self._run, name="image-verify", daemon=True)
+        self._thread.start()
+    
+    def stop(self) -> None:
+        """Stop verifying and wait for the current image to finish."""
+        self._stopping = True
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+    
+    def wake(self) -> None:
+        """Look for unverified images again."""
+        self._wake.set()
+    
+    def _onImagesChanged(self, added: List[Path], removed: List[Path], changed: List[Path]) -> None:
+        """Wake up when new or changed images may need verifying.
+        
+        Args:
+            added: Paths of new images.
+            removed: Paths of images that are gone.
+            changed: Paths of images whose content changed.
+        """
+        if added or changed:
+            self.wake()
+    
+    def _run(self) -> None:
+        """Verify batches of images until none are left, then wait."""
+        self._lowerPriority()
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            
+            while not self._stopping and self.image_loader.hasPendingVerification():
+                try:
+                    failed = self.image_loader.verifyPending(self.batch_size)
+                    if failed:
+                        self.listener(failed)
+                except Exception as e:
+                    logger.error(f"Error verifying images: {e}")
+                    break
+            
+            if self._stopping:
+                return
+    
+    def _lowerPriority(self) -> None:
+        """Lower the scheduling priority of the calling thread where supported."""
+        try:
+            # On Linux the nice value of a thread ID only affects that thread
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), VERIFY_NICENESS)
+        except (AttributeError, OSError) as e:
+            logger.debug(f"Could not lower verifier priority: {e}")
\ No newline at end of file
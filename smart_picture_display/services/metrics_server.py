@@ -0,0 +1,83 @@
+"""Local HTTP endpoint serving the metrics to a Prometheus scraper."""
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+from ..config import METRICS_HOST, METRICS_PORT
+from ..utils.logger import logger
+from ..utils.metrics import MetricsRegistry, metrics
+
+# Content type of the Prometheus text exposition format
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    """Answers GET /metrics with the rendered registry."""
+    
+    def do_GET(self) -> None:
+        """Serve the metrics, or 404 for any other path."""
+        if self.path.split('?', 1)[0] not in ('/metrics', '/'):
+            self.send_error(404)
+            return
+        
+        body = self.server.registry.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, format: str, *args) -> None:
+        """Send the access log to the debug log instead of stderr."""
+        logger.debug(f"Metrics request from {self.address_string()}: {format % args}")
+
+
+class MetricsServer:
+    """Serves /metrics in the Prometheus text format on a background thread."""
+    
+    def __init__(self,
+                 port: int = METRICS_PORT,
+                 host: str = METRICS_HOST,
+                 registry: MetricsRegistry = metrics):
+        """Initialize the server.
+        
+        Args:
+            port: TCP port to listen on, 0 to pick a free one.
+            host: Address to listen on.
+            registry: The metrics to serve.
+        """
+        self.port = port
+        self.host = host
+        self.registry = registry
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+    
+    def start(self) -> bool:
+        """Start serving.
+        
+        Returns:
+            True if the server is listening, False if the port is unavailable.
+        """
+        try:
+            self._server = ThreadingHTTPServer((self.host, self.port), _MetricsHandler)
+        except OSError as e:
+            logger.error(f"Could not serve metrics on {self.host}:{self.port}: {e}")
+            return False
+        
+        self._server.daemon_threads = True
+        self._server.registry = self.registry
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True)
+        self._thread.start()
+        logger.info(f"Serving metrics on http://{self.host}:{self.port}/metrics")
+        return True
+    
+    def stop(self) -> None:
+        """Stop serving and close the socket."""
+        if self._server is None:
+            return
+        
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+        self._server = None
+        self._thread = None
\ No newline at end of file
@@ -0,0 +1,305 @@
+"""Background decoding and prefetching of images for the carousel."""
+from pathlib import Path
+from typing import Dict, Optional, Set, Any, Tuple
+
+from PyQt6.QtCore import QObject, QRunnable, QThreadPool, QSize, Qt, pyqtSignal
+from PyQt6.QtGui import QImage, QImageReader
+from PIL import Image
+
+from ..config import PREFETCH_AHEAD, PREFETCH_BEHIND, PREFETCH_WORKERS
+from ..utils.imaging import loadReduced
+from ..utils.logger import logger
+from ..utils.metrics import IMAGE_CACHE_REQUESTS, IMAGE_DECODE_SECONDS
+from ..utils.profiler import profiler
+from .image_cache import ImageCache
+from .image_loader import ImageLoader
+from .rendition_store import RenditionStore
+
+def decodeImage(image_path: Path, target_size: QSize) -> Optional[QImage]:
+    """Decode an image scaled to fit within the target size.
+    
+    JPEGs are decoded with Pillow at reduced resolution, see
+    decodeReducedJpeg. Other formats go through QImageReader, which is
+    handed the scaled size so that it can skip work where the format
+    allows it.
+    
+    Args:
+        image_path: Path to the image file.
+        target_size: The size the image should fit into.
+    
+    Returns:
+        The decoded image, or None if it could not be read.
+    """
+    if target_size.isValid() and not target_size.isEmpty():
+        try:
+            with Image.open(image_path) as img:
+                if img.format == 'JPEG':
+                    return decodeReducedJpeg(img, target_size)
+        except Exception as e:
+            # Leave it to Qt, which reports the error if it cannot read it either
+            logger.debug(f"Pillow could not decode {image_path}: {e}")
+    
+    reader = QImageReader(str(image_path))
+    reader.setAutoTransform(True)
+    
+    source_size = reader.size()
+    if source_size.isValid() and target_size.isValid() and not target_size.isEmpty():
+        scaled_size = source_size.scaled(target_size, Qt.AspectRatioMode.KeepAspectRatio)
+        # Only ever scale down; small images are left for the display to fit
+        if scaled_size.width() < source_size.width():
+            reader.setScaledSize(scaled_size)
+    
+    image = reader.read()
+    if image.isNull():
+        logger.error(f"Failed to decode image {image_path}: {reader.errorString()}")
+        return None
+    return image
+
+def decodeReducedJpeg(img: Image.Image, target_size: QSize) -> QImage:
+    """Decode a JPEG at the smallest DCT scale covering the target size.
+    
+    A 6000x4000 photo shown in a 1024x600 frame is decoded at 1/4 scale,
+    which takes a fraction of the time and memory of a full decode. The
+    pixels are written straight into the QImage buffer, padded to its
+    row stride, with no intermediate conversions.
+    
+    Args:
+        img: The opened, not yet loaded JPEG.
+        target_size: The size the image should fit into.
+    
+    Returns:
+        The decoded image, upright and scaled to fit the target size.
+    """
+    image = loadReduced(img, (target_size.width(), target_size.height()))
+    if image.mode == 'L':
+        image_format = QImage.Format.Format_Grayscale8
+    else:
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+        image_format = QImage.Format.Format_RGB888
+    
+    qimage = QImage(image.width, image.height, image_format)
+    buffer = qimage.bits()
+    buffer.setsize(qimage.sizeInBytes())
+    memoryview(buffer)[:] = image.tobytes('raw', image.mode, qimage.bytesPerLine())
+    return qimage
+
+class _DecodeTask(QRunnable):
+    """Worker task that decodes a single image off the GUI thread."""
+    
+    def __init__(self, prefetcher: 'ImagePrefetcher', image_path: Path, target_size: QSize):
+        """Initialize the decode task.
+        
+        Args:
+            prefetcher: The prefetcher to report the result to.
+            image_path: Path to the image file.
+            target_size: The size the image should fit into.
+        """
+        super().__init__()
+        self.prefetcher = prefetcher
+        self.image_path = image_path
+        self.target_size = QSize(target_size)
+    
+    def run(self) -> None:
+        """Decode the image and hand it back to the prefetcher."""
+        with profiler.section():
+            image = self._decode()
+        self.prefetcher._decoded.emit(self.image_path, image or QImage(), self.target_size)
+    
+    def _decode(self) -> Optional[QImage]:
+        """Decode the image, from its rendition when there is one.
+        
+        Returns:
+            The decoded image, or None if it could not be decoded.
+        """
+        try:
+            # A display-sized rendition is much cheaper to decode than the original
+            source = self.image_path
+            renditions = self.prefetcher.rendition_store
+            if renditions is not None:
+                size = (self.target_size.width(), self.target_size.height())
+                source = renditions.getRendition(self.image_path, size) or self.image_path
+            with IMAGE_DECODE_SECONDS.time(stage='prefetch'):
+                image = decodeImage(source, self.target_size)
+        except Exception as e:
+            logger.error(f"Error decoding image {self.image_path}: {e}")
+            image = None
+        return image
+
+
+class ImagePrefetcher(QObject):
+    """Decodes the images around the current one on a worker pool.
+    
+    Decoded images are stored in the image cache as QImage objects already
+    scaled to the target size, so that the carousel only has to swap pixmaps
+    on a slide change. All state is owned by the GUI thread; workers only
+    decode.
+    """
+    
+    # Signal emitted when an image has been decoded at the current target size
+    imageReady = pyqtSignal(Path, QImage)
+    
+    # Signal emitted when an image could not be decoded
+    imageFailed = pyqtSignal(Path)
+    
+    # Internal signal used by worker threads to deliver results
+    _decoded = pyqtSignal(Path, QImage, QSize)
+    
+    def __init__(self,
+                 image_loader: ImageLoader,
+                 image_cache: ImageCache,
+                 parent: Optional[QObject] = None,
+                 ahead: int = PREFETCH_AHEAD,
+                 behind: int = PREFETCH_BEHIND,
+                 workers: int = PREFETCH_WORKERS,
+                 rendition_store: Optional[RenditionStore] = None):
+        """Initialize the prefetcher.
+        
+        Args:
+            image_loader: The image loader service.
+            image_cache: Cache that decoded images are stored in.
+            parent: Parent object.
+            ahead: Number of images to decode after the current one.
+            behind: Number of images to decode before the current one.
+            workers: Number of background decode threads.
+            rendition_store: Store of display-sized renditions that are
+                decoded instead of the originals when available.
+        """
+        super().__init__(parent)
+        self.image_loader = image_loader
+        self.image_cache = image_cache
+        self.ahead = ahead
+        self.behind = behind
+        self.target_size = QSize()
+        self.rendition_store = rendition_store
+        
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(max(1, workers))
+        
+        self._pending: Set[Path] = set()
+        self.hits = 0
+        self.misses = 0
+        
+        self._decoded.connect(self._onDecoded, Qt.ConnectionType.QueuedConnection)
+    
+    def setTargetSize(self, size: QSize) -> None:
+        """Set the size that images are decoded for.
+        
+        Args:
+            size: The size of the display area.
+        """
+        if size == self.target_size:
+            return
+        
+        # Frames decoded for the old size stay cached under their own size
+        self.target_size = QSize(size)
+        self.schedule()
+    
+    def take(self, image_path: Path) -> Optional[QImage]:
+        """Get a decoded image if it is ready, counting a hit or a miss.
+        
+        Args:
+            image_path: Path to the image file.
+        
+        Returns:
+            The decoded image, or None if it is not ready yet.
+        """
+        image = self.image_cache.get(*self._cacheKey(image_path))
+        if image is not None:
+            self.hits += 1
+            IMAGE_CACHE_REQUESTS.inc(result='hit')
+        else:
+            self.misses += 1
+            IMAGE_CACHE_REQUESTS.inc(result='miss')
+        return image
+    
+    def request(self, image_path: Path) -> None:
+        """Decode an image as soon as possible.
+        
+        The result is delivered through the imageReady signal. The cache
+        lookup is left out of the statistics, which take() keeps.
+        
+        Args:
+            image_path: Path to the image file.
+        """
+        image = self.image_cache.peek(*self._cacheKey(image_path))
+        if image is not None:
+            self.imageReady.emit(image_path, image)
+            return
+        self._startDecode(image_path, priority=1)
+    
+    def schedule(self) -> None:
+        """Start decoding the images around the current one."""
+        if not self.target_size.isValid() or self.target_size.isEmpty():
+            return
+        
+        for path in self.image_loader.getUpcomingImages(self.ahead, self.behind):
+            if not self.image_cache.contains(*self._cacheKey(path)):
+                self._startDecode(path)
+    
+    def getStats(self) -> Dict[str, Any]:
+        """Get prefetch statistics.
+        
+        Returns:
+            A dictionary with hit/miss counters and queue sizes.
+        """
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+            'pending': len(self._pending),
+        }
+    
+    def _cacheKey(self, image_path: Path, size: Optional[QSize] = None) -> Tuple[Path, float, Tuple[int, int]]:
+        """Build the image cache key for a path at a target size.
+        
+        Args:
+            image_path: Path to the image file.
+            size: The target size, defaults to the current target size.
+        
+        Returns:
+            A (path, mtime, (width, height)) tuple.
+        """
+        size = size or self.target_size
+        mtime = self.image_loader.getImageMtime(image_path)
+        return image_path, mtime, (size.width(), size.height())
+    
+    def _startDecode(self, image_path: Path, priority: int = 0) -> None:
+        """Queue a decode task unless one is already running for the path.
+        
+        Args:
+            image_path: Path to the image file.
+            priority: Thread pool priority; higher runs first.
+        """
+        if image_path in self._pending:
+            return
+        if not self.target_size.isValid() or self.target_size.isEmpty():
+            return
+        
+        self._pending.add(image_path)
+        self.pool.start(_DecodeTask(self, image_path, self.target_size), priority)
+    
+    def _onDecoded(self, image_path: Path, image: QImage, size: QSize) -> None:
+        """Store a decoded image delivered from a worker thread.
+        
+        Args:
+            image_path: Path to the decoded image file.
+            image: The decoded image, null if decoding failed.
+            size: The target size the image was decoded for.
+        """
+        self._pending.discard(image_path)
+        
+        if size != self.target_size:
+            # The display was resized while decoding; decode again if still wanted
+            if image_path == self.image_loader.getCurrentImage():
+                self._startDecode(image_path, priority=1)
+            return
+        
+        if image.isNull():
+            self.imageFailed.emit(image_path)
+            return
+        
+        self.image_cache.put(*self._cacheKey(image_path, size), image, image.sizeInBytes())
+        logger.debug(f"Prefetched image: {image_path.name}")
+        self.imageReady.emit(image_path, image)
\ No newline at end of file
@@ -0,0 +1,302 @@
+"""Store of display-sized renditions of the local images."""
+import hashlib
+import os
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Iterable, Optional, Set, Tuple
+from PIL import Image
+
+from ..config import RENDITIONS_DIR, RENDITION_FORMAT, RENDITION_QUALITY, RENDITION_WORKERS
+from ..utils.imaging import getOrientedSize, loadReduced
+from ..utils.logger import logger
+
+# File extension used for each rendition format
+RENDITION_EXTENSIONS = {'JPEG': '.jpg', 'WEBP': '.webp'}
+
+class RenditionStore:
+    """Pre-scaled copies of the images at the screen resolution.
+    
+    Renditions live in a directory per size under the cache directory and
+    are named after a hash of the source path. A rendition's mtime is set to
+    that of its source, so a stale rendition is detected with two stat
+    calls. Images that already fit the screen get no rendition; the
+    original is used as is.
+    """
+    
+    def __init__(self,
+                 root: Path = RENDITIONS_DIR,
+                 size: Tuple[int, int] = (0, 0),
+                 image_format: str = RENDITION_FORMAT,
+                 quality: int = RENDITION_QUALITY,
+                 workers: int = RENDITION_WORKERS):
+        """Initialize the rendition store.
+        
+        Args:
+            root: Directory the renditions are stored under.
+            size: Size (width, height) that renditions are scaled to fit.
+            image_format: Pillow format name of the renditions.
+            quality: Encoder quality of the renditions.
+            workers: Number of background threads generating renditions.
+        """
+        self.root = root
+        self.size = tuple(size)
+        self.image_format = image_format.upper()
+        self.extension = RENDITION_EXTENSIONS.get(self.image_format, '.jpg')
+        self.quality = quality
+        
+        self._executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="rendition")
+        self._scheduled: Set[Path] = set()
+        self._lock = threading.Lock()
+        self._closed = False
+    
+    def setSize(self, size: Tuple[int, int]) -> bool:
+        """Change the size renditions are made for.
+        
+        Renditions for the previous size are deleted in the background.
+        
+        Args:
+            size: The new (width, height).
+        
+        Returns:
+            True if the size changed and renditions need rebuilding, False
+            if it did not or the store is shut down.
+        """
+        size = tuple(size)
+        if self._closed or size == self.size:
+            return False
+        
+        old_size = self.size
+        self.size = size
+        logger.info(f"Rendition size changed from {old_size[0]}x{old_size[1]} to {size[0]}x{size[1]}")
+        self._submit(shutil.rmtree, self._getSizeDirectory(old_size), True)
+        return True
+    
+    def isEnabled(self) -> bool:
+        """Check whether a rendition size has been set.
+        
+        Returns:
+            True if renditions are made.
+        """
+        return self.size[0] > 0 and self.size[1] > 0
+    
+    def getRendition(self,
+                     source: Path,
+                     min_size: Optional[Tuple[int, int]] = None,
+                     size: Optional[Tuple[int, int]] = None) -> Optional[Path]:
+        """Get the up-to-date rendition of an image.
+        
+        Args:
+            source: Path to the original image.
+            min_size: Size the rendition must be able to fill; if the
+                renditions are smaller, None is returned.
+            size: Rendition size to look in, the current one if not given.
+        
+        Returns:
+            Path to the rendition, or None if there is no current one.
+        """
+        size = size or self.size
+        if size[0] <= 0 or size[1] <= 0:
+            return None
+        if min_size and (min_size[0] > size[0] or min_size[1] > size[1]):
+            return None
+        
+        rendition = self._getRenditionPath(source, size)
+        try:
+            if rendition.stat().st_mtime_ns == source.stat().st_mtime_ns:
+                return rendition
+        except OSError:
+            pass
+        return None
+    
+    def generate(self, source: Path, size: Optional[Tuple[int, int]] = None) -> Optional[Path]:
+        """Create the rendition of an image unless it is up to date.
+        
+        Args:
+            source: Path to the original image.
+            size: Rendition size to create, the current one if not given.
+        
+        Returns:
+            Path to the rendition, or None if the image needs none or
+            could not be read.
+        """
+        size = size or self.size
+        if size[0] <= 0 or size[1] <= 0:
+            return None
+        
+        rendition = self.getRendition(source, size=size)
+        if rendition is not None:
+            return rendition
+        
+        rendition = self._getRenditionPath(source, size)
+        tmp_path = rendition.with_name(rendition.name + '.tmp')
+        try:
+            source_mtime = source.stat().st_mtime_ns
+            with Image.open(source) as img:
+                # Check the displayed size from the header before decoding
+                width, height = getOrientedSize(img)
+                if width <= size[0] and height <= size[1]:
+                    return None
+                
+                image = loadReduced(img, size)
+                if image.mode not in ('RGB', 'L'):
+                    image = image.convert('RGB')
+                
+                rendition.parent.mkdir(parents=True, exist_ok=True)
+                image.save(tmp_path, format=self.image_format, quality=self.quality)
+            
+            os.utime(tmp_path, ns=(source_mtime, source_mtime))
+            os.replace(tmp_path, rendition)
+            logger.debug(f"Created rendition of {source.name}")
+            return rendition
+        except Exception as e:
+            logger.warning(f"Could not create rendition of {source}: {e}")
+            try:
+                tmp_path.unlink()
+            except OSError:
+                pass
+            return None
+    
+    def schedule(self, source: Path) -> None:
+        """Create the rendition of an image in the background.
+        
+        Args:
+            source: Path to the original image.
+        """
+        if self._closed or not self.isEnabled():
+            return
+        
+        with self._lock:
+            if source in self._scheduled:
+                return
+            self._scheduled.add(source)
+        self._submit(self._generateScheduled, source)
+    
+    def rebuild(self, sources: Iterable[Path]) -> None:
+        """Bring the renditions in line with a set of images in the background.
+        
+        Missing and stale renditions are created and renditions of images
+        that no longer exist are deleted.
+        
+        Args:
+            sources: Paths of all current original images.
+        """
+        if not self._closed and self.isEnabled():
+            self._submit(self._rebuild, list(sources), self.size)
+    
+    def remove(self, source: Path) -> None:
+        """Delete the renditions of an image at every size.
+        
+        Args:
+            source: Path to the original image.
+        """
+        name = self._getRenditionName(source)
+        try:
+            with os.scandir(self.root) as entries:
+                size_dirs = [entry.path for entry in entries if entry.is_dir()]
+        except OSError:
+            return
+        
+        for size_dir in size_dirs:
+            try:
+                os.unlink(os.path.join(size_dir, name))
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"Could not remove rendition of {source}: {e}")
+    
+    def shutdown(self) -> None:
+        """Stop the background workers, dropping queued work.
+        
+        Later size changes, schedules and rebuilds are ignored.
+        """
+        with self._lock:
+            self._closed = True
+        self._executor.shutdown(wait=False)
+    
+    def _submit(self, fn: Callable[..., Any], *args: Any) -> None:
+        """Run a task on the background workers unless shut down.
+        
+        Args:
+            fn: The task.
+            *args: Arguments of the task.
+        """
+        with self._lock:
+            # Checked under the lock so that shutdown cannot slip in between
+            if not self._closed:
+                self._executor.submit(fn, *args)
+    
+    def _generateScheduled(self, source: Path) -> None:
+        """Generate a scheduled rendition.
+        
+        Args:
+            source: Path to the original image.
+        """
+        with self._lock:
+            self._scheduled.discard(source)
+        if not self._closed:
+            self.generate(source)
+    
+    def _rebuild(self, sources: Iterable[Path], size: Tuple[int, int]) -> None:
+        """Create missing renditions and delete orphaned ones.
+        
+        Args:
+            sources: Paths of all current original images.
+            size: The size the rebuild was requested for.
+        """
+        wanted = set()
+        created = 0
+        for source in sources:
+            if self.size != size or self._closed:
+                return  # Superseded by a newer size, or shutting down
+            wanted.add(self._getRenditionName(source))
+            if self.getRendition(source, size=size) is None and self.generate(source, size) is not None:
+                created += 1
+        
+        removed = 0
+        try:
+            with os.scandir(self._getSizeDirectory(size)) as entries:
+                for entry in entries:
+                    # Temporary files are renditions still being written
+                    if entry.name not in wanted and not entry.name.endswith('.tmp'):
+                        os.unlink(entry.path)
+                        removed += 1
+        except OSError:
+            pass
+        
+        logger.info(f"Renditions rebuilt: {created} created, {removed} removed")
+    
+    def _getSizeDirectory(self, size: Tuple[int, int]) -> Path:
+        """Get the directory holding renditions of one size.
+        
+        Args:
+            size: The rendition (width, height).
+        
+        Returns:
+            The directory path.
+        """
+        return self.root / f"{size[0]}x{size[1]}"
+    
+    def _getRenditionName(self, source: Path) -> str:
+        """Get the file name of an image's renditions.
+        
+        Args:
+            source: Path to the original image.
+        
+        Returns:
+            The file name.
+        """
+        return hashlib.sha1(str(source).encode('utf-8')).hexdigest() + self.extension
+    
+    def _getRenditionPath(self, source: Path, size: Tuple[int, int]) -> Path:
+        """Get the path of an image's rendition at one size.
+        
+        Args:
+            source: Path to the original image.
+            size: The rendition (width, height).
+        
+        Returns:
+            The rendition path.
+        """
+        return self._getSizeDirectory(size) / self._getRenditionName(source)
\ No newline at end of file
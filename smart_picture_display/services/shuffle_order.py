@@ -0,0 +1,338 @@
+"""Shuffled playback order over the image list without repeats."""
+import random
+from bisect import bisect_left, insort
+from pathlib import Path
+from typing import List, Optional, Sequence
+
+from ..config import SHUFFLE_HISTORY
+from ..utils.logger import logger
+
+# Library changes tracked within a cycle before it is started over
+MAX_CYCLE_CHANGES = 1000
+
+class _Permutation:
+    """A keyed pseudo-random permutation of range(size) computed on demand.
+    
+    A few rounds of odd multiplications, additions and xor-shifts are each
+    invertible modulo a power of two, so together they shuffle the values
+    of the smallest power of two covering the size. Values past the size
+    are mapped again until they land inside it ("cycle walking"), which
+    keeps it a permutation and takes fewer than two rounds on average.
+    """
+    
+    def __init__(self, size: int, rng: random.Random):
+        """Initialize the permutation.
+        
+        Args:
+            size: Number of values permuted.
+            rng: Source of the keys.
+        """
+        self.size = size
+        self._bits = max(1, (size - 1).bit_length())
+        self._mask = (1 << self._bits) - 1
+        self._shift = self._bits // 2 + 1
+        self._keys = [(rng.getrandbits(self._bits) | 1, rng.getrandbits(self._bits)) for _ in range(3)]
+    
+    def get(self, index: int) -> int:
+        """Get the value at a position of the permutation.
+        
+        Args:
+            index: The position, below the size.
+        
+        Returns:
+            The permuted value, below the size.
+        """
+        value = self._mix(index)
+        while value >= self.size:
+            value = self._mix(value)
+        return value
+    
+    def _mix(self, value: int) -> int:
+        for multiplier, offset in self._keys:
+            value = (value * multiplier + offset) & self._mask
+            value ^= value >> self._shift
+        return value
+
+
+class ShuffleOrder:
+    """Shows every image once per cycle, in random order, with a history.
+    
+    A cycle walks a permutation of the image list as it was when the cycle
+    started, so it needs no shuffled copy of the list. Images added during
+    a cycle are mixed into the rest of it at random, and removed ones are
+    skipped; only these changes are kept, not a snapshot of the list.
+    
+    Images that were shown are kept in a bounded history, so going back
+    and forward again revisits the same images in the same order.
+    """
+    
+    def __init__(self, seed: Optional[int] = None, history_size: int = SHUFFLE_HISTORY):
+        """Initialize the shuffle order.
+        
+        Args:
+            seed: Seed for a reproducible order, random if not given.
+            history_size: Number of shown images kept for going back.
+        """
+        self.history_size = history_size
+        self._rng = random.Random(seed)
+        self._history: List[Path] = []
+        self._cursor = -1
+        self._queue: List[Path] = []
+        self._startCycle(0)
+    
+    def reset(self) -> None:
+        """Forget the history and start a new cycle, e.g. for a new image list."""
+        self._history = []
+        self._cursor = -1
+        self._queue = []
+        self._startCycle(0)
+    
+    def getCurrent(self) -> Optional[Path]:
+        """Get the image the history points at.
+        
+        Returns:
+            The current history entry, or None if the history is empty.
+        """
+        return self._history[self._cursor] if self._cursor >= 0 else None
+    
+    def forward(self,
+                paths: Sequence[Path],
+                current: Optional[Path],
+                replay: bool = True) -> Optional[Path]:
+        """Move to the next image, recording it in the history.
+        
+        Args:
+            paths: The sorted image list.
+            current: The image shown now; if it is not the current history
+                entry, e.g. after sequential navigation, it is recorded so
+                that back() returns to it.
+            replay: Revisit images ahead in the history, after going back,
+                before drawing new ones.
+        
+        Returns:
+            The next image, or None if there are no images.
+        """
+        self._visit(current)
+        if replay and self._cursor + 1 < len(self._history):
+            self._cursor += 1
+            return self._history[self._cursor]
+        
+        del self._history[self._cursor + 1:]
+        self._fill(paths, 1)
+        if not self._queue:
+            return None
+        
+        self._history.append(self._queue.pop(0))
+        if len(self._history) > self.history_size:
+            del self._history[0]
+        self._cursor = len(self._history) - 1
+        return self._history[self._cursor]
+    
+    def back(self, current: Optional[Path]) -> Optional[Path]:
+        """Move back to the image shown before the current one.
+        
+        Args:
+            current: The image shown now.
+        
+        Returns:
+            The previous image, or None if current was not reached through
+            the history or there is nothing before it.
+        """
+        if current is None or current != self.getCurrent() or self._cursor == 0:
+            return None
+        
+        self._cursor -= 1
+        return self._history[self._cursor]
+    
+    def peek(self, paths: Sequence[Path], current: Optional[Path], ahead: int, behind: int) -> List[Path]:
+        """Get the images forward() and back() would move to, without moving.
+        
+        Args:
+            paths: The sorted image list.
+            current: The image shown now.
+            ahead: Number of images to return after the current one.
+            behind: Number of images to return before the current one.
+        
+        Returns:
+            The next and previous images alternately, nearest first.
+        """
+        upcoming: List[Path] = []
+        previous: List[Path] = []
+        if current is not None and current == self.getCurrent():
+            upcoming = self._history[self._cursor + 1:self._cursor + 1 + ahead]
+            previous = self._history[max(0, self._cursor - behind):self._cursor][::-1]
+        
+        if len(upcoming) < ahead:
+            self._fill(paths, ahead - len(upcoming))
+            upcoming += self._queue[:ahead - len(upcoming)]
+        
+        ordered = []
+        for step in range(max(len(upcoming), len(previous))):
+            ordered += upcoming[step:step + 1] + previous[step:step + 1]
+        return ordered
+    
+    def update(self, added: Sequence[Path], removed: Sequence[Path]) -> None:
+        """Apply changes to the image list to the current cycle.
+        
+        Args:
+            added: Image paths added to the list.
+            removed: Image paths removed from the list.
+        """
+        if removed:
+            gone = set(removed)
+            self._queue = [p for p in self._queue if p not in gone]
+            # Keep the cursor on the same entry, or the one before it if that is gone
+            before = sum(1 for p in self._history[:self._cursor] if p not in gone)
+            if self.getCurrent() in gone:
+                before -= 1
+            self._history = [p for p in self._history if p not in gone]
+            self._cursor = min(max(before, 0), len(self._history) - 1)
+        
+        # Before the first draw the cycle starts from the list as it is then
+        if self._permutation is None:
+            return
+        
+        for path in removed:
+            # Pending images include ones deferred to avoid a repeat, which
+            # are not among the added ones
+            self._discard(self._pending, path)
+            if not self._discard(self._added, path):
+                insort(self._removed, path)
+        for path in added:
+            # An image removed and added again is back in the cycle
+            if not self._discard(self._removed, path):
+                insort(self._added, path)
+                self._pending.append(path)
+        
+        if len(self._added) + len(self._removed) > MAX_CYCLE_CHANGES:
+            logger.debug("Image list changed too much, starting a new shuffle cycle")
+            self._startCycle(0)
+    
+    def _visit(self, current: Optional[Path]) -> None:
+        """Make the shown image the current history entry.
+        
+        Args:
+            current: The image shown now.
+        """
+        if current is None or current == self.getCurrent():
+            return
+        
+        del self._history[self._cursor + 1:]
+        self._queue = [p for p in self._queue if p != current]
+        self._history.append(current)
+        if len(self._history) > self.history_size:
+            del self._history[0]
+        self._cursor = len(self._history) - 1
+    
+    def _fill(self, paths: Sequence[Path], count: int) -> None:
+        """Draw images into the queue until it holds count of them.
+        
+        Args:
+            paths: The sorted image list.
+            count: Number of queued images needed.
+        """
+        while len(self._queue) < count:
+            path = self._draw(paths)
+            if path is None:
+                return
+            
+            # Never the same image twice in a row, e.g. across cycles,
+            # unless no other image is left to show instead
+            last = self._queue[-1] if self._queue else self.getCurrent()
+            if path == last and (self._position < self._size or self._pending):
+                self._pending.append(path)
+                continue
+            self._queue.append(path)
+    
+    def _draw(self, paths: Sequence[Path]) -> Optional[Path]:
+        """Take the next image of the cycle, starting a new cycle if needed.
+        
+        Args:
+            paths: The sorted image list.
+        
+        Returns:
+            The image, or None if there are no images.
+        """
+        while True:
+            remaining = self._size - self._position
+            if remaining <= 0 and not self._pending:
+                if not paths:
+                    return None
+                self._startCycle(len(paths))
+                continue
+            
+            # Images added during the cycle turn up at a random point of the rest of it
+            pending = len(self._pending)
+            if pending and self._rng.randrange(remaining + pending) < pending:
+                index = self._rng.randrange(pending)
+                self._pending[index], self._pending[-1] = self._pending[-1], self._pending[index]
+                return self._pending.pop()
+            
+            index = self._permutation.get(self._position)
+            self._position += 1
+            path = self._getCyclePath(paths, index)
+            if path is not None:
+                return path
+    
+    def _startCycle(self, size: int) -> None:
+        """Start a cycle over the image list as it is now.
+        
+        Args:
+            size: Number of images in the list, or 0 to start the cycle
+                with the next draw.
+        """
+        self._size = size
+        self._position = 0
+        self._permutation = _Permutation(size, self._rng) if size else None
+        self._added: List[Path] = []
+        self._removed: List[Path] = []
+        self._pending: List[Path] = []
+    
+    def _getCyclePath(self, paths: Sequence[Path], index: int) -> Optional[Path]:
+        """Find an image of the list as it was when the cycle started.
+        
+        That list is the current one without the images added since and
+        with the removed ones, all sorted, so a position in it is found
+        from the current list and the changes alone.
+        
+        Args:
+            paths: The sorted image list.
+            index: Position in the list at the start of the cycle.
+        
+        Returns:
+            The image, or None if it has been removed since.
+        """
+        # Removed images sorting before the position shift it into the current list
+        skipped = len(self._removed)
+        for count, path in enumerate(self._removed):
+            position = count + bisect_left(paths, path) - bisect_left(self._added, path)
+            if position == index:
+                return None
+            if position > index:
+                skipped = count
+                break
+        
+        # Added images sorting before it shift it the other way
+        index -= skipped
+        for path in self._added:
+            if bisect_left(paths, path) > index:
+                break
+            index += 1
+        return paths[index] if index < len(paths) else None
+    
+    @staticmethod
+    def _discard(items: List[Path], path: Path) -> bool:
+        """Remove a path from a list if it is there.
+        
+        Args:
+            items: The list, sorted unless it is the pending images.
+            path: The path to remove.
+        
+        Returns:
+            True if the path was removed.
+        """
+        try:
+            items.remove(path)
+        except ValueError:
+            return False
+        return True
\ No newline at end of file
@@ -0,0 +1,194 @@
+"""Persistent state for incremental Google Drive synchronization."""
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set
+
+from ..config import SYNC_STATE_PATH
+from ..utils.logger import logger
+
+class SyncState:
+    """Remembers the Drive change-feed position and the files synced locally.
+    
+    The state is a small JSON document holding the Changes API page token,
+    the configured and the resolved ID of the synced folder and, for every
+    Drive file that was downloaded, the metadata needed to apply later
+    changes to it. The page token is only valid for the configured folder.
+    
+    It is also the manifest of the content-addressed images directory: each
+    file record names the blob, the local file named after the content,
+    that holds it. Drive files with the same content share one blob, so an
+    index from blobs to the files referencing them is kept in memory.
+    """
+    
+    def __init__(self, state_path: Path = SYNC_STATE_PATH):
+        """Initialize the sync state, loading it from disk if present.
+        
+        Args:
+            state_path: Path of the JSON state file.
+        """
+        self.state_path = state_path
+        self.page_token: Optional[str] = None
+        self.folder_id: Optional[str] = None
+        self.configured_folder_id: Optional[str] = None
+        self.files: Dict[str, Dict[str, Any]] = {}
+        self._blob_refs: Dict[str, Set[str]] = {}
+        self._lock = threading.RLock()
+        self.load()
+    
+    def load(self) -> None:
+        """Load the state from disk, starting fresh if it is missing or corrupt."""
+        if not self.state_path.exists():
+            return
+        
+        try:
+            with open(self.state_path, 'r') as f:
+                data = json.load(f)
+            self.page_token = data.get('page_token')
+            self.folder_id = data.get('folder_id')
+            self.configured_folder_id = data.get('configured_folder_id')
+            self.files = data.get('files', {})
+        except (OSError, ValueError) as e:
+            logger.error(f"Error loading sync state, starting fresh: {e}")
+            self.reset()
+        
+        with self._lock:
+            self._blob_refs = {}
+            for file_id, metadata in self.files.items():
+                self._addBlobRef(file_id, metadata)
+    
+    def save(self) -> None:
+        """Write the state to disk atomically."""
+        with self._lock:
+            data = {
+                'page_token': self.page_token,
+                'folder_id': self.folder_id,
+                'configured_folder_id': self.configured_folder_id,
+                'files': self.files,
+            }
+            tmp_path = self.state_path.with_name(self.state_path.name + '.tmp')
+            try:
+                with open(tmp_path, 'w') as f:
+                    json.dump(data, f)
+                os.replace(tmp_path, self.state_path)
+            except OSError as e:
+                logger.error(f"Error saving sync state: {e}")
+    
+    def reset(self) -> None:
+        """Forget the change-feed position so the next sync is a full listing."""
+        with self._lock:
+            self.page_token = None
+            self.folder_id = None
+            self.configured_folder_id = None
+    
+    def getFile(self, file_id: str) -> Optional[Dict[str, Any]]:
+        """Get the recorded metadata of a synced Drive file.
+        
+        Args:
+            file_id: The Drive file ID.
+        
+        Returns:
+            The recorded metadata, or None if the file was never synced.
+        """
+        with self._lock:
+            return self.files.get(file_id)
+    
+    def setFile(self, file_id: str, metadata: Dict[str, Any]) -> None:
+        """Record the metadata of a synced Drive file.
+        
+        Args:
+            file_id: The Drive file ID.
+            metadata: Metadata to record, including the local file name.
+        """
+        with self._lock:
+            self._removeBlobRef(file_id, self.files.get(file_id))
+            self.files[file_id] = metadata
+            self._addBlobRef(file_id, metadata)
+    
+    def removeFile(self, file_id: str) -> Optional[Dict[str, Any]]:
+        """Forget a synced Drive file.
+        
+        Args:
+            file_id: The Drive file ID.
+        
+        Returns:
+            The metadata that was recorded, or None if the file was unknown.
+        """
+        with self._lock:
+            metadata = self.files.pop(file_id, None)
+            self._removeBlobRef(file_id, metadata)
+            return metadata
+    
+    def isBlobReferenced(self, blob: str) -> bool:
+        """Check whether any synced Drive file is stored in a blob.
+        
+        Args:
+            blob: File name of the blob in the images directory.
+        
+        Returns:
+            True if the blob is still needed.
+        """
+        with self._lock:
+            return bool(self._blob_refs.get(blob))
+    
+    def getRecords(self) -> List[Dict[str, Any]]:
+        """Get the records of all synced Drive files.
+        
+        Returns:
+            A snapshot of the recorded metadata.
+        """
+        with self._lock:
+            return list(self.files.values())
+    
+    def getNames(self, blob: str) -> List[str]:
+        """Get the Drive names of the files stored in a blob.
+        
+        Args:
+            blob: File name of the blob in the images directory.
+        
+        Returns:
+            The names, sorted, or an empty list for unknown blobs.
+        """
+        with self._lock:
+            return sorted({self.files[file_id]['name'] for file_id in self._blob_refs.get(blob, ())})
+    
+    def removeBlob(self, blob: str) -> List[str]:
+        """Forget every synced Drive file stored in a blob, e.g. after evicting it.
+        
+        Args:
+            blob: File name of the blob in the images directory.
+        
+        Returns:
+            The IDs of the forgotten files.
+        """
+        with self._lock:
+            file_ids = list(self._blob_refs.pop(blob, ()))
+            for file_id in file_ids:
+                self.files.pop(file_id, None)
+            return file_ids
+    
+    def _addBlobRef(self, file_id: str, metadata: Optional[Dict[str, Any]]) -> None:
+        """Index the blob a file record points at.
+        
+        Args:
+            file_id: The Drive file ID.
+            metadata: The file record.
+        """
+        blob = metadata.get('blob') if metadata else None
+        if blob:
+            self._blob_refs.setdefault(blob, set()).add(file_id)
+    
+    def _removeBlobRef(self, file_id: str, metadata: Optional[Dict[str, Any]]) -> None:
+        """Drop a file record from the blob index.
+        
+        Args:
+            file_id: The Drive file ID.
+            metadata: The file record.
+        """
+        blob = metadata.get('blob') if metadata else None
+        refs = self._blob_refs.get(blob) if blob else None
+        if refs is not None:
+            refs.discard(file_id)
+            if not refs:
+                del self._blob_refs[blob]
\ No newline at end of file
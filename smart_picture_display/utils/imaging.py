@@ -0,0 +1,83 @@
+"""Pillow helpers for decoding and checking images."""
+from pathlib import Path
+from typing import Tuple
+from PIL import Image
+
+# EXIF orientation tag
+EXIF_ORIENTATION = 0x0112
+
+# Transposition that undoes each EXIF orientation
+ORIENTATION_TRANSPOSES = {
+    2: Image.Transpose.FLIP_LEFT_RIGHT,
+    3: Image.Transpose.ROTATE_180,
+    4: Image.Transpose.FLIP_TOP_BOTTOM,
+    5: Image.Transpose.TRANSPOSE,
+    6: Image.Transpose.ROTATE_270,
+    7: Image.Transpose.TRANSVERSE,
+    8: Image.Transpose.ROTATE_90,
+}
+
+# Orientations stored with width and height swapped
+ROTATED_ORIENTATIONS = {5, 6, 7, 8}
+
+def getOrientedSize(img: Image.Image) -> Tuple[int, int]:
+    """Get the size an image is displayed at, from its header only.
+    
+    Args:
+        img: An opened, not yet loaded image.
+    
+    Returns:
+        The (width, height) after applying the EXIF orientation.
+    """
+    width, height = img.size
+    if img.getexif().get(EXIF_ORIENTATION, 1) in ROTATED_ORIENTATIONS:
+        return height, width
+    return width, height
+
+def loadReduced(img: Image.Image, box: Tuple[int, int]) -> Image.Image:
+    """Decode an image scaled down to fit a box, upright.
+    
+    JPEGs are decoded at the smallest DCT scale (1/2, 1/4 or 1/8) that
+    still covers the box, so most of the pixels of a large photo are never
+    decoded at all. The result is then rotated according to its EXIF
+    orientation and resampled to fit the box. Images smaller than the box
+    are not enlarged.
+    
+    Args:
+        img: An opened, not yet loaded image.
+        box: The (width, height) to fit, in display orientation.
+    
+    Returns:
+        The decoded image.
+    """
+    orientation = img.getexif().get(EXIF_ORIENTATION, 1)
+    stored_box = (box[1], box[0]) if orientation in ROTATED_ORIENTATIONS else box
+    
+    # Only has an effect on JPEGs; other formats decode at full size
+    img.draft('RGB', stored_box)
+    img.thumbnail(stored_box)
+    
+    transpose = ORIENTATION_TRANSPOSES.get(orientation)
+    return img.transpose(transpose) if transpose is not None else img
+
+def verifyImage(path: Path) -> bool:
+    """Fully check that an image file is intact.
+    
+    Runs Pillow's verify() for structural checks such as PNG checksums,
+    then decodes the image, JPEGs at 1/8 scale, to catch truncated data.
+    
+    Args:
+        path: Path to the image file.
+    
+    Returns:
+        True if the image is intact.
+    """
+    try:
+        with Image.open(path) as img:
+            img.verify()
+        with Image.open(path) as img:
+            img.draft(img.mode, (1, 1))
+            img.load()
+        return True
+    except Exception:
+        return False
\ No newline at end of file
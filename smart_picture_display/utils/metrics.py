@@ -0,0 +1,488 @@
+"""Counters and histograms of the hot paths, in the Prometheus text format."""
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from .logger import logger
+
+# Prefix of every metric name
+METRIC_PREFIX = "smart_picture_display_"
+
+# Default histogram buckets in seconds, from a fast decode to a slow sync
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+# Label values of one series, in the order of the metric's label names
+LabelValues = Tuple[str, ...]
+
+def _formatLabels(names: Sequence[str], values: LabelValues, extra: str = '') -> str:
+    """Format the label set of a series.
+    
+    Args:
+        names: The label names.
+        values: The label values.
+        extra: An extra, already formatted label such as le="0.5".
+    
+    Returns:
+        The labels in braces, or an empty string without labels.
+    """
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+def _escape(value: str) -> str:
+    """Escape a label value.
+    
+    Args:
+        value: The label value.
+    
+    Returns:
+        The escaped value.
+    """
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _formatValue(value: float) -> str:
+    """Format a sample value.
+    
+    Args:
+        value: The value.
+    
+    Returns:
+        The value as text, without a fraction for whole numbers.
+    """
+    if value == int(value) and abs(value) < 1e15:
+        return str(int(value))
+    return repr(float(value))
+
+
+class Metric:
+    """A named metric with an optional set of labels.
+    
+    Each combination of label values is a separate series. Updates are
+    thread-safe and cheap enough for per-image hot paths.
+    """
+    
+    # Prometheus metric type
+    kind = 'untyped'
+    
+    def __init__(self, name: str, description: str, labels: Sequence[str] = ()):
+        """Initialize the metric.
+        
+        Args:
+            name: Metric name without the METRIC_PREFIX.
+            description: Help text.
+            labels: Names of the labels.
+        """
+        self.name = METRIC_PREFIX + name
+        self.description = description
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+    
+    def _labelValues(self, labels: Dict[str, str]) -> LabelValues:
+        """Get the series key of a set of labels.
+        
+        Args:
+            labels: Label names and values.
+        
+        Returns:
+            The label values in order.
+        
+        Raises:
+            ValueError: If the labels do not match the label names.
+        """
+        if set(labels) != set(self.label_names):
+            raise ValueError(f"{self.name} takes labels {self.label_names}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.label_names)
+    
+    def render(self) -> List[str]:
+        """Render the metric in the Prometheus text format.
+        
+        Returns:
+            The lines, starting with the HELP and TYPE lines.
+        """
+        return [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(Metric):
+    """A value that only goes up, such as a number of downloads."""
+    
+    kind = 'counter'
+    
+    def __init__(self, name: str, description: str, labels: Sequence[str] = ()):
+        """Initialize the counter.
+        
+        Args:
+            name: Metric name without the METRIC_PREFIX.
+            description: Help text.
+            labels: Names of the labels.
+        """
+        super().__init__(name, description, labels)
+        self._values: Dict[LabelValues, float] = {}
+    
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        """Increase the counter.
+        
+        Args:
+            amount: Amount to add.
+            **labels: Label values of the series.
+        """
+        key = self._labelValues(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+    
+    def get(self, **labels: str) -> float:
+        """Get the value of a series.
+        
+        Args:
+            **labels: Label values of the series.
+        
+        Returns:
+            The value, 0 if the series was never increased.
+        """
+        with self._lock:
+            return self._values.get(self._labelValues(labels), 0)
+    
+    def getTotal(self) -> float:
+        """Get the sum over all series.
+        
+        Returns:
+            The total.
+        """
+        with self._lock:
+            return sum(self._values.values())
+    
+    def render(self) -> List[str]:
+        """Render the counter in the Prometheus text format.
+        
+        Returns:
+            The lines.
+        """
+        lines = super().render()
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_formatLabels(self.label_names, key)} {_formatValue(value)}")
+        return lines
+
+
+class Gauge(Metric):
+    """A value that goes up and down, such as the number of images."""
+    
+    kind = 'gauge'
+    
+    def __init__(self, name: str, description: str, labels: Sequence[str] = ()):
+        """Initialize the gauge.
+        
+        Args:
+            name: Metric name without the METRIC_PREFIX.
+            description: Help text.
+            labels: Names of the labels.
+        """
+        super().__init__(name, description, labels)
+        self._values: Dict[LabelValues, float] = {}
+    
+    def set(self, value: float, **labels: str) -> None:
+        """Set the gauge.
+        
+        Args:
+            value: The new value.
+            **labels: Label values of the series.
+        """
+        key = self._labelValues(labels)
+        with self._lock:
+            self._values[key] = value
+    
+    def get(self, **labels: str) -> float:
+        """Get the value of a series.
+        
+        Args:
+            **labels: Label values of the series.
+        
+        Returns:
+            The value, 0 if the series was never set.
+        """
+        with self._lock:
+            return self._values.get(self._labelValues(labels), 0)
+    
+    def render(self) -> List[str]:
+        """Render the gauge in the Prometheus text format.
+        
+        Returns:
+            The lines.
+        """
+        lines = super().render()
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_formatLabels(self.label_names, key)} {_formatValue(value)}")
+        return lines
+
+
+class Histogram(Metric):
+    """Distribution of durations or sizes over fixed buckets."""
+    
+    kind = 'histogram'
+    
+    def __init__(self,
+                 name: str,
+                 description: str,
+                 labels: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        """Initialize the histogram.
+        
+        Args:
+            name: Metric name without the METRIC_PREFIX.
+            description: Help text.
+            labels: Names of the labels.
+            buckets: Upper bounds of the buckets, in increasing order.
+        """
+        super().__init__(name, description, labels)
+        self.buckets = tuple(buckets)
+        # Per series: (count per bucket plus one for +Inf, sum, count)
+        self._series: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+    
+    def observe(self, value: float, **labels: str) -> None:
+        """Record a value.
+        
+        Args:
+            value: The observed value.
+            **labels: Label values of the series.
+        """
+        key = self._labelValues(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = ([0] * (len(self.buckets) + 1), [0.0, 0])
+            series[0][index] += 1
+            series[1][0] += value
+            series[1][1] += 1
+    
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        """Observe the duration of a with block in seconds.
+        
+        Args:
+            **labels: Label values of the series.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+    
+    def getCount(self) -> int:
+        """Get the number of observations over all series.
+        
+        Returns:
+            The count.
+        """
+        with self._lock:
+            return int(sum(series[1][1] for series in self._series.values()))
+    
+    def getQuantile(self, quantile: float) -> Optional[float]:
+        """Estimate a quantile over all series from the buckets.
+        
+        Args:
+            quantile: The quantile, between 0 and 1.
+        
+        Returns:
+            The upper bound of the bucket holding the quantile, or None
+            without observations or when it is beyond the last bucket.
+        """
+        with self._lock:
+            counts = [sum(bucket) for bucket in zip(*(series[0] for series in self._series.values()))]
+        total = sum(counts)
+        if not total:
+            return None
+        
+        cumulative = 0
+        for bound, count in zip(self.buckets, counts):
+            cumulative += count
+            if cumulative >= quantile * total:
+                return bound
+        return None
+    
+    def render(self) -> List[str]:
+        """Render the histogram in the Prometheus text format.
+        
+        Returns:
+            The lines.
+        """
+        lines = super().render()
+        with self._lock:
+            for key, (counts, (total, count)) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, counts):
+                    cumulative += bucket_count
+                    le = f'le="{_formatValue(bound)}"'
+                    lines.append(f"{self.name}_bucket{_formatLabels(self.label_names, key, le)} {cumulative}")
+                le = 'le="+Inf"'
+                lines.append(f"{self.name}_bucket{_formatLabels(self.label_names, key, le)} {int(count)}")
+                lines.append(f"{self.name}_sum{_formatLabels(self.label_names, key)} {_formatValue(total)}")
+                lines.append(f"{self.name}_count{_formatLabels(self.label_names, key)} {int(count)}")
+        return lines
+
+
+class MetricsRegistry:
+    """The set of metrics exported by the application."""
+    
+    def __init__(self):
+        """Initialize an empty registry."""
+        self._metrics: Dict[str, Metric] = {}
+        self._lock = threading.Lock()
+    
+    def register(self, metric: Metric) -> Metric:
+        """Add a metric to the registry.
+        
+        Args:
+            metric: The metric.
+        
+        Returns:
+            The metric, for chaining.
+        
+        Raises:
+            ValueError: If a metric of the same name is registered.
+        """
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+    
+    def counter(self, name: str, description: str, labels: Sequence[str] = ()) -> Counter:
+        """Create and register a counter.
+        
+        Args:
+            name: Metric name without the METRIC_PREFIX.
+            description: Help text.
+            labels: Names of the labels.
+        
+        Returns:
+            The counter.
+        """
+        return self.register(Counter(name, description, labels))
+    
+    def gauge(self, name: str, description: str, labels: Sequence[str] = ()) -> Gauge:
+        """Create and register a gauge.
+        
+        Args:
+            name: Metric name without the METRIC_PREFIX.
+            description: Help text.
+            labels: Names of the labels.
+        
+        Returns:
+            The gauge.
+        """
+        return self.register(Gauge(name, description, labels))
+    
+    def histogram(self,
+                  name: str,
+                  description: str,
+                  labels: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        """Create and register a histogram.
+        
+        Args:
+            name: Metric name without the METRIC_PREFIX.
+            description: Help text.
+            labels: Names of the labels.
+            buckets: Upper bounds of the buckets.
+        
+        Returns:
+            The histogram.
+        """
+        return self.register(Histogram(name, description, labels, buckets))
+    
+    def render(self) -> str:
+        """Render every metric in the Prometheus text exposition format.
+        
+        Returns:
+            The exposition text.
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+# The registry served by the metrics endpoint
+metrics = MetricsRegistry()
+
+# Image pipeline
+IMAGE_DECODE_SECONDS = metrics.histogram(
+    'image_decode_seconds', 'Time to decode an image for display.', labels=('stage',))
+IMAGE_SCALE_SECONDS = metrics.histogram(
+    'image_scale_seconds', 'Time to smoothly scale a decoded image to the display.')
+SLIDE_CHANGE_SECONDS = metrics.histogram(
+    'slide_change_seconds', 'Time from a slide change to the new image being on screen.')
+IMAGE_CACHE_REQUESTS = metrics.counter(
+    'image_cache_requests_total', 'Decoded frame lookups on slide changes.', labels=('result',))
+
+# Image list
+IMAGE_REFRESH_SECONDS = metrics.histogram(
+    'image_refresh_seconds', 'Time to rescan the images directory.')
+IMAGES_INDEXED = metrics.counter(
+    'images_indexed_total', 'Image files inspected and written to the image index.')
+IMAGES_LISTED = metrics.gauge(
+    'images', 'Images in the slideshow.')
+
+# Drive sync
+SYNC_SECONDS = metrics.histogram(
+    'sync_duration_seconds', 'Duration of Drive syncs.')
+SYNCS = metrics.counter(
+    'syncs_total', 'Drive syncs by outcome.', labels=('result',))
+DOWNLOADED_FILES = metrics.counter(
+    'downloaded_files_total', 'Files downloaded from Drive.')
+DOWNLOADED_BYTES = metrics.counter(
+    'downloaded_bytes_total', 'Bytes downloaded from Drive.')
+DOWNLOAD_ERRORS = metrics.counter(
+    'download_errors_total', 'Drive files that failed to download.')
+DRIVE_API_CALLS = metrics.counter(
+    'drive_api_calls_total', 'Drive API requests by method, not counting retries.', labels=('method',))
+
+# Local storage
+STORAGE_EVICTIONS = metrics.counter(
+    'storage_evictions_total', 'Local images deleted to make room.')
+STORAGE_EVICTED_BYTES = metrics.counter(
+    'storage_evicted_bytes_total', 'Bytes freed by deleting local images.')
+
+def _formatQuantiles(histogram: Histogram) -> str:
+    """Format the median and 90th percentile of a histogram of seconds.
+    
+    Args:
+        histogram: The histogram.
+    
+    Returns:
+        The count with the estimated p50 and p90 in milliseconds.
+    """
+    count = histogram.getCount()
+    if not count:
+        return "0"
+    
+    def bound(quantile: float) -> str:
+        value = histogram.getQuantile(quantile)
+        return f"<={value * 1000:.0f}ms" if value is not None else f">{histogram.buckets[-1]:.0f}s"
+    
+    return f"{count} (p50 {bound(0.5)}, p90 {bound(0.9)})"
+
+def logSummary() -> None:
+    """Log a one-line summary of the metrics since startup."""
+    hits = IMAGE_CACHE_REQUESTS.get(result='hit')
+    lookups = hits + IMAGE_CACHE_REQUESTS.get(result='miss')
+    hit_rate = f"{hits / lookups:.0%}" if lookups else "n/a"
+    megabytes = DOWNLOADED_BYTES.getTotal() / (1024 * 1024)
+    
+    logger.info(
+        f"Metrics: slides {_formatQuantiles(SLIDE_CHANGE_SECONDS)}, "
+        f"decodes {_formatQuantiles(IMAGE_DECODE_SECONDS)}, "
+        f"cache hit rate {hit_rate}, "
+        f"images {IMAGES_LISTED.get():.0f} ({IMAGES_INDEXED.getTotal():.0f} indexed), "
+        f"syncs {SYNCS.getTotal():.0f} ({SYNCS.get(result='error'):.0f} failed), "
+        f"downloaded {DOWNLOADED_FILES.getTotal():.0f} files / {megabytes:.1f} MB, "
+        f"API calls {DRIVE_API_CALLS.getTotal():.0f}, "
+        f"evictions {STORAGE_EVICTIONS.getTotal():.0f}"
+    )
\ No newline at end of file
@@ -0,0 +1,283 @@
+"""On-demand cProfile and tracemalloc capture of the running application."""
+import cProfile
+import io
+import pstats
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, List, Optional
+
+from ..config import PROFILE_DIR, PROFILE_SLOW_SLIDE_MS, PROFILE_TOP_N
+from .logger import logger
+
+# Frames kept per allocation traceback while tracing memory
+TRACEMALLOC_FRAMES = 10
+
+class Profiler:
+    """Captures CPU and memory profiles while the application keeps running.
+    
+    A capture profiles the GUI thread, and with it the slideshow, for as
+    long as it runs. Worker loops such as the Drive sync and background
+    decoding wrap their work in section(), which profiles them on their
+    own thread while a capture is running. Stopping a capture writes a
+    .prof file (readable with pstats or snakeviz) and a .tracemalloc
+    snapshot to the profile directory and logs the top entries of both.
+    
+    Slow-slide mode instead profiles each slide change separately and only
+    keeps the ones slower than a threshold, so that rare slow frames can
+    be caught in the field without capturing everything.
+    """
+    
+    def __init__(self,
+                 output_dir: Path = PROFILE_DIR,
+                 top_n: int = PROFILE_TOP_N,
+                 slow_slide_ms: float = PROFILE_SLOW_SLIDE_MS):
+        """Initialize the profiler.
+        
+        Args:
+            output_dir: Directory the dumps are written to.
+            top_n: Number of functions and allocation sites logged.
+            slow_slide_ms: Slide changes slower than this are kept in
+                slow-slide mode.
+        """
+        self.output_dir = output_dir
+        self.top_n = top_n
+        self.slow_slide_ms = slow_slide_ms
+        self.slow_slides = False
+        
+        self._capturing = False
+        self._started = 0.0
+        self._started_tracemalloc = False
+        self._main_profile: Optional[cProfile.Profile] = None
+        self._profiles: List[cProfile.Profile] = []
+        self._slide_profile: Optional[cProfile.Profile] = None
+        self._local = threading.local()
+        self._lock = threading.Lock()
+    
+    def isCapturing(self) -> bool:
+        """Check whether a capture is running.
+        
+        Returns:
+            True if a capture is running.
+        """
+        return self._capturing
+    
+    def toggle(self) -> Optional[Path]:
+        """Start a capture, or stop the running one.
+        
+        Returns:
+            The path of the written profile when a capture was stopped.
+        """
+        if self._capturing:
+            return self.stop()
+        self.start()
+        return None
+    
+    def start(self) -> None:
+        """Start capturing on the calling thread, normally the GUI thread."""
+        if self._capturing:
+            return
+        
+        self.cancelSlide()
+        self._profiles = []
+        self._main_profile = self._enableProfile()
+        self._local.active = True
+        self._started_tracemalloc = not tracemalloc.is_tracing()
+        if self._started_tracemalloc:
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+        self._started = time.monotonic()
+        self._capturing = True
+        logger.info("Profiling started")
+    
+    def stop(self) -> Optional[Path]:
+        """Stop the capture, write the dumps and log a summary.
+        
+        Returns:
+            The path of the written profile, or None if nothing was captured.
+        """
+        if not self._capturing:
+            return None
+        
+        self._capturing = False
+        self._local.active = False
+        if self._main_profile is not None:
+            self._main_profile.disable()
+        snapshot = tracemalloc.take_snapshot() if tracemalloc.is_tracing() else None
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+        
+        with self._lock:
+            profiles = self._profiles
+            self._profiles = []
+        duration = time.monotonic() - self._started
+        stamp = time.strftime('%Y%m%d-%H%M%S')
+        
+        path = self._writeProfile(profiles, f"profile-{stamp}.prof",
+                                  f"Profile of {duration:.1f}s")
+        if snapshot is not None:
+            self._writeSnapshot(snapshot, f"memory-{stamp}.tracemalloc")
+        return path
+    
+    def setSlowSlides(self, enabled: bool) -> None:
+        """Turn slow-slide mode on or off.
+        
+        Args:
+            enabled: True to profile slide changes and keep the slow ones.
+        """
+        self.slow_slides = enabled
+        if not enabled:
+            self.cancelSlide()
+        state = f"on, keeping slides slower than {self.slow_slide_ms:.0f}ms" if enabled else "off"
+        logger.info(f"Slow-slide profiling {state}")
+    
+    def beginSlide(self) -> None:
+        """Start profiling a slide change in slow-slide mode.
+        
+        Call on the GUI thread. A slide change that was not ended yet is
+        dropped.
+        """
+        if not self.slow_slides or self._capturing:
+            return
+        
+        self.cancelSlide()
+        with self._lock:
+            self._profiles = []
+        self._slide_profile = self._enableProfile()
+        self._local.active = self._slide_profile is not None
+    
+    def endSlide(self, latency: float) -> Optional[Path]:
+        """Finish profiling a slide change, keeping it if it was slow.
+        
+        Args:
+            latency: Seconds the slide change took.
+        
+        Returns:
+            The path of the written profile if the slide was slow.
+        """
+        profile = self._slide_profile
+        if profile is None:
+            return None
+        
+        profile.disable()
+        self._slide_profile = None
+        self._local.active = False
+        with self._lock:
+            profiles = self._profiles
+            self._profiles = []
+        
+        latency_ms = latency * 1000
+        if latency_ms < self.slow_slide_ms:
+            return None
+        
+        stamp = time.strftime('%Y%m%d-%H%M%S')
+        return self._writeProfile([profile] + profiles, f"slow-slide-{stamp}-{latency_ms:.0f}ms.prof",
+                                  f"Slow slide change of {latency_ms:.0f}ms")
+    
+    @contextmanager
+    def section(self) -> Iterator[None]:
+        """Profile a block of worker-thread code while capturing.
+        
+        Cheap when not capturing, so hot loops can be wrapped permanently.
+        """
+        if not (self._capturing or self._slide_profile is not None) or getattr(self._local, 'active', False):
+            yield
+            return
+        
+        profile = self._enableProfile()
+        if profile is None:
+            yield
+            return
+        
+        self._local.active = True
+        try:
+            yield
+        finally:
+            profile.disable()
+            self._local.active = False
+            with self._lock:
+                self._profiles.append(profile)
+    
+    def _enableProfile(self) -> Optional[cProfile.Profile]:
+        """Start a profile on the calling thread.
+        
+        A thread can only run one profile; callers mark the thread active
+        so that section() leaves it alone.
+        
+        Returns:
+            The profile, or None if another profiler is active, which on
+            Python 3.12 and later already covers every thread.
+        """
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            return None
+        return profile
+    
+    def cancelSlide(self) -> None:
+        """Drop the slide change being profiled, if any."""
+        if self._slide_profile is not None:
+            self._slide_profile.disable()
+            self._slide_profile = None
+            self._local.active = False
+    
+    def _writeProfile(self, profiles: List[cProfile.Profile], name: str, title: str) -> Optional[Path]:
+        """Merge profiles, write them to a file and log the top functions.
+        
+        Args:
+            profiles: The stopped profiles.
+            name: File name of the dump.
+            title: Heading of the log summary.
+        
+        Returns:
+            The path of the dump, or None if nothing was recorded.
+        """
+        stats = None
+        for profile in profiles:
+            try:
+                if stats is None:
+                    stats = pstats.Stats(profile)
+                else:
+                    stats.add(profile)
+            except TypeError:
+                continue  # Never ran any code
+        if stats is None:
+            logger.warning(f"{title}: nothing was recorded")
+            return None
+        
+        path = self.output_dir / name
+        try:
+            self.output_dir.mkdir(parents=True, exist_ok=True)
+            stats.dump_stats(path)
+        except OSError as e:
+            logger.error(f"Could not write profile {path}: {e}")
+            path = None
+        
+        summary = io.StringIO()
+        stats.stream = summary
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(self.top_n)
+        logger.info(f"{title} written to {path}, top {self.top_n} by cumulative time:\n{summary.getvalue()}")
+        return path
+    
+    def _writeSnapshot(self, snapshot: tracemalloc.Snapshot, name: str) -> None:
+        """Write a memory snapshot and log the largest allocation sites.
+        
+        Args:
+            snapshot: The snapshot.
+            name: File name of the dump.
+        """
+        path = self.output_dir / name
+        try:
+            self.output_dir.mkdir(parents=True, exist_ok=True)
+            snapshot.dump(str(path))
+        except OSError as e:
+            logger.error(f"Could not write memory snapshot {path}: {e}")
+        
+        lines = [f"  {stat}" for stat in snapshot.statistics('lineno')[:self.top_n]]
+        logger.info(f"Memory snapshot written to {path}, top {self.top_n} allocation sites:\n" + "\n".join(lines))
+
+
+# The profiler toggled from the main window
+profiler = Profiler()
\ No newline at end of file
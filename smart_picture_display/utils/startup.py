@@ -0,0 +1,71 @@
+"""Startup timing and the image to resume the slideshow with."""
+import os
+import time
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from ..config import LAST_IMAGE_PATH
+from .logger import logger
+
+class StartupTimer:
+    """Records how long each phase of the application startup takes.
+    
+    The clock starts when the timer is created, so create it first thing.
+    Each mark ends a phase; report logs the breakdown once.
+    """
+    
+    def __init__(self):
+        """Initialize the timer and start the clock."""
+        self.start = time.perf_counter()
+        self.marks: List[Tuple[str, float]] = []
+        self._last = self.start
+        self.reported = False
+    
+    def mark(self, phase: str) -> None:
+        """End a phase of the startup.
+        
+        Args:
+            phase: Name of the phase that just finished.
+        """
+        now = time.perf_counter()
+        self.marks.append((phase, now - self._last))
+        self._last = now
+    
+    def report(self) -> None:
+        """Log the duration of each phase and the total, once."""
+        if self.reported:
+            return
+        
+        self.reported = True
+        phases = ", ".join(f"{phase} {seconds * 1000:.0f}ms" for phase, seconds in self.marks)
+        total = (self._last - self.start) * 1000
+        logger.info(f"Startup took {total:.0f}ms: {phases}")
+
+def loadLastImage(path: Path = LAST_IMAGE_PATH) -> Optional[Path]:
+    """Read the path of the image that was displayed last.
+    
+    Args:
+        path: File the path is remembered in.
+    
+    Returns:
+        The image path, or None if none was remembered.
+    """
+    try:
+        text = path.read_text(encoding='utf-8').strip()
+    except OSError:
+        return None
+    return Path(text) if text else None
+
+def saveLastImage(image_path: Path, path: Path = LAST_IMAGE_PATH) -> None:
+    """Remember the image that is being displayed.
+    
+    Args:
+        image_path: Path of the displayed image.
+        path: File to remember the path in.
+    """
+    tmp_path = path.with_name(path.name + '.tmp')
+    try:
+        tmp_path.write_text(str(image_path), encoding='utf-8')
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logger.warning(f"Could not remember the last image: {e}")
\ No newline at end of file
@@ -1,12 +1,17 @@
 """Utilities for managing storage and disk space."""
+import math
 import os
 import shutil
+import threading
+import time
 from pathlib import Path
-from typing import Tuple, List
+from typing import Any, Callable, Dict, Iterable, NamedTuple, Optional, Tuple, List, Union
 import datetime
+from bisect import bisect_left
 
-from ..config import IMAGES_DIR, MAX_STORAGE_PERCENT
+from ..config import IMAGES_DIR, MAX_STORAGE_PERCENT, STORAGE_EVICTION_POLICY, SUPPORTED_EXTENSIONS
 from .logger import logger
+from .metrics import STORAGE_EVICTED_BYTES, STORAGE_EVICTIONS
 
 def checkAvailableStorage(path: Path = IMAGES_DIR) -> Tuple[float, float, float]:
     """Check available storage in the given path.
@@ -46,46 +51,350 @@ def hasAvailableStorage(required_bytes: int = 0, path: Path = IMAGES_DIR) -> boo
     
     return True
 
-def cleanupOldestImages(target_percent: float = MAX_STORAGE_PERCENT - 10) -> int:
-    """Remove oldest downloaded images to free up space.
+class EvictionPlan(NamedTuple):
+    """Files to remove so that a batch of downloads fits the storage budget."""
+    evictions: List[Path]
+    bytes_to_free: int
+    bytes_freed: int
+    budget_bytes: int
+    skipped: Tuple[Path, ...] = ()
+
+# Eviction policies: sort keys over (path, size, mtime, last_displayed); lowest is evicted first
+EvictionKey = Callable[[Path, int, float, float], Any]
+
+EVICTION_POLICIES: Dict[str, EvictionKey] = {
+    "oldest": lambda path, size, mtime, displayed: mtime,
+    "least_recently_displayed": lambda path, size, mtime, displayed: (displayed, mtime),
+    "largest": lambda path, size, mtime, displayed: -size,
+}
+
+class StoragePlanner:
+    """Plans storage for whole batches of downloads instead of file by file.
     
-    Args:
-        target_percent: The target percentage of disk usage to reach.
-        
-    Returns:
-        The number of files removed.
+    The planner scans the images directory once into a size index and checks
+    disk usage once per batch. It then picks every file to evict for the
+    batch according to a pluggable policy, deletes them in one pass, and
+    hands out the remaining byte budget to individual downloads without
+    further system calls.
     """
-    _, total, free_percent = checkAvailableStorage()
-    used_percent = 100 - free_percent
     
-    if used_percent <= target_percent:
-        return 0  # No cleanup needed
+    def __init__(self,
+                 images_dir: Path = IMAGES_DIR,
+                 max_percent: float = MAX_STORAGE_PERCENT,
+                 policy: Union[str, EvictionKey] = STORAGE_EVICTION_POLICY,
+                 display_times: Optional[Callable[[], Dict[Path, float]]] = None):
+        """Initialize the storage planner.
+        
+        Args:
+            images_dir: Directory where images are stored.
+            max_percent: Maximum percentage of the disk that may be used.
+            policy: Name of an entry in EVICTION_POLICIES, or a sort key
+                called with (path, size, mtime, last_displayed) where the
+                lowest key is evicted first.
+            display_times: Callable returning when each image was last
+                displayed, used by the "least_recently_displayed" policy.
+        """
+        self.images_dir = images_dir
+        self.max_percent = max_percent
+        self.display_times = display_times
+        if callable(policy):
+            self.policy = policy
+        elif policy in EVICTION_POLICIES:
+            self.policy = EVICTION_POLICIES[policy]
+        else:
+            logger.warning(f"Unknown eviction policy '{policy}', using 'oldest'")
+            self.policy = EVICTION_POLICIES["oldest"]
+        
+        self.budget_bytes = 0
+        self._local_files: Optional[Dict[Path, Tuple[int, float]]] = None
+        self._lock = threading.Lock()
+        
+        # Bytes reserved by downloads that are not on disk yet, which disk
+        # usage does not show
+        self._reserved_bytes = 0
+    
+    def scan(self) -> None:
+        """Rebuild the local size index with a single directory scan."""
+        local_files = {}
+        try:
+            with os.scandir(self.images_dir) as entries:
+                for entry in entries:
+                    if not entry.is_file():
+                        continue
+                    if os.path.splitext(entry.name)[1].lower() not in SUPPORTED_EXTENSIONS:
+                        continue
+                    stat = entry.stat()
+                    local_files[Path(entry.path)] = (stat.st_size, stat.st_mtime)
+        except OSError as e:
+            logger.error(f"Error scanning {self.images_dir}: {e}")
+        
+        with self._lock:
+            self._local_files = local_files
     
-    # Get all images sorted by modification time (oldest first)
-    image_files = []
-    for file_path in IMAGES_DIR.glob("*"):
-        if file_path.is_file() and file_path.suffix.lower() in ['.jpg', '.jpeg', '.png', '.gif', '.bmp']:
-            stat = file_path.stat()
-            image_files.append((file_path, stat.st_mtime))
+    def plan(self,
+             incoming_bytes: int,
+             protected: Iterable[Path] = (),
+             score: Optional[float] = None,
+             scores: Optional[Dict[Path, float]] = None) -> EvictionPlan:
+        """Plan the evictions needed to fit a batch of downloads.
+        
+        Args:
+            incoming_bytes: Total size of the files about to be downloaded.
+            protected: Paths that must not be evicted, such as files that
+                belong to the batch.
+            score: Priority of the incoming files; if given, only local
+                files scored lower are evicted.
+            scores: Priorities of the local files, lowest evicted first;
+                files without one are evicted before any that have one.
+            
+        Returns:
+            The eviction plan.
+        """
+        headroom = self._getHeadroom()
+        bytes_to_free = max(0, int(incoming_bytes - headroom))
+        
+        evictions: List[Path] = []
+        bytes_freed = 0
+        if bytes_to_free > 0:
+            for path, size, file_score in self._getCandidates(protected, scores):
+                if bytes_freed >= bytes_to_free or (score is not None and file_score >= score):
+                    break
+                evictions.append(path)
+                bytes_freed += size
+        
+        return EvictionPlan(evictions, bytes_to_free, bytes_freed, int(headroom + bytes_freed))
     
-    # Sort by modification time (oldest first)
-    image_files.sort(key=lambda x: x[1])
+    def planRanked(self,
+                   incoming: Iterable[Tuple[Path, int, float]],
+                   scores: Dict[Path, float],
+                   protected: Iterable[Path] = ()) -> EvictionPlan:
+        """Plan which of a batch of downloads to make, by priority.
+        
+        The incoming files are taken from the highest score down. Each one
+        fits into the free budget or replaces local files scored lower than
+        itself; files that fit neither way are skipped, so a tight budget
+        holds the highest-scored files from both sides.
+        
+        Args:
+            incoming: (path, size, score) of the files about to be downloaded.
+            scores: Priorities of the local files; files without one rank
+                below every incoming file.
+            protected: Paths that must not be evicted.
+            
+        Returns:
+            The eviction plan, with the incoming paths that do not fit in
+            skipped.
+        """
+        headroom = self._getHeadroom()
+        candidates = self._getCandidates(protected, scores)
+        
+        # Sizes of the candidates up to each position, to know how much
+        # evicting everything below a score would free
+        cumulative = [0]
+        for _, size, _ in candidates:
+            cumulative.append(cumulative[-1] + size)
+        candidate_scores = [file_score for _, _, file_score in candidates]
+        
+        evictions: List[Path] = []
+        skipped: List[Path] = []
+        bytes_freed = 0
+        bytes_needed = 0
+        available = headroom
+        for path, size, score in sorted(incoming, key=lambda f: f[2], reverse=True):
+            bytes_needed += size
+            if size > available:
+                # Evict only if lower-scored files can make enough room
+                end = max(bisect_left(candidate_scores, score), len(evictions))
+                if size > available + cumulative[end] - cumulative[len(evictions)]:
+                    skipped.append(path)
+                    continue
+                while size > available:
+                    evicted, evicted_size, _ = candidates[len(evictions)]
+                    evictions.append(evicted)
+                    bytes_freed += evicted_size
+                    available += evicted_size
+            available -= size
+        
+        bytes_to_free = max(0, int(bytes_needed - headroom))
+        return EvictionPlan(evictions, bytes_to_free, bytes_freed, int(headroom + bytes_freed), tuple(skipped))
     
-    removed_count = 0
-    for file_path, _ in image_files:
-        try:
-            file_size = file_path.stat().st_size
-            file_path.unlink()
-            removed_count += 1
-            logger.info(f"Removed old image: {file_path.name} ({file_size} bytes)")
+    def _getHeadroom(self) -> float:
+        """Get the bytes that can be stored without evicting anything.
+        
+        Returns:
+            The room left under the usage limit, at most the free space,
+            less the space reserved by downloads still in flight.
+        """
+        if self._local_files is None:
+            self.scan()
+        
+        total, used, free = shutil.disk_usage(self.images_dir)
+        with self._lock:
+            reserved_bytes = self._reserved_bytes
+        return min(total * self.max_percent / 100 - used, free) - reserved_bytes
+    
+    def _getCandidates(self,
+                       protected: Iterable[Path],
+                       scores: Optional[Dict[Path, float]]) -> List[Tuple[Path, int, float]]:
+        """List the local files that may be evicted, first to go first.
+        
+        Args:
+            protected: Paths that must not be evicted.
+            scores: Priorities of the local files, or None to order them by
+                the eviction policy alone.
+        
+        Returns:
+            (path, size, score) of each file, by score and then by policy.
+        """
+        protected = set(protected)
+        scores = scores or {}
+        display_times = self.display_times() if self.display_times else {}
+        with self._lock:
+            candidates = [
+                (path, size, mtime) for path, (size, mtime) in self._local_files.items()
+                if path not in protected
+            ]
+        candidates.sort(key=lambda c: (scores.get(c[0], -math.inf),
+                                       self.policy(c[0], c[1], c[2], display_times.get(c[0], 0.0))))
+        return [(path, size, scores.get(path, -math.inf)) for path, size, _ in candidates]
+    
+    def execute(self, plan: EvictionPlan) -> int:
+        """Delete the files of an eviction plan and set the download budget.
+        
+        Args:
+            plan: The plan to carry out.
+            
+        Returns:
+            The number of files removed.
+        """
+        removed_count = 0
+        bytes_freed = 0
+        for file_path in plan.evictions:
+            try:
+                file_size = self._local_files.get(file_path, (0, 0))[0]
+                file_path.unlink()
+                removed_count += 1
+                bytes_freed += file_size
+                STORAGE_EVICTIONS.inc()
+                STORAGE_EVICTED_BYTES.inc(file_size)
+                logger.info(f"Removed old image: {file_path.name} ({file_size} bytes)")
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                logger.error(f"Failed to remove file {file_path}: {e}")
+            
+            with self._lock:
+                self._local_files.pop(file_path, None)
+        
+        with self._lock:
+            self.budget_bytes = int(plan.budget_bytes - (plan.bytes_freed - bytes_freed))
+        return removed_count
+    
+    def prepareBatch(self,
+                     incoming_bytes: int,
+                     protected: Iterable[Path] = (),
+                     score: Optional[float] = None,
+                     scores: Optional[Dict[Path, float]] = None) -> EvictionPlan:
+        """Plan and carry out the evictions for a batch of downloads.
+        
+        Args:
+            incoming_bytes: Total size of the files about to be downloaded.
+            protected: Paths that must not be evicted.
+            score: Priority of the incoming files, see plan().
+            scores: Priorities of the local files, see plan().
+        
+        Returns:
+            The executed plan.
+        """
+        return self._prepare(self.plan(incoming_bytes, protected, score, scores))
+    
+    def prepareRanked(self,
+                      incoming: Iterable[Tuple[Path, int, float]],
+                      scores: Dict[Path, float],
+                      protected: Iterable[Path] = ()) -> EvictionPlan:
+        """Plan and carry out the evictions for a batch of downloads by priority.
+        
+        Args:
+            incoming: (path, size, score) of the files about to be downloaded.
+            scores: Priorities of the local files, see planRanked().
+            protected: Paths that must not be evicted.
+        
+        Returns:
+            The executed plan.
+        """
+        return self._prepare(self.planRanked(incoming, scores, protected))
+    
+    def _prepare(self, plan: EvictionPlan) -> EvictionPlan:
+        """Carry out a plan, or only set the budget if it evicts nothing.
+        
+        Args:
+            plan: The plan.
+        
+        Returns:
+            The same plan.
+        """
+        if plan.evictions:
+            removed_count = self.execute(plan)
+            logger.info(f"Freed {plan.bytes_freed} bytes for the next batch by removing {removed_count} files")
+        else:
+            with self._lock:
+                self.budget_bytes = plan.budget_bytes
+        return plan
+    
+    def reserve(self, file_path: Path, nbytes: int) -> bool:
+        """Take space for a download out of the current budget.
+        
+        Args:
+            file_path: Path the file will be stored at.
+            nbytes: Size of the download.
             
-            # Check if we've reached the target usage
-            _, _, free_percent = checkAvailableStorage()
-            used_percent = 100 - free_percent
-            if used_percent <= target_percent:
-                break
-        except Exception as e:
-            logger.error(f"Failed to remove file {file_path}: {e}")
-    
-    logger.info(f"Cleanup completed: removed {removed_count} files")
-    return removed_count 
\ No newline at end of file
+        Returns:
+            True if the download fits the budget, False otherwise.
+        """
+        with self._lock:
+            if nbytes > self.budget_bytes:
+                return False
+            self.budget_bytes -= nbytes
+            self._reserved_bytes += nbytes
+            return True
+    
+    def release(self, file_path: Path, nbytes: int) -> None:
+        """Return the space of a download that did not complete.
+        
+        Args:
+            file_path: Path the file would have been stored at.
+            nbytes: Size that was reserved.
+        """
+        with self._lock:
+            self.budget_bytes += nbytes
+            self._reserved_bytes -= nbytes
+    
+    def settle(self, file_path: Path, reserved_bytes: int, actual_bytes: int) -> None:
+        """Close the reservation of a download that is now on disk.
+        
+        Disk usage accounts for the file from here on, and it joins the size
+        index of the files that may be evicted. A reservation made from an
+        estimate is corrected to the downloaded size.
+        
+        Args:
+            file_path: Path the file was stored at.
+            reserved_bytes: Size that was reserved.
+            actual_bytes: Size of the stored file.
+        """
+        with self._lock:
+            self.budget_bytes += reserved_bytes - actual_bytes
+            self._reserved_bytes -= reserved_bytes
+            if self._local_files is not None:
+                self._local_files[file_path] = (actual_bytes, time.time())
+    
+    def forget(self, file_path: Path) -> None:
+        """Drop a file that was deleted outside the planner from the size index.
+        
+        Args:
+            file_path: Path of the deleted file.
+        """
+        with self._lock:
+            if self._local_files is not None:
+                entry = self._local_files.pop(file_path, None)
+                if entry:
+                    self.budget_bytes += entry[0]
\ No newline at end of file
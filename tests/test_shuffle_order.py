@@ -0,0 +1,79 @@
+"""Tests for the shuffled playback order."""
+import random
+from pathlib import Path
+from typing import List
+
+from smart_picture_display.services.shuffle_order import ShuffleOrder
+
+def _paths(count: int) -> List[Path]:
+    """Make a sorted image list.
+    
+    Args:
+        count: Number of images.
+    
+    Returns:
+        The image paths.
+    """
+    return [Path(f"/images/{i:03d}.jpg") for i in range(count)]
+
+def test_cycle_shows_every_image_once():
+    paths = _paths(20)
+    order = ShuffleOrder(seed=1)
+    current = None
+    shown = []
+    for _ in range(20):
+        current = order.forward(paths, current)
+        shown.append(current)
+    assert sorted(shown) == paths
+    
+    for expected in reversed(shown[:-1]):
+        current = order.back(current)
+        assert current == expected
+
+def test_image_removed_at_end_of_cycle_is_not_shown():
+    # Peeking past the end of a cycle draws the next one, deferring the
+    # image just shown if the new cycle would start with it
+    for seed in range(100):
+        paths = _paths(3)
+        order = ShuffleOrder(seed=seed)
+        current = None
+        for _ in range(3):
+            current = order.forward(paths, current)
+        order.peek(paths, current, 1, 0)
+        
+        remaining = [p for p in paths if p != current]
+        order.update([], [current])
+        current = order.getCurrent()
+        for _ in range(3):
+            cycle = []
+            for _ in range(len(remaining)):
+                current = order.forward(remaining, current)
+                cycle.append(current)
+            assert sorted(cycle) == remaining
+
+def test_random_changes_never_show_removed_images():
+    for seed in range(300):
+        rng = random.Random(seed)
+        paths = _paths(rng.randint(1, 8))
+        order = ShuffleOrder(seed=seed)
+        current = None
+        next_name = len(paths)
+        for _ in range(60):
+            action = rng.random()
+            if action < 0.15:
+                added = Path(f"/images/{next_name:03d}.jpg")
+                next_name += 1
+                paths = sorted(paths + [added])
+                order.update([added], [])
+            elif action < 0.3 and len(paths) > 1:
+                removed = rng.choice(paths)
+                paths = [p for p in paths if p != removed]
+                order.update([], [removed])
+                if current == removed:
+                    current = order.getCurrent()
+            else:
+                previous = current
+                current = order.forward(paths, current)
+                assert current in paths
+                if len(paths) > 1:
+                    assert current != previous
\ No newline at end of file
@@ -0,0 +1,54 @@
+"""Tests for the storage planner's download budget."""
+import shutil
+from pathlib import Path
+
+from smart_picture_display.utils.storage import StoragePlanner
+
+def _planner(tmp_path: Path, monkeypatch, headroom: int) -> StoragePlanner:
+    """Create a planner over an empty directory with a fixed headroom.
+    
+    Args:
+        tmp_path: The images directory.
+        monkeypatch: Patches disk usage.
+        headroom: Bytes that may be stored under the usage limit.
+    
+    Returns:
+        The planner.
+    """
+    total = 10000
+    monkeypatch.setattr(shutil, 'disk_usage', lambda path: (total, total // 2 - headroom, total // 2))
+    planner = StoragePlanner(tmp_path, max_percent=50)
+    planner.scan()
+    return planner
+
+def test_fallback_keeps_in_flight_reservations(tmp_path, monkeypatch):
+    planner = _planner(tmp_path, monkeypatch, 100)
+    planner.prepareBatch(0)
+    
+    assert planner.reserve(tmp_path / 'a.jpg', 60)
+    assert not planner.reserve(tmp_path / 'b.jpg', 60)
+    
+    # Planning again for the file that did not fit must not hand out the
+    # space the first download holds while it is not on disk yet
+    plan = planner.prepareBatch(60, protected=[tmp_path / 'b.jpg'])
+    assert plan.budget_bytes == 40 and not plan.evictions
+    assert not planner.reserve(tmp_path / 'b.jpg', 60)
+
+def test_released_reservation_is_available_again(tmp_path, monkeypatch):
+    planner = _planner(tmp_path, monkeypatch, 100)
+    planner.prepareBatch(0)
+    
+    assert planner.reserve(tmp_path / 'a.jpg', 60)
+    planner.release(tmp_path / 'a.jpg', 60)
+    planner.prepareBatch(60)
+    assert planner.reserve(tmp_path / 'b.jpg', 100)
+
+def test_settled_download_is_counted_by_disk_usage(tmp_path, monkeypatch):
+    planner = _planner(tmp_path, monkeypatch, 100)
+    planner.prepareBatch(0)
+    
+    assert planner.reserve(tmp_path / 'a.jpg', 60)
+    # The file is on disk now, so disk usage shows it instead
+    monkeypatch.setattr(shutil, 'disk_usage', lambda path: (10000, 5000 - 40, 5000))
+    planner.settle(tmp_path / 'a.jpg', 60, 60)
+    assert planner.planRanked([], {}).budget_bytes == 40
\ No newline at end of file